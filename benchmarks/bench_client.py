@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+'''
+bench_client.py
+
+Times the client against the local MockLaunchLibrary server, which
+replays recorded launches with an optional simulated network latency:
+
+    cache       one listing request with no cache, a cold cache (new
+                client and connection every call) and a warm cache
+    paginate    a full listing fetched page by page sequentially, with
+                paginate() on a thread pool, and with the async client
+
+usage:
+    python -m benchmarks.bench_client [--records N] [--page-size N]
+                                      [--latency S] [--repeat N]
+'''
+
+
+import argparse
+import asyncio
+
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.cache import MemoryCache
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.launchlibrary import paginate
+
+from benchmarks import fixtures
+from tests.mockserver import MockLaunchLibrary
+
+
+# every generated launch is after this date
+STARTDATE = '2020-01-01'
+FIRST_NET = 1600000000
+
+
+def build_server(records, latency):
+    '''
+    Start a MockLaunchLibrary serving records launches, one hour apart.
+    '''
+    launches = fixtures.repeat_records('launch_verbose', 'launches',
+                                       records)
+    for i, launch in enumerate(launches):
+        launch['netstamp'] = FIRST_NET + 3600 * i
+    server = MockLaunchLibrary(latency=latency).start()
+    server.add_records('launch', launches)
+    return server
+
+
+def bench_cache(server, args):
+    params = {'startdate': STARTDATE, 'mode': 'verbose',
+              'limit': args.page_size}
+    results = []
+
+    with LaunchLibraryClient(base_url=server.url) as client:
+        results.append(('no cache', fixtures.time_call(
+            lambda: client.get_json('launch', params), args.repeat, 10)))
+
+    def cold():
+        with LaunchLibraryClient(base_url=server.url,
+                                 cache=MemoryCache()) as client:
+            client.get_json('launch', params)
+    results.append(('cold cache', fixtures.time_call(cold, args.repeat,
+                                                     10)))
+
+    with LaunchLibraryClient(base_url=server.url,
+                             cache=MemoryCache()) as client:
+        client.get_json('launch', params)
+        results.append(('warm cache', fixtures.time_call(
+            lambda: client.get_json('launch', params), args.repeat)))
+    return results
+
+
+async def fetch_async(client, page_size):
+    '''
+    Fetch a whole launch listing with the async client: the first page
+    for the total, then every other page at once.
+    '''
+    params = {'startdate': STARTDATE, 'mode': 'list', 'limit': page_size}
+    first = await client.get_json('launch', params)
+    pages = await asyncio.gather(*[
+        client.get_json('launch', dict(params, offset=offset))
+        for offset in range(page_size, first['total'], page_size)])
+    records = list(first['launches'])
+    for page in pages:
+        records.extend(page['launches'])
+    return records
+
+
+def bench_paginate(server, args):
+    results = []
+    with LaunchLibraryClient(base_url=server.url) as client:
+        for name, workers in (('sequential', 1), ('threaded x4', 4),
+                              ('threaded x8', 8)):
+            def fetch():
+                records = list(paginate('launch', page_size=args.page_size,
+                                        max_workers=workers, client=client,
+                                        startdate=STARTDATE, mode='list'))
+                assert len(records) == args.records
+            results.append((name, fixtures.time_call(fetch, args.repeat,
+                                                     1)))
+
+    async def fetch_all():
+        async with AsyncLaunchLibraryClient(base_url=server.url,
+                                            max_concurrency=8) as client:
+            records = await fetch_async(client, args.page_size)
+        assert len(records) == args.records
+    results.append(('async x8', fixtures.time_call(
+        lambda: asyncio.run(fetch_all()), args.repeat, 1)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000,
+                        help='launches in the listing (default 1000)')
+    parser.add_argument('--page-size', type=int, default=100,
+                        help='records per page (default 100)')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='simulated latency in seconds (default 0.02)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timing repetitions (default 3)')
+    args = parser.parse_args()
+
+    server = build_server(args.records, args.latency)
+    try:
+        print('{:<10} {:<14} {:>12}'.format('benchmark', 'variant', 'ms'))
+        for group, bench in (('cache', bench_cache),
+                             ('paginate', bench_paginate)):
+            for variant, seconds in bench(server, args):
+                print('{:<10} {:<14} {:>12.2f}'.format(group, variant,
+                                                      seconds * 1e3))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
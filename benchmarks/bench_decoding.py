@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+'''
+bench_decoding.py
+
+Compares the JSON decoder backends on recorded launch and agency
+payloads.  Pages are built by repeating the recorded records under new
+ids, so their size matches a full listing page.
+
+usage:
+    python -m benchmarks.bench_decoding [--records N] [--repeat N]
+'''
+
+
+import argparse
+import json
+
+from launchlibrary import models
+from launchlibrary.decoding import available_backends, get_decoder
+
+from benchmarks import fixtures
+
+
+def build_page(name, key, records):
+    '''
+    Build the encoded body of a listing page holding records records,
+    repeating the recorded ones.
+    '''
+    page = fixtures.repeat_records(name, key, records)
+    payload = {key: page, 'total': records, 'offset': 0, 'count': records}
+    return json.dumps(payload).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--records', type=int, default=100,
+                        help='records per page (default 100)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions (default 5)')
+    args = parser.parse_args()
+
+    pages = [('launch_verbose', 'launches', models.Launch),
+             ('agency', 'agencies', models.Agency)]
+    print('{:<16} {:<10} {:>12} {:>12} {:>12}'.format(
+        'payload', 'backend', 'bytes', 'decode us', 'records us'))
+    for name, key, model in pages:
+        body = build_page(name, key, args.records)
+        # what Response.json() does: decode to str, then parse
+        baseline = fixtures.time_call(
+            lambda: json.loads(body.decode('utf-8')), args.repeat)
+        print('{:<16} {:<10} {:>12} {:>12.1f} {:>12}'.format(
+            name, 'str+json', len(body), baseline * 1e6, '-'))
+        for backend in available_backends():
+            decode = get_decoder(backend)
+            decoded = fixtures.time_call(lambda: decode(body),
+                                         args.repeat)
+            wrapped = fixtures.time_call(
+                lambda: models.from_payload(decode(body), model),
+                args.repeat)
+            print('{:<16} {:<10} {:>12} {:>12.1f} {:>12.1f}'.format(
+                name, backend, len(body), decoded * 1e6, wrapped * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+'''
+bench_ics.py
+
+Times ICS calendar parsing on a calendar built by repeating the
+recorded events: parse_ics_calendar_format() on the whole body, and
+iter_ics_events() over its lines and over 8 KiB chunks as read from a
+streamed response.
+
+usage:
+    python -m benchmarks.bench_ics [--events N] [--repeat N]
+'''
+
+
+import argparse
+from collections import deque
+
+from launchlibrary.utils import iter_ics_events, parse_ics_calendar_format
+
+from benchmarks import fixtures
+
+
+def build_calendar(events):
+    '''
+    Build the body of a calendar holding events events, repeating the
+    recorded ones.
+    '''
+    text = fixtures.load_text('calendar.ics')
+    head, begin, rest = text.partition('BEGIN:VEVENT')
+    events_text, end, tail = rest.rpartition('END:VEVENT\r\n')
+    recorded = [begin + event + end for event in
+                events_text.split(end + begin)]
+    calendar = [head]
+    for i in range(events):
+        calendar.append(recorded[i % len(recorded)])
+    calendar.append(tail)
+    return ''.join(calendar).encode('utf-8')
+
+
+def chunks(data, size=8192):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--events', type=int, default=1000,
+                        help='events in the calendar (default 1000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timing repetitions (default 5)')
+    args = parser.parse_args()
+
+    data = build_calendar(args.events)
+    assert len(parse_ics_calendar_format(data)['launches']) == args.events
+    variants = [
+        ('parse_ics_calendar_format',
+         lambda: parse_ics_calendar_format(data)),
+        ('iter_ics_events lines',
+         lambda: deque(iter_ics_events(data.splitlines()), maxlen=0)),
+        ('iter_ics_events chunks',
+         lambda: deque(iter_ics_events(chunks(data), chunked=True),
+                       maxlen=0)),
+    ]
+    print('{:<28} {:>10} {:>12} {:>12}'.format(
+        'variant', 'bytes', 'ms', 'us/event'))
+    for name, func in variants:
+        seconds = fixtures.time_call(func, args.repeat)
+        print('{:<28} {:>10} {:>12.2f} {:>12.2f}'.format(
+            name, len(data), seconds * 1e3, seconds * 1e6 / args.events))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+'''
+bench_import.py
+
+Times importing the package and some of its submodules in a fresh
+interpreter, and lists the heavy dependencies each import loads.  With
+--max-ms the script exits with an error when importing the bare
+package gets slower than that, so it can guard startup time in CI.
+
+usage:
+    python -m benchmarks.bench_import [--repeat N] [--max-ms MS]
+'''
+
+
+import argparse
+import json
+import subprocess
+import sys
+
+
+TARGETS = ('launchlibrary', 'launchlibrary.utils', 'launchlibrary.models',
+           'launchlibrary.client', 'launchlibrary.aio')
+
+# modules worth knowing about when they load
+HEAVY = ('requests', 'urllib3', 'asyncio', 'sqlite3', 'orjson', 'msgspec',
+         'pyarrow', 'pandas')
+
+_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {target}
+seconds = time.perf_counter() - start
+print(json.dumps([seconds, [m for m in {heavy!r} if m in sys.modules]]))
+'''
+
+
+def time_import(target):
+    '''
+    Import target in a new interpreter.
+
+    returns:
+        tuple of the import time in seconds and the HEAVY modules it
+        loaded
+    '''
+    output = subprocess.check_output(
+        [sys.executable, '-c', _SCRIPT.format(target=target, heavy=HEAVY)])
+    seconds, loaded = json.loads(output)
+    return seconds, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='imports timed per target (default 5)')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if importing launchlibrary takes longer')
+    args = parser.parse_args()
+
+    print('{:<24} {:>10}  {}'.format('import', 'ms', 'loads'))
+    results = {}
+    for target in TARGETS:
+        runs = [time_import(target) for _ in range(args.repeat)]
+        seconds = min(run[0] for run in runs)
+        results[target] = seconds
+        print('{:<24} {:>10.2f}  {}'.format(target, seconds * 1e3,
+                                           ', '.join(runs[0][1]) or '-'))
+    if (args.max_ms is not None
+            and results['launchlibrary'] * 1e3 > args.max_ms):
+        sys.exit('importing launchlibrary took {:.2f} ms, over {} ms'
+                 .format(results['launchlibrary'] * 1e3, args.max_ms))
+
+
+if __name__ == '__main__':
+    main()
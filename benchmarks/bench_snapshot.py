@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+'''
+bench_snapshot.py
+
+Compares loading a launch dataset at start up from a JSON dump and from
+a snapshot (see launchlibrary/snapshot.py): time to load or open, to
+look up one record by id, and to decode every record, plus the size of
+each file.
+
+usage:
+    python -m benchmarks.bench_snapshot [--records N] [--repeat N]
+'''
+
+
+import argparse
+import json
+import os
+import random
+import tempfile
+
+from launchlibrary.snapshot import Snapshot, write_snapshot
+
+from benchmarks import fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--records', type=int, default=20000,
+                        help='launches in the dataset (default 20000)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timing repetitions (default 3)')
+    args = parser.parse_args()
+
+    launches = fixtures.repeat_records('launch_verbose', 'launches',
+                                       args.records)
+    ids = [random.randrange(args.records) for _ in range(1000)]
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'launches.json')
+        snapshot_path = os.path.join(directory, 'launches.snap')
+        with open(json_path, 'w') as f:
+            json.dump({'launches': launches}, f)
+        write_snapshot(snapshot_path, {'launch': launches})
+
+        def load_json():
+            with open(json_path, 'rb') as f:
+                return {launch['id']: launch
+                        for launch in json.load(f)['launches']}
+
+        def open_snapshot():
+            Snapshot(snapshot_path).close()
+
+        by_id = load_json()
+        snapshot = Snapshot(snapshot_path)
+        rows = [
+            ('json', 'open', os.path.getsize(json_path),
+             fixtures.time_call(load_json, args.repeat, 1)),
+            ('json', '1000 gets', None, fixtures.time_call(
+                lambda: [by_id[id] for id in ids], args.repeat)),
+            ('snapshot', 'open', os.path.getsize(snapshot_path),
+             fixtures.time_call(open_snapshot, args.repeat)),
+            ('snapshot', '1000 gets', None, fixtures.time_call(
+                lambda: [snapshot.get('launch', id) for id in ids],
+                args.repeat)),
+            ('snapshot', 'all records', None, fixtures.time_call(
+                lambda: list(snapshot.records('launch')), args.repeat, 1)),
+        ]
+        snapshot.close()
+
+    print('{:<10} {:<12} {:>12} {:>12}'.format('format', 'operation',
+                                               'bytes', 'ms'))
+    for name, operation, size, seconds in rows:
+        print('{:<10} {:<12} {:>12} {:>12.3f}'.format(
+            name, operation, '' if size is None else size, seconds * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+'''
+fixtures.py
+
+Access to the recorded API payloads kept in tests/fixtures.
+
+functions:
+    load
+    load_bytes
+    load_text
+    repeat_records
+    time_call
+'''
+
+
+import json
+import os
+import timeit
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'tests', 'fixtures')
+
+
+def load_bytes(name):
+    '''
+    Get the raw bytes of a recorded payload, e.g. load_bytes('agency').
+    '''
+    with open(os.path.join(FIXTURES_DIR, name + '.json'), 'rb') as f:
+        return f.read()
+
+
+def load(name):
+    '''
+    Get a recorded payload decoded into Python objects.
+    '''
+    return json.loads(load_bytes(name))
+
+
+def load_text(filename):
+    '''
+    Get a recorded file that is not JSON, e.g. load_text('calendar.ics').
+    '''
+    with open(os.path.join(FIXTURES_DIR, filename), newline='') as f:
+        return f.read()
+
+
+def repeat_records(name, key, count):
+    '''
+    Build count records by repeating the recorded ones under new ids,
+    e.g. to make a listing as large as a real one.
+
+    args:
+        name (str): recorded payload, e.g. 'launch_verbose'
+        key (str): result key of the payload, e.g. 'launches'
+        count (int): number of records to build
+
+    returns:
+        list of record dictionaries
+    '''
+    recorded = load(name)[key]
+    records = []
+    for i in range(count):
+        record = dict(recorded[i % len(recorded)])
+        record['id'] = i
+        records.append(record)
+    return records
+
+
+def time_call(func, repeat, number=None):
+    '''
+    Time a call with timeit.
+
+    args:
+        func (callable): the call to time
+        repeat (int): timing repetitions; the fastest one is kept
+        number (int): calls per repetition.  Chosen by
+                    : timeit.Timer.autorange() when None
+
+    returns:
+        seconds per call
+    '''
+    timer = timeit.Timer(func)
+    if number is None:
+        number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
@@ -1,9 +1,54 @@
 #!/usr/bin/env python3
 
 
+'''
+launchlibrary
+
+Submodules, and the names below, are imported on first access (PEP 562)
+so that importing the package does not pull in requests, asyncio or
+sqlite3.  A tool that only parses cached ICS data with
+launchlibrary.utils never loads the HTTP stack.
+'''
+
+
+import importlib as _importlib
+
+
 #from launchlibrary.launchlibrary import *
-from launchlibrary import launchlibrary
-from launchlibrary import utils
+_SUBMODULES = frozenset((
+    'aio', 'cache', 'client', 'coalesce', 'columnar', 'decoding',
+    'endpoints', 'expand', 'export', 'index', 'launchlibrary', 'metrics',
+    'models', 'ratelimit', 'retry', 'snapshot', 'sync', 'utils', 'watch'))
+
+# attribute -> submodule defining it
+_ATTRIBUTES = {
+    'LaunchLibraryClient': 'client',
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        # importing a submodule also binds it in the package namespace
+        return _importlib.import_module(__name__ + '.' + name)
+    module = _ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError('module {!r} has no attribute {!r}'
+                             .format(__name__, name))
+    value = getattr(_importlib.import_module(__name__ + '.' + module),
+                    name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | set(_ATTRIBUTES))
+
+
+# a star import loads every submodule
+__all__ = ['aio', 'cache', 'client', 'coalesce', 'columnar', 'decoding',
+           'endpoints', 'expand', 'export', 'index', 'launchlibrary',
+           'metrics', 'models', 'ratelimit', 'retry', 'snapshot', 'sync',
+           'utils', 'watch', 'LaunchLibraryClient',]
 
 
 '''
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+'''
+aio.py
+
+Asyncio interface to the Launch Library API.
+
+Every endpoint function in launchlibrary.py has an async twin here,
+generated from the same endpoint table, that returns the same
+requests.Response object.  An AsyncTokenBucket (see ratelimit.py)
+throttles requests without tying up a thread while waiting for a token.
+
+There is no async HTTP stack here: the package depends on requests
+only, and adding aiohttp or httpx is out of scope.  Requests run on the
+pooled session of a LaunchLibraryClient inside a dedicated thread pool,
+so the event loop never blocks, but every request in flight holds one
+OS thread.  A per-client semaphore, max_concurrency, bounds both the
+requests in flight and the threads.  Coroutines beyond the bound wait
+on the semaphore without a thread, so hundreds of lookups can be
+awaited at once while max_concurrency of them run.
+
+Sizing: a client created by AsyncLaunchLibraryClient() defaults to
+DEFAULT_MAX_CONCURRENCY requests in flight with a connection pool of
+the same size.  One wrapping an existing LaunchLibraryClient, like the
+shared client of the module level coroutines, defaults to that
+client's pool_maxsize so that no connection is opened and thrown away.
+For more in flight through the module level coroutines, install a
+larger pool:
+
+    >>> client.set_default_client(LaunchLibraryClient(pool_maxsize=64))
+
+Beyond a few dozen threads the upstream rate limit, not the thread
+count, is what bounds throughput.
+
+classes:
+    AsyncLaunchLibraryClient
+
+functions:
+    agency
+    agency_type
+    calendar
+    event_type
+    launch
+    launch_event
+    launch_providers
+    launch_status
+    location
+    mission
+    mission_event
+    mission_type
+    pad
+    payload
+    rocket
+    rocket_event
+    rocket_family
+    get_default_async_client
+    set_default_async_client
+'''
+
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from launchlibrary.cache import make_key
+from launchlibrary.client import LaunchLibraryClient, get_default_client
+from launchlibrary.coalesce import AsyncSingleFlight
+from launchlibrary.endpoints import ENDPOINTS, resolve
+from launchlibrary.expand import aexpand_payload, prepare_expand
+from launchlibrary.ratelimit import AsyncTokenBucket
+
+
+# requests in flight, and threads, of a client created with its own pool
+DEFAULT_MAX_CONCURRENCY = 64
+
+
+class AsyncLaunchLibraryClient(object):
+    '''
+    Async wrapper around a LaunchLibraryClient.
+
+    args:
+        client (LaunchLibraryClient): client whose connection pool is
+                                    : shared.  A new one sized to
+                                    : max_concurrency is created when
+                                    : omitted
+        max_concurrency (int): maximum number of requests, and worker
+                             : threads, in flight.  Defaults to the
+                             : pool size of client, or to
+                             : DEFAULT_MAX_CONCURRENCY when client is
+                             : omitted
+        coalesce (bool): let concurrent identical calls on an event loop
+                       : await one request instead of each taking a
+                       : thread.  Defaults to the client's setting
+        rate_limit (float or AsyncTokenBucket): maximum sustained
+                                              : requests per second.
+                                              : Waiting for a token does
+                                              : not hold a thread, so
+                                              : prefer this to the
+                                              : wrapped client's limit
+        **client_kwargs: passed to LaunchLibraryClient when client is
+                       : omitted
+    '''
+
+    def __init__(self, client=None, max_concurrency=None, coalesce=None,
+                 rate_limit=None, **client_kwargs):
+        if client is None:
+            if max_concurrency is None:
+                max_concurrency = client_kwargs.get(
+                    'pool_maxsize', DEFAULT_MAX_CONCURRENCY)
+            client_kwargs.setdefault('pool_maxsize', max_concurrency)
+            if coalesce is not None:
+                client_kwargs.setdefault('coalesce', coalesce)
+            client = LaunchLibraryClient(**client_kwargs)
+            self._owns_client = True
+        else:
+            self._owns_client = False
+        if max_concurrency is None:
+            max_concurrency = client.pool_maxsize
+        if coalesce is None:
+            coalesce = client.single_flight is not None
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.single_flight = AsyncSingleFlight() if coalesce else None
+        if rate_limit is not None and not isinstance(rate_limit,
+                                                     AsyncTokenBucket):
+            rate_limit = AsyncTokenBucket(rate_limit)
+        self.rate_limiter = rate_limit
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix='launchlibrary-aio')
+        self._semaphores = {} # event loop -> asyncio.Semaphore
+        self._lock = threading.Lock()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                # drop semaphores bound to loops that have gone away
+                for old in [l for l in self._semaphores if l.is_closed()]:
+                    del self._semaphores[old]
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, func, *args, **kwargs):
+        '''
+        Run a blocking call on the client's thread pool under the
+        concurrency semaphore, once the rate limiter allows it.
+
+        returns:
+            the result of func(*args, **kwargs)
+        '''
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        queued = time.perf_counter()
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        async with self._semaphore():
+            # the client charges the wait so far to the call's metrics
+            return await loop.run_in_executor(
+                self._executor, self.client._run_queued, queued, call)
+
+    async def call(self, endpoint, params=None):
+        '''
+        Async version of LaunchLibraryClient.call().
+
+        args:
+            endpoint: an endpoints.Endpoint, or an endpoint function
+                    : name or path
+            params (dict): query string parameters
+
+        returns:
+            requests.Response object
+        '''
+        endpoint = resolve(endpoint)
+        if params:
+            params = endpoint.prepare(params)
+        return await self.request(endpoint.path, params)
+
+    async def request(self, path, params=None):
+        '''
+        Async version of LaunchLibraryClient.request().
+
+        args:
+            path (str): endpoint path relative to the base URL
+            params (dict): query string parameters
+
+        returns:
+            requests.Response object
+        '''
+        if self.single_flight is None:
+            return await self.run(self.client.request, path, params)
+        return await self.single_flight.do(make_key(path, params), self.run,
+                                           self.client.request, path, params)
+
+    async def get_json(self, path, params=None):
+        '''
+        Async version of LaunchLibraryClient.get_json().
+
+        args:
+            path (str): endpoint path relative to the base URL
+            params (dict): query string parameters
+
+        returns:
+            the decoded payload, usually a dictionary
+        '''
+        if self.single_flight is None:
+            return await self.run(self.client.get_json, path, params)
+        return await self.single_flight.do(
+            ('json', make_key(path, params)), self.run,
+            self.client.get_json, path, params)
+
+    def close(self):
+        '''
+        Shut down the thread pool and, if the client was created here,
+        its connection pool.
+        '''
+        self._executor.shutdown(wait=False)
+        if self._owns_client:
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_default_async_client = None
+_default_async_client_lock = threading.Lock()
+_default_async_client_wraps_default = False # created here, see below
+
+
+def _outdated(client, sync_client):
+    # a default created here follows client.set_default_client()
+    return client is None or (_default_async_client_wraps_default
+                              and client.client is not sync_client)
+
+
+def get_default_async_client():
+    '''
+    Get the shared async client used by the module level coroutines.
+    Unless one was set with set_default_async_client(), it shares the
+    connection pool of client.get_default_client(), and is replaced
+    when that client is.
+
+    returns:
+        AsyncLaunchLibraryClient
+    '''
+    global _default_async_client, _default_async_client_wraps_default
+    sync_client = get_default_client()
+    client = _default_async_client
+    if _outdated(client, sync_client):
+        previous = None
+        with _default_async_client_lock:
+            if _outdated(_default_async_client, sync_client):
+                previous = _default_async_client
+                _default_async_client = AsyncLaunchLibraryClient(
+                    sync_client)
+                _default_async_client_wraps_default = True
+            client = _default_async_client
+        if previous is not None:
+            previous.close()
+    return client
+
+
+def set_default_async_client(client):
+    '''
+    Replace the shared async client used by the module level
+    coroutines.  The previous client is closed.
+
+    args:
+        client (AsyncLaunchLibraryClient): the new default client, or
+                                         : None to have one created on
+                                         : next use
+    '''
+    global _default_async_client, _default_async_client_wraps_default
+    with _default_async_client_lock:
+        previous, _default_async_client = _default_async_client, client
+        _default_async_client_wraps_default = False
+    if previous is not None and previous is not client:
+        previous.close()
+
+
+def _endpoint_coroutine(name):
+    endpoint = ENDPOINTS[name]
+
+    async def call(expand=None, **kwargs):
+        client = get_default_async_client()
+        if expand is None:
+            return await client.call(endpoint, kwargs)
+        expand, params = prepare_expand(endpoint, expand, kwargs)
+        payload = await client.get_json(endpoint.path, params)
+        return await aexpand_payload(payload, endpoint, expand,
+                                     client=client)
+
+    call.__name__ = call.__qualname__ = endpoint.name
+    call.__doc__ = '''
+    Async version of launchlibrary.{}().
+
+    returns:
+        requests.Response object, or the decoded listing when expand=
+        is given
+    '''.format(endpoint.name)
+    return call
+
+
+# generated from the endpoint table, see endpoints.py for their kwargs
+agency = _endpoint_coroutine('agency')
+agency_type = _endpoint_coroutine('agency_type')
+calendar = _endpoint_coroutine('calendar')
+event_type = _endpoint_coroutine('event_type')
+launch = _endpoint_coroutine('launch')
+launch_event = _endpoint_coroutine('launch_event')
+launch_providers = _endpoint_coroutine('launch_providers')
+launch_status = _endpoint_coroutine('launch_status')
+location = _endpoint_coroutine('location')
+mission = _endpoint_coroutine('mission')
+mission_event = _endpoint_coroutine('mission_event')
+mission_type = _endpoint_coroutine('mission_type')
+pad = _endpoint_coroutine('pad')
+payload = _endpoint_coroutine('payload')
+rocket = _endpoint_coroutine('rocket')
+rocket_event = _endpoint_coroutine('rocket_event')
+rocket_family = _endpoint_coroutine('rocket_family')
+
+
+__all__ = ['AsyncLaunchLibraryClient', 'DEFAULT_MAX_CONCURRENCY', 'agency',
+           'agency_type', 'calendar', 'event_type', 'launch', 'launch_event',
+           'launch_providers', 'launch_status', 'location', 'mission',
+           'mission_event', 'mission_type', 'pad', 'payload', 'rocket',
+           'rocket_event', 'rocket_family', 'get_default_async_client',
+           'set_default_async_client',]
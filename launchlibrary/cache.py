@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+
+'''
+cache.py
+
+Response caches for the LaunchLibraryClient.
+
+Entries are keyed on the endpoint path plus the normalized query
+parameters.  Every endpoint has its own time to live; expired entries
+are kept until evicted so the client can revalidate them with a
+conditional request (If-None-Match / If-Modified-Since) instead of
+downloading the body again, or serve them while they are refreshed in
+the background (stale-while-revalidate), or while offline.
+
+classes:
+    OfflineCacheMiss
+    CacheEntry
+    BaseCache
+    MemoryCache
+    SQLiteCache
+
+functions:
+    make_key
+'''
+
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from requests import RequestException, Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from launchlibrary.endpoints import ENDPOINTS
+
+
+# time to live in seconds for each endpoint path, from the endpoint
+# table.  Reference data hardly ever changes, launch data changes all
+# the time.
+DEFAULT_TTLS = {e.path: e.ttl for e in ENDPOINTS.values()}
+DEFAULT_TTL = 300
+
+
+class OfflineCacheMiss(RequestException):
+    '''
+    Raised by a client in offline mode when a request cannot be served
+    from its cache or mirror.
+
+    attributes:
+        key (str): cache key of the request, see make_key()
+    '''
+
+    def __init__(self, message, key):
+        super().__init__(message)
+        self.key = key
+
+
+def make_key(path, params=None):
+    '''
+    Build the cache key for a request.  Parameters that are None are
+    dropped and the rest are compared by their string value, so
+    launch(id=5) and launch(id='5') share an entry.
+
+    args:
+        path (str): endpoint path, e.g. 'launch'
+        params (dict): query string parameters
+
+    returns:
+        str
+    '''
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items()
+                   if v is not None)
+    if not items:
+        return path
+    return path + '?' + '&'.join('{}={}'.format(k, v) for k, v in items)
+
+
+# describe the body as sent, not as decoded and stored
+_WIRE_HEADERS = frozenset(('content-encoding', 'transfer-encoding',
+                           'content-length'))
+
+
+def _body_headers(headers, body):
+    # headers of a response whose body is stored decoded
+    headers = {name: value for name, value in headers.items()
+               if name.lower() not in _WIRE_HEADERS}
+    headers['Content-Length'] = str(len(body))
+    return headers
+
+
+class CacheEntry(namedtuple('CacheEntry', ['status', 'headers', 'body',
+                                           'url', 'stored_at',
+                                           'expires_at'])):
+    '''
+    A cached response.
+
+    fields:
+        status (int): HTTP status code
+        headers (dict): response headers
+        body (bytes): response body
+        url (str): URL the response was fetched from
+        stored_at (float): time.time() when the body was downloaded
+        expires_at (float): time.time() after which the entry must be
+                          : revalidated
+    '''
+
+    __slots__ = ()
+
+    @classmethod
+    def from_response(cls, resp, ttl, now=None):
+        '''
+        Build an entry from a requests.Response.  The body is stored
+        decoded, so the headers describing the wire encoding are
+        dropped and Content-Length is set to the stored size.
+        '''
+        now = time.time() if now is None else now
+        body = resp.content
+        return cls(resp.status_code, _body_headers(resp.headers, body), body,
+                   resp.url, now, now + ttl)
+
+    def is_fresh(self, now=None):
+        return (time.time() if now is None else now) < self.expires_at
+
+    @property
+    def etag(self):
+        return CaseInsensitiveDict(self.headers).get('ETag')
+
+    @property
+    def last_modified(self):
+        return CaseInsensitiveDict(self.headers).get('Last-Modified')
+
+    def revalidated(self, headers, ttl, now=None):
+        '''
+        Get a copy of the entry renewed by a 304 Not Modified response.
+        The body is kept and any new validators are picked up.
+
+        args:
+            headers (dict): headers of the 304 response
+            ttl (float): time to live in seconds
+        '''
+        now = time.time() if now is None else now
+        merged = CaseInsensitiveDict(self.headers)
+        for name in ('ETag', 'Last-Modified'):
+            if name in headers:
+                merged[name] = headers[name]
+        return self._replace(headers=dict(merged), expires_at=now + ttl)
+
+    def conditional_headers(self):
+        '''
+        Headers that turn a request for this entry into a conditional
+        request.
+
+        returns:
+            dict, empty if the server sent no validators
+        '''
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        '''
+        Rebuild a requests.Response carrying the cached body.
+
+        returns:
+            requests.Response object
+        '''
+        resp = Response()
+        resp.status_code = self.status
+        # entries stored by older versions kept the wire headers
+        resp.headers = CaseInsensitiveDict(_body_headers(self.headers,
+                                                         self.body))
+        resp._content = self.body
+        resp.url = self.url
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.reason = 'OK'
+        return resp
+
+
+class BaseCache(object):
+    '''
+    Common behaviour of the response caches: TTL lookup and counters.
+    Subclasses implement get(), set() and clear().
+
+    args:
+        ttls (dict): time to live in seconds per endpoint path, merged
+                   : over DEFAULT_TTLS.  A TTL of 0 disables caching
+                   : for that endpoint
+        default_ttl (float): time to live for endpoints not in ttls
+    '''
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.stale = 0
+        self._stats_lock = threading.Lock()
+
+    def ttl_for(self, path):
+        '''
+        Get the time to live of an endpoint path in seconds.
+        '''
+        return self.ttls.get(path, self.default_ttl)
+
+    def record(self, counter, n=1):
+        '''
+        Increment one of the hits, misses, evictions, revalidations or
+        stale counters.  stale counts expired entries served as they
+        are.
+        '''
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + n)
+
+    def stats(self):
+        '''
+        Get the cache counters.
+
+        returns:
+            dictionary with hits, misses, evictions, revalidations,
+            stale and size
+        '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+                'revalidations': self.revalidations,
+                'stale': self.stale, 'size': len(self)}
+
+    def get(self, key):
+        '''
+        Get the entry stored under key, fresh or not.
+
+        returns:
+            CacheEntry or None
+        '''
+        raise NotImplementedError
+
+    def set(self, key, entry):
+        '''
+        Store an entry under key.
+        '''
+        raise NotImplementedError
+
+    def clear(self):
+        '''
+        Remove every entry.
+        '''
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    '''
+    In-process cache bounded by entry count with LRU eviction.
+
+    args:
+        maxsize (int): maximum number of entries
+        ttls (dict): see BaseCache
+        default_ttl (float): see BaseCache
+    '''
+
+    def __init__(self, maxsize=1024, ttls=None, default_ttl=DEFAULT_TTL):
+        super().__init__(ttls, default_ttl)
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, entry):
+        evicted = 0
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.record('evictions', evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(BaseCache):
+    '''
+    Persistent cache stored in a single SQLite file.
+
+    The database runs in WAL mode so several processes on one host can
+    share the file, reading concurrently while one of them writes.
+    Every thread gets its own connection.  Entries that expired more
+    than keep_stale seconds ago are swept periodically, and once the
+    stored bodies exceed max_bytes the entries closest to expiry are
+    evicted first.
+
+    To have the module level endpoint functions use it:
+        client.set_default_client(
+            client.LaunchLibraryClient(cache=SQLiteCache(path)))
+
+    args:
+        path (str): path of the database file.  It is created if needed
+        max_bytes (int): cap on the total size of stored bodies
+        keep_stale (float): seconds an expired entry is kept around for
+                          : revalidation before it is swept
+        sweep_interval (float): minimum seconds between expiry sweeps
+        ttls (dict): see BaseCache
+        default_ttl (float): see BaseCache
+    '''
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            status INTEGER NOT NULL,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            url TEXT NOT NULL,
+            stored_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+
+        -- running total of entries.size, kept by the triggers below so
+        -- that checking the size cap does not scan the table
+        CREATE TABLE IF NOT EXISTS totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            size INTEGER NOT NULL
+        );
+        INSERT INTO totals SELECT 1, (SELECT total(size) FROM entries)
+            WHERE NOT EXISTS (SELECT 1 FROM totals);
+        CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+        BEGIN
+            UPDATE totals SET size = size + new.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size
+            ON entries
+        BEGIN
+            UPDATE totals SET size = size + new.size - old.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+        BEGIN
+            UPDATE totals SET size = size - old.size;
+        END;
+    '''
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, keep_stale=86400,
+                 sweep_interval=60, ttls=None, default_ttl=DEFAULT_TTL):
+        super().__init__(ttls, default_ttl)
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.keep_stale = keep_stale
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        self._connection().executescript(self._SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT status, headers, body, url, stored_at, expires_at '
+            'FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        status, headers, body, url, stored_at, expires_at = row
+        return CacheEntry(status, json.loads(headers), bytes(body), url,
+                          stored_at, expires_at)
+
+    def set(self, key, entry):
+        conn = self._connection()
+        # an upsert rather than INSERT OR REPLACE, whose implicit delete
+        # does not fire the delete trigger
+        conn.execute(
+            'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET status = excluded.status, '
+            'headers = excluded.headers, body = excluded.body, '
+            'url = excluded.url, stored_at = excluded.stored_at, '
+            'expires_at = excluded.expires_at, size = excluded.size',
+            (key, entry.status, json.dumps(entry.headers), entry.body,
+             entry.url, entry.stored_at, entry.expires_at, len(entry.body)))
+        now = time.time()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.sweep(now)
+        self._enforce_size_cap(conn)
+
+    def sweep(self, now=None):
+        '''
+        Delete entries that expired more than keep_stale seconds ago.
+
+        returns:
+            number of entries deleted
+        '''
+        now = time.time() if now is None else now
+        deleted = self._connection().execute(
+            'DELETE FROM entries WHERE expires_at < ?',
+            (now - self.keep_stale,)).rowcount
+        if deleted:
+            self.record('evictions', deleted)
+        return deleted
+
+    def _enforce_size_cap(self, conn):
+        total, = conn.execute('SELECT size FROM totals').fetchone()
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute(
+                'SELECT key, size FROM entries ORDER BY expires_at'):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany('DELETE FROM entries WHERE key = ?', victims)
+        self.record('evictions', len(victims))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM entries')
+
+    def close(self):
+        '''
+        Close the calling thread's connection to the database.
+        '''
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def __len__(self):
+        count, = self._connection().execute(
+            'SELECT COUNT(*) FROM entries').fetchone()
+        return count
+
+
+__all__ = ['BaseCache', 'CacheEntry', 'MemoryCache', 'OfflineCacheMiss',
+           'SQLiteCache', 'make_key',]
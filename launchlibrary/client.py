@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+
+'''
+client.py
+
+HTTP client for the Launch Library API.
+
+The LaunchLibraryClient owns a pooled requests.Session so that repeated
+calls reuse TCP/TLS connections instead of paying a new handshake on
+every request.  Responses can optionally be kept in a cache (see
+cache.py) and revalidated with conditional requests, either before
+answering or, with stale_while_revalidate, in the background while the
+expired response is served.  In offline mode nothing is sent and calls
+are answered from the cache or a sync.Mirror only.  JSON bodies are
+decoded with the fastest installed backend (see decoding.py).  Requests
+can be throttled with a token bucket (see ratelimit.py) and retried,
+behind a circuit breaker, when the API refuses them (see retry.py).
+Hooks receive the timings of every call (see metrics.py).
+The module level endpoint functions in launchlibrary.py are thin
+wrappers around a lazily created default client.
+
+classes:
+    LaunchLibraryClient
+
+functions:
+    get_default_client
+    set_default_client
+'''
+
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from launchlibrary import models
+from launchlibrary.cache import CacheEntry, OfflineCacheMiss, make_key
+from launchlibrary.coalesce import SingleFlight
+from launchlibrary.decoding import accept_encoding, get_decoder
+from launchlibrary.endpoints import resolve
+from launchlibrary.metrics import RequestMetrics
+from launchlibrary.ratelimit import TokenBucket
+from launchlibrary.retry import RetryPolicy
+
+
+BASE_URL = 'https://launchlibrary.net/1.4/'
+
+DEFAULT_TIMEOUT = (5.0, 30.0) # (connect, read) seconds
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_REFRESH_WORKERS = 2
+
+
+class LaunchLibraryClient(object):
+    '''
+    Client for the Launch Library API backed by a pooled
+    requests.Session.
+
+    args:
+        base_url (str): root URL of the API.  Defaults to BASE_URL
+        timeout (float or tuple): timeout passed to requests, either a
+                                : single number or a (connect, read)
+                                : tuple.  None disables timeouts
+        pool_connections (int): number of per-host connection pools
+                              : to cache
+        pool_maxsize (int): maximum number of connections kept alive
+                          : per host
+        pool_block (bool): block when the pool is exhausted instead of
+                         : opening throw-away connections
+        keep_alive (bool): reuse connections between requests
+        headers (dict): extra headers sent with every request
+        session (requests.Session): use an existing session instead of
+                                  : creating one.  The session is not
+                                  : closed by close()
+        cache (cache.BaseCache): response cache, e.g. cache.MemoryCache.
+                               : Caching is off when None
+        decoder (str or callable): JSON backend name passed to
+                                 : decoding.get_decoder(), or a function
+                                 : decoding bytes.  Defaults to the
+                                 : fastest installed backend
+        coalesce (bool): share one in-flight request, and its decoded
+                       : result, between concurrent identical calls
+                       : (see coalesce.py)
+        rate_limit (float or TokenBucket): maximum sustained requests
+                                         : per second, shared by every
+                                         : call made through the client
+                                         : (see ratelimit.py).  No limit
+                                         : when None
+        retry (int or retry.RetryPolicy): retry connection errors, 429
+                                        : and 5xx responses, waiting as
+                                        : told by Retry-After or with
+                                        : jittered exponential backoff.
+                                        : An int is a maximum number of
+                                        : retries.  No retries when None
+        breaker (retry.CircuitBreaker): fail fast with
+                                      : retry.CircuitOpenError after
+                                      : repeated failures
+        hooks (list): callables receiving a metrics.RequestMetrics after
+                    : every request() and get_json() call
+        compression (bool): ask for every compressed encoding that can
+                          : be decompressed here (gzip, deflate, and br
+                          : or zstd when brotli or zstandard are
+                          : installed).  False asks for uncompressed
+                          : bodies
+        stale_while_revalidate (float): answer straight from the cache
+                                      : with a response expired for up
+                                      : to this many seconds, and
+                                      : refresh it in a background
+                                      : thread.  Needs a cache
+        offline (bool): never touch the network.  Calls are answered
+                      : from the cache, fresh or expired, or for id
+                      : lookups from mirror, and raise
+                      : cache.OfflineCacheMiss otherwise.  May be
+                      : switched at any time through the offline
+                      : attribute
+        mirror (sync.Mirror): records served to id lookups, e.g.
+                            : launch(id=1590), missing from the cache
+                            : in offline mode
+    '''
+
+    def __init__(self, base_url=BASE_URL, timeout=DEFAULT_TIMEOUT,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, headers=None, session=None, cache=None,
+                 decoder=None, coalesce=False, rate_limit=None,
+                 retry=None, breaker=None, hooks=None, compression=True,
+                 stale_while_revalidate=None, offline=False, mirror=None):
+        if not base_url.endswith('/'):
+            base_url += '/'
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self._owns_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections,
+                                  pool_maxsize=pool_maxsize,
+                                  pool_block=pool_block)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        session.headers['Accept-Encoding'] = (accept_encoding() if compression
+                                              else 'identity')
+        if headers:
+            session.headers.update(headers)
+        self.session = session
+        self.cache = cache
+        self.decode = decoder if callable(decoder) else get_decoder(decoder)
+        self.single_flight = SingleFlight() if coalesce else None
+        if rate_limit is not None and not isinstance(rate_limit,
+                                                     TokenBucket):
+            rate_limit = TokenBucket(rate_limit)
+        self.rate_limiter = rate_limit
+        if isinstance(retry, bool):
+            retry = RetryPolicy() if retry else None
+        elif isinstance(retry, int):
+            retry = RetryPolicy(max_retries=retry)
+        self.retry = retry
+        self.breaker = breaker
+        self.hooks = list(hooks or ())
+        self.stale_while_revalidate = stale_while_revalidate
+        self.offline = offline
+        self.mirror = mirror
+        self._local = threading.local()
+        self._refresher = None # ThreadPoolExecutor, created on first use
+        self._refreshing = set() # keys being refreshed
+        self._refresh_lock = threading.Lock()
+
+    def url(self, path):
+        '''
+        Build the absolute URL for an endpoint path.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'launch'
+
+        returns:
+            str
+        '''
+        return self.base_url + path.lstrip('/')
+
+    def request(self, path, params=None, headers=None):
+        '''
+        Issue a GET request against an endpoint.  When the client has a
+        cache, fresh entries are served without touching the network
+        and expired ones are revalidated.  When it coalesces requests,
+        concurrent identical calls receive the same Response object.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'launch'
+            params (dict): query string parameters
+            headers (dict): extra headers for this request, e.g. the
+                          : caller's own If-None-Match.  The request
+                          : then bypasses the cache and coalescing
+
+        returns:
+            requests.Response object
+
+        raises:
+            cache.OfflineCacheMiss in offline mode if the response is
+            not cached, or headers are given
+        '''
+        if headers and self.offline:
+            raise OfflineCacheMiss('offline, not sending {} with headers'
+                                   .format(path), make_key(path, params))
+        metrics = self._start_metrics(path)
+        try:
+            if headers:
+                resp = self._send(path, params, headers, metrics=metrics)
+                if metrics is not None:
+                    metrics.cache = 'bypass'
+            else:
+                resp = self._shared_request(path, params, metrics)
+        except Exception as e:
+            self._emit(metrics, error=e)
+            raise
+        self._emit(metrics, resp)
+        return resp
+
+    def _shared_request(self, path, params, metrics=None):
+        if self.single_flight is None:
+            return self._request(path, params, metrics)
+        resp = self.single_flight.do(make_key(path, params), self._request,
+                                     path, params, metrics)
+        if metrics is not None and metrics.cache is None:
+            # another call did the work
+            metrics.cache = 'coalesced'
+        return resp
+
+    def _request(self, path, params, metrics=None):
+        if self.cache is None:
+            if self.offline:
+                return self._offline_response(path, params, metrics)
+            if metrics is not None:
+                metrics.cache = 'bypass'
+            return self._send(path, params, metrics=metrics)
+        return self._cached_request(path, params, metrics)
+
+    def call(self, endpoint, params=None):
+        '''
+        Issue a GET request against an endpoint of the table in
+        endpoints.py, checking its parameters first.
+
+        args:
+            endpoint: an endpoints.Endpoint, or an endpoint function
+                    : name or path such as 'launch_providers' or 'lsp'
+            params (dict): query string parameters
+
+        returns:
+            requests.Response object
+
+        raises:
+            TypeError if the endpoint does not accept a parameter
+        '''
+        endpoint = resolve(endpoint)
+        if params:
+            params = endpoint.prepare(params)
+        return self.request(endpoint.path, params)
+
+    def stream(self, path, params=None):
+        '''
+        Issue a GET request whose body is read lazily, e.g. to feed
+        utils.iter_ics_events() with a large calendar.  The cache is
+        bypassed.  Close the response, or use it as a context manager,
+        to return the connection to the pool.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'calendar'
+            params (dict): query string parameters
+
+        returns:
+            requests.Response object
+
+        raises:
+            cache.OfflineCacheMiss in offline mode
+        '''
+        if self.offline:
+            raise OfflineCacheMiss('offline, not streaming {}'.format(path),
+                                   make_key(path, params))
+        metrics = self._start_metrics(path)
+        try:
+            resp = self._send(path, params, stream=True, metrics=metrics)
+        except Exception as e:
+            self._emit(metrics, error=e)
+            raise
+        if metrics is not None:
+            metrics.cache = 'bypass'
+        self._emit(metrics, resp)
+        return resp
+
+    def get_json(self, path, params=None):
+        '''
+        Issue a GET request and decode its JSON body straight from the
+        response bytes.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'launch'
+            params (dict): query string parameters
+
+        returns:
+            the decoded payload, usually a dictionary.  With coalescing
+            on, concurrent callers receive the same object and should
+            not modify it
+
+        raises:
+            requests.HTTPError if the response has an error status
+        '''
+        metrics = self._start_metrics(path)
+        try:
+            if self.single_flight is None:
+                resp, payload = self._get_json(path, params, metrics)
+            else:
+                # concurrent callers share the decoded payload too
+                resp, payload = self.single_flight.do(
+                    ('json', make_key(path, params)), self._get_json, path,
+                    params, metrics)
+                if metrics is not None and metrics.cache is None:
+                    # another call did the work
+                    metrics.cache = 'coalesced'
+        except Exception as e:
+            self._emit(metrics, error=e)
+            raise
+        self._emit(metrics, resp)
+        return payload
+
+    def _get_json(self, path, params, metrics=None):
+        # the response and its decoded payload
+        resp = self._shared_request(path, params, metrics)
+        resp.raise_for_status()
+        if metrics is None:
+            return resp, self.decode(resp.content)
+        metrics.status = resp.status_code
+        start = time.perf_counter()
+        payload = self.decode(resp.content)
+        metrics.decode = time.perf_counter() - start
+        return resp, payload
+
+    def get_cached_json(self, path, params=None):
+        '''
+        Get the decoded payload of a request if the cache holds a fresh
+        response for it, without touching the network.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'launch'
+            params (dict): query string parameters
+
+        returns:
+            the decoded payload, or None if there is no fresh entry
+        '''
+        cache = self.cache
+        if cache is None or cache.ttl_for(path) <= 0:
+            return None
+        entry = cache.get(make_key(path, params))
+        if entry is None or not entry.is_fresh() or entry.status != 200:
+            return None
+        cache.record('hits')
+        return self.decode(entry.body)
+
+    def get_records(self, path, model, params=None):
+        '''
+        Issue a GET request for a listing and wrap its records in a
+        model from models.py.
+
+        args:
+            path (str): endpoint path relative to base_url, e.g. 'launch'
+            model (type): models.Record subclass, e.g. models.Launch
+            params (dict): query string parameters
+
+        returns:
+            list of model instances
+        '''
+        return models.from_payload(self.get_json(path, params), model)
+
+    def add_hook(self, hook):
+        '''
+        Register a callable receiving a metrics.RequestMetrics after
+        every request() and get_json() call.
+        '''
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _start_metrics(self, path):
+        if not self.hooks:
+            return None
+        metrics = RequestMetrics(path)
+        # set by the async client's worker threads
+        queued = getattr(self._local, 'queued', None)
+        if queued is not None:
+            self._local.queued = None
+            metrics.queue_wait = metrics.started - queued
+            metrics.started = queued
+        return metrics
+
+    def _run_queued(self, queued, func):
+        # run func, charging the time since queued to its queue_wait
+        self._local.queued = queued
+        try:
+            return func()
+        finally:
+            self._local.queued = None
+
+    def _emit(self, metrics, resp=None, error=None):
+        if metrics is None:
+            return
+        metrics.total = time.perf_counter() - metrics.started
+        metrics.error = error
+        if resp is None:
+            resp = getattr(error, 'response', None)
+        if resp is not None:
+            metrics.status = resp.status_code
+        for hook in self.hooks:
+            hook(metrics)
+
+    def _send(self, path, params, headers=None, stream=False,
+              metrics=None):
+        url = self.url(path)
+        retry, breaker = self.retry, self.breaker
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.before_request()
+            if self.rate_limiter is not None:
+                waited = self.rate_limiter.acquire()
+                if metrics is not None:
+                    metrics.queue_wait += waited
+            sent = time.perf_counter()
+            try:
+                resp = self.session.get(url, params=params, headers=headers,
+                                        timeout=self.timeout, stream=stream)
+            except requests.RequestException as e:
+                if breaker is not None:
+                    breaker.record_failure()
+                if retry is None or not retry.should_retry(attempt, error=e):
+                    raise
+                delay = retry.delay(attempt)
+            else:
+                if metrics is not None:
+                    # elapsed stops when the headers arrive; the body is
+                    # read after that unless streaming
+                    metrics.ttfb = resp.elapsed.total_seconds()
+                    if not stream:
+                        metrics.download = max(0.0, time.perf_counter()
+                                               - sent - metrics.ttfb)
+                        metrics.bytes += len(resp.content)
+                        metrics.wire_bytes += _wire_bytes(resp)
+                failed = resp.status_code == 429 or resp.status_code >= 500
+                if breaker is not None:
+                    if failed:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if retry is None or not retry.should_retry(attempt, resp):
+                    return resp
+                delay = retry.delay(attempt, resp)
+                if resp.status_code == 429 and self.rate_limiter is not None:
+                    # slow every caller down, not just this one
+                    self.rate_limiter.pause(delay)
+                resp.close()
+            attempt += 1
+            if metrics is not None:
+                metrics.retries = attempt
+            time.sleep(delay)
+
+    def _cached_request(self, path, params, metrics=None):
+        cache = self.cache
+        ttl = cache.ttl_for(path)
+        if ttl <= 0:
+            if self.offline:
+                return self._offline_response(path, params, metrics)
+            if metrics is not None:
+                metrics.cache = 'bypass'
+            return self._send(path, params, metrics=metrics)
+        key = make_key(path, params)
+        entry = cache.get(key)
+        if entry is not None and entry.is_fresh():
+            cache.record('hits')
+            if metrics is not None:
+                metrics.cache = 'hit'
+            return entry.to_response()
+        if entry is not None and self._serves_stale(entry):
+            cache.record('stale')
+            if metrics is not None:
+                metrics.cache = 'stale'
+            if not self.offline:
+                self._refresh_in_background(path, params, key, entry, ttl)
+            return entry.to_response()
+        if self.offline:
+            return self._offline_response(path, params, metrics)
+        return self._fetch(path, params, key, entry, ttl, metrics)
+
+    def _serves_stale(self, entry):
+        if self.offline:
+            return True
+        window = self.stale_while_revalidate
+        return window is not None and time.time() - entry.expires_at <= window
+
+    def _fetch(self, path, params, key, entry, ttl, metrics=None):
+        # download, or revalidate entry, and store the result
+        cache = self.cache
+        headers = None
+        if entry is not None:
+            headers = entry.conditional_headers() or None
+        resp = self._send(path, params, headers, metrics=metrics)
+        if entry is not None and resp.status_code == 304:
+            # not modified: keep the cached body, pick up new validators
+            entry = entry.revalidated(resp.headers, ttl)
+            cache.set(key, entry)
+            cache.record('revalidations')
+            if metrics is not None:
+                metrics.cache = 'revalidated'
+            return entry.to_response()
+        cache.record('misses')
+        if metrics is not None:
+            metrics.cache = 'miss'
+        if resp.status_code == 200:
+            cache.set(key, CacheEntry.from_response(resp, ttl))
+        return resp
+
+    def _refresh_in_background(self, path, params, key, entry, ttl):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(
+                    max_workers=DEFAULT_REFRESH_WORKERS,
+                    thread_name_prefix='launchlibrary-refresh')
+        self._refresher.submit(self._refresh, path, params, key, entry, ttl)
+
+    def _refresh(self, path, params, key, entry, ttl):
+        metrics = self._start_metrics(path)
+        try:
+            resp = self._fetch(path, params, key, entry, ttl, metrics)
+        except requests.RequestException as e:
+            # the stale entry keeps being served until a refresh works
+            self._emit(metrics, error=e)
+        else:
+            self._emit(metrics, resp)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(key)
+
+    def _offline_response(self, path, params, metrics=None):
+        # answer an id lookup from the mirror, or give up
+        key = make_key(path, params)
+        params = params or {}
+        id = str(params.get('id', ''))
+        record = None
+        if (self.mirror is not None and id.isdigit()
+                and set(params) <= {'id', 'mode'}):
+            try:
+                endpoint = resolve(path)
+            except ValueError:
+                endpoint = None
+            if endpoint is not None and endpoint.paginated:
+                record = self.mirror.get(endpoint.path, int(id))
+        if record is None:
+            raise OfflineCacheMiss('offline and not cached: ' + key, key)
+        body = json.dumps({endpoint.result_key: [record], 'total': 1,
+                           'count': 1, 'offset': 0}).encode('utf-8')
+        if metrics is not None:
+            metrics.cache = 'mirror'
+        now = time.time()
+        return CacheEntry(200, {'Content-Type': 'application/json'}, body,
+                          self.url(path), now, now).to_response()
+
+    def close(self):
+        '''
+        Release pooled connections held by the client, once background
+        refreshes in progress are done.
+        '''
+        with self._refresh_lock:
+            refresher, self._refresher = self._refresher, None
+        if refresher is not None:
+            refresher.shutdown(cancel_futures=True)
+            with self._refresh_lock:
+                # cancelled refreshes never ran to forget their keys
+                self._refreshing.clear()
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _wire_bytes(resp):
+    # bytes read off the socket, before decompression
+    try:
+        return resp.raw.tell()
+    except AttributeError:
+        return len(resp.content)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    '''
+    Get the shared client used by the module level endpoint functions.
+    The client is created on first use.
+
+    returns:
+        LaunchLibraryClient
+    '''
+    global _default_client
+    client = _default_client
+    if client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = LaunchLibraryClient()
+            client = _default_client
+    return client
+
+
+def set_default_client(client):
+    '''
+    Replace the shared client used by the module level endpoint
+    functions, e.g. to change the pool size or base URL.  The previous
+    client is closed.
+
+    args:
+        client (LaunchLibraryClient): the new default client, or None to
+                                    : have one created on next use
+    '''
+    global _default_client
+    with _default_client_lock:
+        previous, _default_client = _default_client, client
+    if previous is not None and previous is not client:
+        previous.close()
+
+
+__all__ = ['LaunchLibraryClient', 'get_default_client',
+           'set_default_client',]
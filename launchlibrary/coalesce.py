@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+'''
+coalesce.py
+
+Single-flight request coalescing.
+
+When several callers ask for the same thing at the same time only the
+first one (the leader) does the work; the others wait for it and share
+its result, or its exception.  Once the call completes the key is
+forgotten, so later callers start a new one.  Results are never cached
+here, see cache.py for that.
+
+classes:
+    SingleFlight
+    AsyncSingleFlight
+'''
+
+
+import threading
+
+
+class _Counters(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._stats_lock = threading.Lock()
+
+    def _count(self, coalesced):
+        with self._stats_lock:
+            self.calls += 1
+            if coalesced:
+                self.coalesced += 1
+
+    def stats(self):
+        '''
+        Get the coalescing counters.
+
+        returns:
+            dictionary with calls (every call made through do()),
+            coalesced (calls that shared another call's result) and
+            in_flight (keys currently being worked on)
+        '''
+        return {'calls': self.calls, 'coalesced': self.coalesced,
+                'in_flight': len(self)}
+
+
+class _Call(object):
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(_Counters):
+    '''
+    Coalesces identical concurrent calls made from several threads.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        '''
+        Call func(*args, **kwargs) unless a call with the same key is
+        already running, in which case wait for that call instead.
+
+        args:
+            key (hashable): identifies identical calls
+            func (callable): the work to do
+
+        returns:
+            the result of the call
+
+        raises:
+            whatever the call raised
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(not leader)
+        if leader:
+            try:
+                call.result = func(*args, **kwargs)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight(_Counters):
+    '''
+    Coalesces identical concurrent coroutine calls on an event loop.
+
+    The work runs in its own task, so cancelling one of the waiting
+    callers, even the first one, does not cancel it for the others.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._tasks = {} # (event loop, key) -> asyncio.Task
+
+    async def do(self, key, func, *args, **kwargs):
+        '''
+        Await func(*args, **kwargs) unless a call with the same key is
+        already running on this event loop, in which case await that
+        call instead.
+
+        args:
+            key (hashable): identifies identical calls
+            func (coroutine function): the work to do
+
+        returns:
+            the result of the call
+
+        raises:
+            whatever the call raised
+        '''
+        # only loaded by async callers, it is slow to import
+        import asyncio
+
+        task_key = (asyncio.get_running_loop(), key)
+        task = self._tasks.get(task_key)
+        self._count(task is not None)
+        if task is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[task_key] = task
+            task.add_done_callback(
+                lambda _: self._tasks.pop(task_key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+__all__ = ['AsyncSingleFlight', 'SingleFlight',]
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+
+'''
+columnar.py
+
+Columnar export of launch, agency and rocket listings.
+
+A ColumnBuilder flattens records into one list per column as pages
+arrive, so paginated fetches can be appended batch by batch and the
+decoded page dictionaries dropped.  The columns are converted to a
+pyarrow.Table or a pandas.DataFrame in one go, with the date columns
+parsed vectorized by the target library rather than one string at a
+time.  pyarrow and pandas are optional and only imported when used.
+
+    >>> builder = ColumnBuilder('launch')
+    >>> for page in pages:
+    ...     builder.append(page)
+    >>> df = builder.to_dataframe()
+
+classes:
+    Column
+    ColumnBuilder
+
+functions:
+    parse_stamp
+    net_stamp
+    to_arrow
+    to_dataframe
+'''
+
+
+import calendar
+import time
+from collections import namedtuple
+
+
+# date formats used by the API
+NET_FORMAT = '%B %d, %Y %H:%M:%S UTC' # net, windowstart, windowend
+CHANGED_FORMAT = '%Y-%m-%d %H:%M:%S' # changed
+
+
+def parse_stamp(value, date_format=NET_FORMAT):
+    '''
+    Parse a date of the API, e.g. a launch's net or windowstart.
+
+    args:
+        value (str): the date
+        date_format (str): NET_FORMAT or CHANGED_FORMAT
+
+    returns:
+        UTC timestamp as an int, or None if value is missing or
+        malformed
+    '''
+    try:
+        return calendar.timegm(time.strptime(value, date_format))
+    except (TypeError, ValueError):
+        return None
+
+
+def net_stamp(record):
+    '''
+    Get the NET of a launch: its netstamp, or when that is missing or 0
+    (a NET not known to the second) its net string parsed.
+
+    args:
+        record (dict): launch record, in any mode
+
+    returns:
+        UTC timestamp, or None if the launch has no NET
+    '''
+    return record.get('netstamp') or parse_stamp(record.get('net'))
+
+
+class Column(namedtuple('Column', ['name', 'path', 'date_format'])):
+    '''
+    A flattened column.
+
+    fields:
+        name (str): column name
+        path (tuple): keys (and list indexes) leading to the value in a
+                    : record, e.g. ('rocket', 'id')
+        date_format (str): strptime format if the column holds dates
+    '''
+
+    __slots__ = ()
+
+    def __new__(cls, name, path=None, date_format=None):
+        return super().__new__(cls, name, path or (name,), date_format)
+
+
+LAUNCH_COLUMNS = (
+    Column('id'),
+    Column('name'),
+    Column('net', date_format=NET_FORMAT),
+    Column('windowstart', date_format=NET_FORMAT),
+    Column('windowend', date_format=NET_FORMAT),
+    Column('status'),
+    Column('inhold'),
+    Column('tbdtime'),
+    Column('tbddate'),
+    Column('probability'),
+    Column('changed', date_format=CHANGED_FORMAT),
+    Column('lsp_id', ('lsp', 'id')),
+    Column('lsp_name', ('lsp', 'name')),
+    Column('lsp_abbrev', ('lsp', 'abbrev')),
+    Column('lsp_countryCode', ('lsp', 'countryCode')),
+    Column('rocket_id', ('rocket', 'id')),
+    Column('rocket_name', ('rocket', 'name')),
+    Column('rocket_familyname', ('rocket', 'familyname')),
+    Column('location_id', ('location', 'id')),
+    Column('location_name', ('location', 'name')),
+    Column('location_countryCode', ('location', 'countryCode')),
+    Column('pad_id', ('location', 'pads', 0, 'id')),
+    Column('pad_name', ('location', 'pads', 0, 'name')),
+    Column('mission_name', ('missions', 0, 'name')),
+    Column('mission_type', ('missions', 0, 'typeName')),
+)
+
+AGENCY_COLUMNS = (
+    Column('id'),
+    Column('name'),
+    Column('abbrev'),
+    Column('countryCode'),
+    Column('type'),
+    Column('islsp'),
+    Column('wikiURL'),
+    Column('changed', date_format=CHANGED_FORMAT),
+)
+
+ROCKET_COLUMNS = (
+    Column('id'),
+    Column('name'),
+    Column('configuration'),
+    Column('familyname'),
+    Column('family_id', ('family', 'id')),
+    Column('family_name', ('family', 'name')),
+    Column('wikiURL'),
+    Column('imageURL'),
+    Column('changed', date_format=CHANGED_FORMAT),
+)
+
+# endpoint path -> (key of the records in a payload, columns)
+SCHEMAS = {
+    'agency': ('agencies', AGENCY_COLUMNS),
+    'launch': ('launches', LAUNCH_COLUMNS),
+    'lsp': ('agencies', AGENCY_COLUMNS),
+    'rocket': ('rockets', ROCKET_COLUMNS),
+}
+
+
+def _getter(path):
+    def get(record):
+        value = record
+        for key in path:
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and isinstance(key, int):
+                value = value[key] if key < len(value) else None
+            elif key == 'id':
+                # list mode payloads reference some objects by id only
+                return value
+            else:
+                return None
+            if value is None:
+                return None
+        return value
+    return get
+
+
+class ColumnBuilder(object):
+    '''
+    Accumulates records of one listing as columns.
+
+    args:
+        endpoint (str): 'launch', 'agency', 'lsp' or 'rocket', selecting
+                      : the columns extracted
+        columns (tuple): Column definitions overriding the endpoint's
+    '''
+
+    def __init__(self, endpoint='launch', columns=None):
+        try:
+            self.key, default_columns = SCHEMAS[endpoint]
+        except KeyError:
+            raise ValueError('no columnar schema for {!r}, expected one of {}'
+                             .format(endpoint, ', '.join(sorted(SCHEMAS))))
+        self.columns = tuple(columns or default_columns)
+        self._getters = [_getter(c.path) for c in self.columns]
+        self._data = {c.name: [] for c in self.columns}
+        self._length = 0
+
+    def append(self, batch):
+        '''
+        Append a batch of records.
+
+        args:
+            batch: a decoded listing payload (dictionary with the
+                 : records under the endpoint's key), or an iterable
+                 : of record dictionaries or models.Record instances
+        '''
+        if isinstance(batch, dict):
+            batch = batch.get(self.key, ())
+        records = [getattr(r, 'raw', r) for r in batch]
+        for column, get in zip(self.columns, self._getters):
+            self._data[column.name].extend(map(get, records))
+        self._length += len(records)
+
+    def extend(self, batches):
+        '''
+        Append every batch of an iterable of batches, e.g. pages.
+        '''
+        for batch in batches:
+            self.append(batch)
+
+    def to_columns(self):
+        '''
+        Get the raw columns, dates left as strings.
+
+        returns:
+            dictionary of column name to list
+        '''
+        return self._data
+
+    def to_arrow(self):
+        '''
+        Build a pyarrow.Table.  Date columns become UTC timestamps,
+        unparseable or missing dates become nulls.
+
+        returns:
+            pyarrow.Table
+
+        raises:
+            ImportError if pyarrow is not installed
+        '''
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        arrays = []
+        for column in self.columns:
+            array = pa.array(self._data[column.name])
+            if column.date_format is not None:
+                if pa.types.is_null(array.type):
+                    array = array.cast(pa.string())
+                array = pc.strptime(array, format=column.date_format,
+                                    unit='s', error_is_null=True)
+                array = array.cast(pa.timestamp('s', tz='UTC'))
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays,
+                                    names=[c.name for c in self.columns])
+
+    def to_dataframe(self):
+        '''
+        Build a pandas.DataFrame.  Date columns become UTC datetimes,
+        unparseable or missing dates become NaT.
+
+        returns:
+            pandas.DataFrame
+
+        raises:
+            ImportError if pandas is not installed
+        '''
+        import pandas as pd
+
+        data = {}
+        for column in self.columns:
+            values = self._data[column.name]
+            if column.date_format is not None:
+                values = pd.to_datetime(pd.Series(values, dtype=object),
+                                        format=column.date_format,
+                                        utc=True, errors='coerce')
+            data[column.name] = values
+        return pd.DataFrame(data, columns=[c.name for c in self.columns])
+
+    def __len__(self):
+        return self._length
+
+
+def to_arrow(batches, endpoint='launch'):
+    '''
+    Build a pyarrow.Table from listing pages or records.
+
+    args:
+        batches: a payload, an iterable of records, or an iterable of
+               : payloads / record lists as accepted by
+               : ColumnBuilder.append()
+        endpoint (str): see ColumnBuilder
+
+    returns:
+        pyarrow.Table
+    '''
+    return _build(batches, endpoint).to_arrow()
+
+
+def to_dataframe(batches, endpoint='launch'):
+    '''
+    Build a pandas.DataFrame from listing pages or records.
+
+    args:
+        batches: see to_arrow()
+        endpoint (str): see ColumnBuilder
+
+    returns:
+        pandas.DataFrame
+    '''
+    return _build(batches, endpoint).to_dataframe()
+
+
+def _build(batches, endpoint):
+    builder = ColumnBuilder(endpoint)
+    if isinstance(batches, dict):
+        builder.append(batches)
+        return builder
+    records = [] # loose records are appended in batches
+    for item in batches:
+        if isinstance(item, list) or (isinstance(item, dict)
+                                      and builder.key in item):
+            builder.append(records)
+            records = []
+            builder.append(item)
+        else:
+            records.append(item)
+    builder.append(records)
+    return builder
+
+
+__all__ = ['CHANGED_FORMAT', 'Column', 'ColumnBuilder', 'NET_FORMAT',
+           'net_stamp', 'parse_stamp', 'to_arrow', 'to_dataframe',]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+'''
+decoding.py
+
+Pluggable JSON decoders, and the content codings the client can
+decompress.
+
+The fastest installed backend is used by default: orjson, then msgspec,
+then the standard library json module.  All of them decode straight
+from the response bytes.
+
+Compressed bodies are decompressed by urllib3 chunk by chunk as they
+are read off the socket, so only the decompressed bytes handed to the
+decoder are held in full.
+
+functions:
+    accept_encoding
+    available_backends
+    get_decoder
+'''
+
+
+import json
+
+
+# preferred first
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+
+def _orjson():
+    import orjson
+    return orjson.loads
+
+
+def _msgspec():
+    import msgspec
+    return msgspec.json.Decoder().decode
+
+
+def _json():
+    return json.loads
+
+
+_LOADERS = {'orjson': _orjson, 'msgspec': _msgspec, 'json': _json}
+
+
+def available_backends():
+    '''
+    Get the names of the installed decoder backends.
+
+    returns:
+        list of str, fastest first
+    '''
+    available = []
+    for name in BACKENDS:
+        try:
+            _LOADERS[name]()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def get_decoder(backend=None):
+    '''
+    Get a function decoding JSON bytes into Python objects.
+
+    args:
+        backend (str): one of 'orjson', 'msgspec' or 'json'.  Defaults
+                     : to the fastest installed backend
+
+    returns:
+        callable taking bytes and returning the decoded object
+
+    raises:
+        ValueError if backend is unknown
+        ImportError if backend is not installed
+    '''
+    if backend is None:
+        for name in BACKENDS:
+            try:
+                return _LOADERS[name]()
+            except ImportError:
+                continue
+    try:
+        loader = _LOADERS[backend]
+    except KeyError:
+        raise ValueError('unknown JSON backend {!r}, expected one of {}'
+                         .format(backend, ', '.join(BACKENDS)))
+    return loader()
+
+
+def accept_encoding():
+    '''
+    Get the Accept-Encoding header value listing every content coding
+    urllib3 can decompress: gzip and deflate, plus br when brotli is
+    installed and zstd when zstandard is installed (urllib3 2 and
+    later).
+
+    returns:
+        str, e.g. 'gzip, deflate, br'
+    '''
+    try:
+        from urllib3.util.request import ACCEPT_ENCODING
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip,deflate'
+    return ', '.join(coding.strip() for coding in ACCEPT_ENCODING.split(','))
+
+
+__all__ = ['accept_encoding', 'available_backends', 'get_decoder',]
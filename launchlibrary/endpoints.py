@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+
+'''
+endpoints.py
+
+Declarative table of the Launch Library API endpoints.
+
+Every endpoint is described once here: the name of its function, its
+path under the base URL, the query parameters it accepts, the key
+holding its records in a JSON listing, how long its responses may be
+cached and the model wrapping its records, plus the record keys
+returned in each mode so that a fields= argument can request the
+smallest mode holding the keys a caller needs.  The sync functions in
+launchlibrary.py, the coroutines in aio.py, pagination and the cache
+TTLs are all generated from this table.
+
+classes:
+    Endpoint
+
+functions:
+    resolve
+'''
+
+
+from collections import OrderedDict, namedtuple
+
+from launchlibrary import models
+
+
+# accepted by every listing endpoint
+_LISTING_PARAMS = ('id', 'name', 'mode', 'limit', 'offset', 'sort',
+                   'changed', 'format')
+
+_LAUNCH_PARAMS = _LISTING_PARAMS + ('seq', 'next', 'startdate', 'enddate',
+                                    'locationid', 'rocketid', 'lsp')
+
+_EVENT_PARAMS = _LISTING_PARAMS + ('parentid', 'type')
+
+# search options of launch().  Without any of them the API returns the
+# next launches only, not the whole listing
+LAUNCH_SEARCH_PARAMS = frozenset(('id', 'name', 'next', 'startdate',
+                                  'enddate', 'locationid', 'rocketid', 'lsp',
+                                  'changed'))
+
+# paths listing upcoming records only unless a search option is given
+_UPCOMING_BY_DEFAULT = frozenset(('launch', 'calendar'))
+
+# a changed date older than any record: as a search option it matches
+# every record
+CHANGED_FLOOR = '1900-01-01 00:00:00'
+
+# keys of a launch record in each mode
+LAUNCH_LIST_FIELDS = frozenset((
+    'id', 'name', 'windowstart', 'windowend', 'net', 'status', 'hashtag',
+    'vidURLs', 'vidURL', 'tbdtime', 'tbddate', 'probability', 'changed',
+    'lsp'))
+LAUNCH_SUMMARY_FIELDS = LAUNCH_LIST_FIELDS | {'inhold'}
+
+# endpoint path -> ((mode, keys), ...) smallest mode first.  None
+# stands for every key
+MODE_FIELDS = {
+    'launch': (('list', LAUNCH_LIST_FIELDS),
+               ('summary', LAUNCH_SUMMARY_FIELDS),
+               ('verbose', None)),
+}
+
+_TYPE_DOC = '''
+    Get {what}.
+
+    kwargs:
+        name (str): name for the {noun}
+        id (int): ID for the {noun}
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''
+
+_EVENT_DOC = '''
+    Get {what}.
+
+    kwargs:
+        id (int): ID of a specific event
+        name (str): name of a specific event
+        parentid (int): ID of the {parent} the events belong to
+        type (int): event type ID, see event_type()
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''
+
+
+class Endpoint(namedtuple('Endpoint', ['name', 'path', 'params',
+                                       'result_key', 'ttl', 'model', 'doc'])):
+    '''
+    Description of one API endpoint.
+
+    fields:
+        name (str): name of the endpoint function, e.g. 'launch_providers'
+        path (str): path under the base URL, e.g. 'lsp'
+        params (frozenset): accepted query parameters
+        result_key (str): key of the record list in a JSON listing, or
+                        : None if the endpoint does not return one
+        ttl (float): seconds a response may be cached.  0 when the
+                   : endpoint is not cacheable
+        model (type): models.Record subclass of the records, or None
+        doc (str): docstring of the generated functions
+    '''
+
+    __slots__ = ()
+
+    @property
+    def cacheable(self):
+        return self.ttl > 0
+
+    @property
+    def paginated(self):
+        return self.result_key is not None
+
+    def check_params(self, params):
+        '''
+        Make sure every parameter is accepted by the endpoint.
+
+        args:
+            params (dict): keyword arguments given to the endpoint
+
+        returns:
+            params
+
+        raises:
+            TypeError naming the first unexpected parameter
+        '''
+        for key in params:
+            if key not in self.params:
+                raise TypeError('{}() got an unexpected keyword argument '
+                                '{!r}'.format(self.name, key))
+        return params
+
+    def full_listing(self, params):
+        '''
+        Make sure a listing request covers every record.  The launch
+        listing holds upcoming launches only unless a search option is
+        given, so changed=CHANGED_FLOOR is added when there is none.
+
+        args:
+            params (dict): query parameters
+
+        returns:
+            params, or a copy with changed added
+        '''
+        if (self.path in _UPCOMING_BY_DEFAULT
+                and not LAUNCH_SEARCH_PARAMS.intersection(params)):
+            params = dict(params, changed=CHANGED_FLOOR)
+        return params
+
+    def mode_for(self, fields):
+        '''
+        Find the smallest mode whose records hold every field.
+
+        args:
+            fields (iterable): record keys, e.g. ('id', 'name', 'net')
+
+        returns:
+            mode name, or None if the endpoint's modes are not known
+        '''
+        fields = set(fields)
+        for mode, keys in MODE_FIELDS.get(self.path, ()):
+            if keys is None or fields <= keys:
+                return mode
+        return None
+
+    def prepare(self, params):
+        '''
+        Turn keyword arguments given to the endpoint into query
+        parameters.  A fields argument (an iterable of record keys, or
+        a comma separated string) is replaced with the smallest mode
+        returning them, unless mode is given too.
+
+        args:
+            params (dict): keyword arguments given to the endpoint
+
+        returns:
+            dictionary of query parameters
+
+        raises:
+            TypeError naming the first unexpected parameter
+        '''
+        if 'fields' in params:
+            params = dict(params)
+            fields = params.pop('fields')
+            if isinstance(fields, str):
+                fields = fields.split(',')
+            if fields is not None and 'mode' not in params:
+                mode = self.mode_for(fields)
+                if mode is not None:
+                    params['mode'] = mode
+        return self.check_params(params)
+
+
+def _endpoint(name, path, extra_params, result_key, ttl, model, doc,
+              base_params=_LISTING_PARAMS):
+    return Endpoint(name, path, frozenset(base_params + extra_params),
+                    result_key, ttl, model, doc)
+
+
+ENDPOINTS = OrderedDict((e.name, e) for e in (
+    _endpoint('agency', 'agency',
+              ('abbrev', 'type', 'countryCode', 'islsp'),
+              'agencies', 3600, models.Agency, '''
+    Get spaces agencies.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific agency
+        name (str): name of a specific agency
+        abbrev (str): abbreviation of a specific agency
+        type (int): agency type ID
+        countryCode (str): three letter country code for agency's country
+                         : of origin
+        islsp (int): whether or not this agency is a launch service
+                   : provide. 0 for no, 1 for yes
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('agency_type', 'agencytype', (), 'types', 86400,
+              models.AgencyType, '''
+    Get agency type.
+
+    kwargs:
+        name (str): name for the agency type
+        id (int): ID for the integer type
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('calendar', 'calendar', (), None, 60, None, '''
+    An alias for launch() that automatically sets format='ics'
+
+    A .ics file is universal calendar format used by several email
+    and calendar programs.
+    To parse an ICS file in Python, check out the icalendar package.
+    https://pypi.org/project/icalendar/
+    utils.iter_ics_events() parses it one launch at a time.
+
+    kwargs:
+        mode (str): list, summary, or verbose
+        sort (str): 'asc' for ascending, 'desc' for descending
+                  : Defaults to ascending
+        seq (int): sequence number to pass in
+
+        ** If all search options are omitted, next 10 launches **
+        ** are returned by default                             **
+
+        next (int): gets the next N launches
+        startdate (str): date/time to start the search at
+        enddate (str): date/time to end the search at
+        limit (int): limit of responses.  Default is 10
+        offset (int): offset for pagination
+        id (int): ID of the launch you are searching for
+        name (str): name of the launch you are searching for
+        locationid (int): locationID you are searching for
+        rocketid (int): rocketID you are searching for
+        lsp (str): Laucnh Service Provider for the launch
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    ''', base_params=_LAUNCH_PARAMS),
+    _endpoint('event_type', 'eventtype', (), 'types', 86400, None,
+              _TYPE_DOC.format(what='event types', noun='event type')),
+    _endpoint('launch', 'launch', (), 'launches', 60, models.Launch, '''
+    Get launch data.
+
+    kwargs:
+        mode (str): list, summary, or verbose
+        sort (str): sorts by NET
+                  : 'asc' for ascending, 'desc' for descending
+                  : Defaults to ascending
+        seq (int): sequence number to pass in
+
+        ** If all search options are omitted, next 10 launches **
+        ** are returned by default                             **
+
+        next (int): gets the next N launches
+        startdate (str): date/time to start the search at
+        enddate (str): date/time to end the search at
+        limit (int): limit of responses.  Default is 10
+        offset (int): offset for pagination
+        id (int): ID of the launch you are searching for
+        name (str): name of the launch you are searching for
+        locationid (int): locationID you are searching for
+        rocketid (int): rocketID you are searching for
+        lsp (str): Laucnh Service Provider for the launch
+        changed (str): changed on or after the supplied date
+        fields (iterable): record keys needed, e.g. ('id', 'name', 'net').
+                         : Requests the smallest mode returning them
+                         : when mode is omitted
+        expand (iterable): references to resolve, any of 'lsp',
+                         : 'rocket' and 'location'.  Each distinct
+                         : entity is fetched once per TTL and shared,
+                         : see expand.py.  rocket and location need
+                         : verbose mode, requested when mode is omitted
+
+    returns:
+        requests.Response object, or the decoded listing when expand
+        is given
+    ''', base_params=_LAUNCH_PARAMS),
+    _endpoint('launch_event', 'launchevent', (), 'events', 300, None,
+              _EVENT_DOC.format(what='launch events', parent='launch'),
+              base_params=_EVENT_PARAMS),
+    _endpoint('launch_providers', 'lsp',
+              ('abbrev', 'type', 'countryCode'),
+              'agencies', 3600, models.Agency, '''
+    Get launch service provider data.
+    A launch service provider (LSP) is an agency with the islsp flag
+    set to 1.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific agency
+        name (str): name of a specific agency
+        abbrev (str): abbreviation of a specific agency
+        type (int): agency type ID
+        countryCode (str): three letter country code for agency's country
+                         : of origin
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('launch_status', 'launchstatus', (), 'types', 86400,
+              models.LaunchStatus, '''
+    Get launch status.
+
+    kwargs:
+        name (str): name for the launch status
+        id (int): ID for the launch status
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('location', 'location', ('countryCode',), 'locations', 3600,
+              models.Location, '''
+    Get launch locations.  A location is a launch site made up of one
+    or more pads.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific location
+        name (str): name of a specific location
+        countryCode (str): three letter country code of the location
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('mission', 'mission', ('type', 'launchid'), 'missions', 300,
+              models.Mission, '''
+    Get missions.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific mission
+        name (str): name of a specific mission
+        type (int): mission type ID, see mission_type()
+        launchid (int): ID of the launch flying the mission
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('mission_event', 'missionevent', (), 'events', 300, None,
+              _EVENT_DOC.format(what='mission events', parent='mission'),
+              base_params=_EVENT_PARAMS),
+    _endpoint('mission_type', 'missiontype', (), 'types', 86400, None,
+              _TYPE_DOC.format(what='mission types', noun='mission type')),
+    _endpoint('pad', 'pad', ('locationid', 'padType', 'retired'), 'pads',
+              3600, models.Pad, '''
+    Get launch pads.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific pad
+        name (str): name of a specific pad
+        locationid (int): ID of the location the pad belongs to
+        padType (int): 0 for launch pads, 1 for landing pads
+        retired (int): 0 for active pads, 1 for retired ones
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('payload', 'payload', ('type', 'missionid'), 'payloads', 300,
+              None, '''
+    Get mission payloads.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific payload
+        name (str): name of a specific payload
+        type (int): payload type ID
+        missionid (int): ID of the mission carrying the payload
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('rocket', 'rocket', ('configuration', 'familyid'), 'rockets',
+              3600, models.Rocket, '''
+    Get rockets (launch vehicle configurations).
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific rocket
+        name (str): name of a specific rocket
+        configuration (str): configuration of the rocket, e.g. 'Block 5'
+        familyid (int): ID of the rocket family, see rocket_family()
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+    _endpoint('rocket_event', 'rocketevent', (), 'events', 300, None,
+              _EVENT_DOC.format(what='rocket events', parent='rocket'),
+              base_params=_EVENT_PARAMS),
+    _endpoint('rocket_family', 'rocketfamily', ('agency',), 'RocketFamilies',
+              86400, models.RocketFamily, '''
+    Get rocket families.
+
+    kwargs:
+        mode (str): How the data shall be returned. list, summary, verbose
+        id (int): ID of a specific rocket family
+        name (str): name of a specific rocket family
+        agency (int): ID of an agency building the family
+        changed (str): changed on or after the supplied date
+
+    returns:
+        requests.Response object
+    '''),
+))
+
+_BY_PATH = {e.path: e for e in ENDPOINTS.values()}
+
+
+def resolve(endpoint):
+    '''
+    Find an endpoint in the table.
+
+    args:
+        endpoint: an Endpoint, an endpoint function such as
+                : launchlibrary.launch, its name or its path
+
+    returns:
+        Endpoint
+
+    raises:
+        ValueError if no endpoint matches
+    '''
+    if isinstance(endpoint, Endpoint):
+        return endpoint
+    name = getattr(endpoint, '__name__', endpoint)
+    found = ENDPOINTS.get(name) or _BY_PATH.get(name)
+    if found is None:
+        raise ValueError('unknown endpoint {!r}'.format(endpoint))
+    return found
+
+
+__all__ = ['CHANGED_FLOOR', 'ENDPOINTS', 'Endpoint', 'LAUNCH_SEARCH_PARAMS',
+           'MODE_FIELDS', 'resolve',]
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+
+'''
+expand.py
+
+Resolution of the entities a record refers to.
+
+In list and summary mode a launch carries little more than the id of
+its provider, and resolving it takes an agency() call per launch.  The
+rocket and location only come in verbose mode, each launch holding its
+own copy.  expand_records() replaces the references with the records
+themselves, looked up through an EntityCache: an identity map that
+fetches each distinct entity once per TTL, with get_many(), and hands
+out the same dictionary wherever that entity is referenced, across
+records, pages and calls.  Entities embedded whole, like the rocket and
+location of a verbose launch, are interned in the map rather than
+fetched again.
+
+    >>> payload = launch(next=50, mode='list', expand=['lsp'])
+    >>> payload['launches'][0]['lsp'] is payload['launches'][1]['lsp']
+    True
+
+classes:
+    EntityCache
+
+functions:
+    check_expand
+    prepare_expand
+    expand_records
+    expand_payload
+    aexpand_records
+    aexpand_payload
+    get_default_entity_cache
+    set_default_entity_cache
+'''
+
+
+import threading
+import time
+
+from launchlibrary.endpoints import MODE_FIELDS, resolve
+
+
+# endpoint path -> {record key: endpoint of the entity it refers to}
+RELATIONS = {
+    'launch': {'lsp': 'launch_providers', 'rocket': 'rocket',
+               'location': 'location'},
+}
+
+# endpoint path -> record keys holding the whole entity when it is
+# embedded.  A launch's lsp lacks agency fields such as islsp
+EMBEDDED = {
+    'launch': frozenset(('rocket', 'location')),
+}
+
+
+class EntityCache(object):
+    '''
+    Identity map of entity records such as agencies and rockets.
+
+    An entity is fetched once, then the same dictionary is returned for
+    it until its TTL runs out.  Concurrent lookups of the same missing
+    entity may both fetch it, but only the first record stored is kept,
+    so identity holds.  Entities are shared: do not modify them.
+
+    args:
+        ttl (float): seconds an entity is kept.  Defaults to the TTL of
+                   : its endpoint, see endpoints.py
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
+        mode (str): mode the entities are fetched in
+        max_workers (int): number of requests in flight at a time
+
+    attributes:
+        hits (int): lookups answered from the map
+        misses (int): lookups that needed a request
+    '''
+
+    def __init__(self, ttl=None, client=None, mode='verbose',
+                 max_workers=8):
+        self.ttl = ttl
+        self.client = client
+        self.mode = mode
+        self.max_workers = max_workers
+        self.hits = 0
+        self.misses = 0
+        self._entities = {} # (path, id) -> (record, expires at)
+        self._lock = threading.Lock()
+
+    def _ttl_for(self, endpoint):
+        return endpoint.ttl if self.ttl is None else self.ttl
+
+    def put(self, endpoint, record, now=None):
+        '''
+        Store a record, e.g. one embedded in a verbose payload, in place
+        of the one held for its id.
+
+        args:
+            endpoint (function or str): endpoint of the record, e.g.
+                                      : 'rocket'
+            record (dict): the record, with its id
+
+        returns:
+            record
+        '''
+        endpoint = resolve(endpoint)
+        now = time.time() if now is None else now
+        expires = now + self._ttl_for(endpoint)
+        with self._lock:
+            self._entities[endpoint.path, str(record['id'])] = (record,
+                                                                expires)
+        return record
+
+    def intern(self, endpoint, record, now=None):
+        '''
+        Get the record held for the id of record, storing record if
+        none is held, so that equal entities share one dictionary.
+
+        args:
+            endpoint (function or str): endpoint of the record
+            record (dict): the record, with its id
+
+        returns:
+            the record held
+        '''
+        endpoint = resolve(endpoint)
+        now = time.time() if now is None else now
+        key = endpoint.path, str(record['id'])
+        with self._lock:
+            held = self._entities.get(key)
+            if held is not None and now < held[1]:
+                self.hits += 1
+            else:
+                held = self._entities[key] = (record,
+                                              now + self._ttl_for(endpoint))
+        return held[0]
+
+    def get_many(self, endpoint, ids, now=None):
+        '''
+        Look up entities by id, fetching the ones not held.
+
+        args:
+            endpoint (function or str): endpoint of the entities
+            ids (iterable): ids to look up, as numbers or strings
+
+        returns:
+            dictionary of id -> record.  Ids that do not exist are left
+            out
+
+        raises:
+            requests.HTTPError if a request fails
+        '''
+        endpoint = resolve(endpoint)
+        now = time.time() if now is None else now
+        found = {}
+        found, missing = self._lookup(endpoint, ids, now)
+        if missing:
+            from launchlibrary.launchlibrary import get_many
+
+            results = get_many(endpoint, missing, self.max_workers,
+                               client=self.client, **self._params())
+            found.update(self._store(endpoint, results, now))
+        return found
+
+    async def aget_many(self, endpoint, ids, client, now=None):
+        '''
+        Async version of get_many().  Missing entities are fetched one
+        request per id through client, so its concurrency bound and
+        rate limit apply.
+
+        args:
+            endpoint (function or str): endpoint of the entities
+            ids (iterable): ids to look up, as numbers or strings
+            client (aio.AsyncLaunchLibraryClient): client used for the
+                                                 : requests
+
+        returns:
+            dictionary of id -> record.  Ids that do not exist are left
+            out
+
+        raises:
+            requests.HTTPError if a request fails
+        '''
+        import asyncio
+
+        from launchlibrary.launchlibrary import BatchResult
+
+        endpoint = resolve(endpoint)
+        now = time.time() if now is None else now
+        found, missing = self._lookup(endpoint, ids, now)
+        params = self._params()
+
+        async def fetch(id):
+            payload = await client.get_json(endpoint.path,
+                                            dict(params, id=id))
+            records = payload[endpoint.result_key]
+            if not records:
+                return BatchResult(id, None, LookupError(id))
+            return BatchResult(id, records[0], None)
+
+        if missing:
+            results = await asyncio.gather(*map(fetch, missing))
+            found.update(self._store(endpoint, results, now))
+        return found
+
+    def _params(self):
+        return {} if self.mode is None else {'mode': self.mode}
+
+    def _lookup(self, endpoint, ids, now):
+        # entities held, and the ids to fetch
+        found = {}
+        missing = []
+        with self._lock:
+            for id in dict.fromkeys(ids):
+                held = self._entities.get((endpoint.path, str(id)))
+                if held is not None and now < held[1]:
+                    found[id] = held[0]
+                else:
+                    missing.append(id)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def _store(self, endpoint, results, now):
+        # keep the fetched entities, unless fresh ones were stored first
+        expires = now + self._ttl_for(endpoint)
+        found = {}
+        with self._lock:
+            for result in results:
+                if result.error is not None:
+                    if isinstance(result.error, LookupError):
+                        continue
+                    raise result.error
+                key = endpoint.path, str(result.id)
+                held = self._entities.get(key)
+                if held is None or now >= held[1]:
+                    held = self._entities[key] = (result.record, expires)
+                # another thread may have stored it first
+                found[result.id] = held[0]
+        return found
+
+    def clear(self):
+        '''
+        Forget every entity.
+        '''
+        with self._lock:
+            self._entities.clear()
+
+    def stats(self):
+        '''
+        Get the cache counters.
+
+        returns:
+            dictionary with hits, misses and size
+        '''
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self)}
+
+    def __len__(self):
+        return len(self._entities)
+
+
+def _reference(record, key):
+    # id of the entity under key, given as an id or a record holding one
+    value = record.get(key)
+    if isinstance(value, dict):
+        value = value.get('id')
+    return value
+
+
+def check_expand(endpoint, expand, mode=None):
+    '''
+    Make sure every key to expand is a known reference of the endpoint,
+    returned in mode.
+
+    args:
+        endpoint (function or str): endpoint of the records
+        expand (iterable): keys to resolve, or a comma separated string
+        mode (str): mode of the records, if known
+
+    returns:
+        list of the keys, without repeats
+
+    raises:
+        ValueError naming the first unknown key, or one that mode does
+        not return
+    '''
+    endpoint = resolve(endpoint)
+    if isinstance(expand, str):
+        expand = expand.split(',')
+    relations = RELATIONS.get(endpoint.path, {})
+    keys = dict(MODE_FIELDS.get(endpoint.path, ())).get(mode)
+    for key in expand:
+        if key not in relations:
+            raise ValueError('{}() cannot expand {!r}, expected one of {}'
+                             .format(endpoint.name, key,
+                                     ', '.join(sorted(relations)) or
+                                     'nothing'))
+        if keys is not None and key not in keys:
+            raise ValueError('{}() cannot expand {!r} in {} mode, it is '
+                             'returned in {} mode'
+                             .format(endpoint.name, key, mode,
+                                     endpoint.mode_for([key])))
+    return list(dict.fromkeys(expand))
+
+
+def prepare_expand(endpoint, expand, params):
+    '''
+    Turn keyword arguments given to an endpoint function together with
+    expand= into query parameters.  When mode is omitted and a key to
+    expand is not returned in every mode, the smallest mode returning
+    it and any fields asked for is requested, as with fields=.
+
+    args:
+        endpoint (function or str): endpoint of the records
+        expand (iterable): keys to resolve, or a comma separated string
+        params (dict): keyword arguments given to the endpoint
+
+    returns:
+        tuple of the keys to expand and the query parameters
+
+    raises:
+        ValueError if a key cannot be expanded, see check_expand()
+        TypeError naming the first unexpected parameter
+    '''
+    endpoint = resolve(endpoint)
+    mode = params.get('mode')
+    expand = check_expand(endpoint, expand, mode)
+    modes = MODE_FIELDS.get(endpoint.path)
+    if mode is None and modes and modes[0][1] is not None and \
+            not set(expand) <= modes[0][1]:
+        fields = params.get('fields') or ()
+        if isinstance(fields, str):
+            fields = fields.split(',')
+        params = dict(params, fields=list(fields) + expand)
+    return expand, endpoint.prepare(params)
+
+
+def expand_records(records, endpoint='launch', expand=(), cache=None):
+    '''
+    Replace the entity references of records with the entities.
+
+    args:
+        records (iterable): record dictionaries, left unmodified
+        endpoint (function or str): endpoint of the records
+        expand (iterable): keys to resolve, e.g. ('lsp', 'rocket').  A
+                         : comma separated string works too
+        cache (EntityCache): where the entities are looked up.  Defaults
+                           : to the shared cache
+
+    returns:
+        list of shallow copies of the records.  A reference to an
+        entity that does not exist is left as it is.  Entities embedded
+        whole are interned in cache instead of being fetched
+
+    raises:
+        ValueError if a key is not a known reference of the endpoint
+        requests.HTTPError if a request fails
+    '''
+    records, lookups = _lookups(records, endpoint, expand)
+    if cache is None:
+        cache = get_default_entity_cache()
+    for target, refs in lookups:
+        refs = _intern(refs, target, cache)
+        _replace(refs, cache.get_many(target, _ids(refs)))
+    return records
+
+
+async def aexpand_records(records, endpoint='launch', expand=(), cache=None,
+                          client=None):
+    '''
+    Async version of expand_records().  Entities are fetched through
+    an AsyncLaunchLibraryClient, within its concurrency bound.
+
+    args:
+        client (aio.AsyncLaunchLibraryClient): client used for the
+                                             : requests.  Defaults to
+                                             : the shared async client
+    '''
+    records, lookups = _lookups(records, endpoint, expand)
+    if cache is None:
+        cache = get_default_entity_cache()
+    if client is None:
+        from launchlibrary.aio import get_default_async_client
+        client = get_default_async_client()
+    for target, refs in lookups:
+        refs = _intern(refs, target, cache)
+        _replace(refs, await cache.aget_many(target, _ids(refs), client))
+    return records
+
+
+def _lookups(records, endpoint, expand):
+    # copies of records, and for each key to expand the endpoint of its
+    # entities and the (record, key, id, whole) references to them,
+    # whole telling whether the record embeds the entire entity
+    endpoint = resolve(endpoint)
+    expand = check_expand(endpoint, expand)
+    records = [dict(record) for record in records]
+    embedded = EMBEDDED.get(endpoint.path, ())
+    lookups = []
+    for key in expand:
+        refs = []
+        for record in records:
+            value = record.get(key)
+            whole = (key in embedded and isinstance(value, dict)
+                     and len(value) > 1)
+            refs.append((record, key, _reference(record, key), whole))
+        lookups.append((RELATIONS[endpoint.path][key], refs))
+    return records, lookups
+
+
+def _intern(refs, target, cache):
+    # intern the entities embedded whole, and return the references
+    # left to look up
+    now = time.time()
+    rest = []
+    for record, key, id, whole in refs:
+        if whole and id is not None:
+            record[key] = cache.intern(target, record[key], now)
+        else:
+            rest.append((record, key, id, whole))
+    return rest
+
+
+def _ids(refs):
+    return [id for _, _, id, _ in refs if id is not None]
+
+
+def _replace(refs, found):
+    for record, key, id, _ in refs:
+        if id in found:
+            record[key] = found[id]
+
+
+def expand_payload(payload, endpoint='launch', expand=(), cache=None):
+    '''
+    expand_records() over the records of a decoded listing.
+
+    returns:
+        copy of payload holding the expanded records
+    '''
+    endpoint = resolve(endpoint)
+    key = endpoint.result_key
+    payload = dict(payload)
+    payload[key] = expand_records(payload.get(key, ()), endpoint, expand,
+                                  cache)
+    return payload
+
+
+async def aexpand_payload(payload, endpoint='launch', expand=(), cache=None,
+                          client=None):
+    '''
+    Async version of expand_payload().
+    '''
+    endpoint = resolve(endpoint)
+    key = endpoint.result_key
+    payload = dict(payload)
+    payload[key] = await aexpand_records(payload.get(key, ()), endpoint,
+                                         expand, cache, client)
+    return payload
+
+
+_default_entity_cache = None
+_default_entity_cache_lock = threading.Lock()
+
+
+def get_default_entity_cache():
+    '''
+    Get the shared EntityCache used by the expand= argument of the
+    endpoint functions.  It is created on first use.
+
+    returns:
+        EntityCache
+    '''
+    global _default_entity_cache
+    cache = _default_entity_cache
+    if cache is None:
+        with _default_entity_cache_lock:
+            if _default_entity_cache is None:
+                _default_entity_cache = EntityCache()
+            cache = _default_entity_cache
+    return cache
+
+
+def set_default_entity_cache(cache):
+    '''
+    Replace the shared EntityCache.
+
+    args:
+        cache (EntityCache): the new default cache, or None to have one
+                           : created on next use
+    '''
+    global _default_entity_cache
+    with _default_entity_cache_lock:
+        _default_entity_cache = cache
+
+
+__all__ = ['EMBEDDED', 'EntityCache', 'RELATIONS', 'aexpand_payload',
+           'aexpand_records',
+           'check_expand', 'expand_payload', 'expand_records',
+           'get_default_entity_cache', 'prepare_expand',
+           'set_default_entity_cache',]
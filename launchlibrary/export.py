@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+'''
+export.py
+
+Bulk export of whole listings to JSONL or Parquet files.
+
+Decoding and flattening a full launch history in verbose mode is CPU
+bound, and in one process it is limited by the GIL however many pages
+are fetched at once.  The export pipeline splits the work:
+
+    fetch       pages are fetched concurrently on threads by
+                launchlibrary.iter_pages() and kept as raw bytes
+    transform   a process pool decodes each page and turns it into
+                JSONL lines, or into a pyarrow.Table with the columns of
+                columnar.py
+    write       the parent process writes the results in offset order
+
+At most max_pending pages wait in the process pool, and iter_pages()
+holds at most 2 * fetch_workers more, so memory stays bounded however
+long the listing is.  When the writer or the pool falls behind,
+fetching pauses until it catches up.
+
+The pool's workers are started with the 'spawn' method by default:
+forking a process while the fetch threads hold locks can deadlock the
+child.
+
+Without a search option the launch listing holds upcoming launches
+only, so the export then asks for every launch ever changed, as sync
+does on its first run:
+
+    >>> export('launches.parquet', 'launch', mode='verbose')
+
+classes:
+    ExportResult
+
+functions:
+    export
+    transform_page
+'''
+
+
+import json
+import multiprocessing
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from launchlibrary.columnar import SCHEMAS, ColumnBuilder
+from launchlibrary.decoding import get_decoder
+from launchlibrary.endpoints import resolve
+from launchlibrary.launchlibrary import iter_pages
+
+
+FORMATS = ('jsonl', 'parquet')
+
+_EXTENSIONS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+
+class ExportResult(namedtuple('ExportResult', ['path', 'format', 'records',
+                                               'pages'])):
+    '''
+    Summary of a finished export.
+
+    fields:
+        path (str): file written
+        format (str): 'jsonl' or 'parquet'
+        records (int): records written
+        pages (int): pages fetched
+    '''
+
+    __slots__ = ()
+
+
+def transform_page(body, count, endpoint='launch', format='jsonl',
+                   flatten=False, decoder=None):
+    '''
+    Decode a raw listing page and prepare it for writing.  Runs in the
+    pool's worker processes.
+
+    args:
+        body (bytes): JSON body of the page
+        count (int): number of leading records to keep
+        endpoint (str): endpoint path, e.g. 'launch'
+        format (str): 'jsonl' or 'parquet'
+        flatten (bool): for JSONL, write the flat columns of columnar.py
+                      : instead of the nested records
+        decoder (str): JSON backend, see decoding.get_decoder()
+
+    returns:
+        tuple of the number of records and either the JSONL bytes or a
+        pyarrow.Table
+    '''
+    endpoint = resolve(endpoint)
+    records = get_decoder(decoder)(body)[endpoint.result_key][:count]
+    if format == 'parquet':
+        builder = ColumnBuilder(endpoint.path)
+        builder.append(records)
+        return len(records), builder.to_arrow()
+    if flatten:
+        builder = ColumnBuilder(endpoint.path)
+        builder.append(records)
+        columns = builder.to_columns()
+        names = list(columns)
+        records = [dict(zip(names, row)) for row in zip(*columns.values())]
+    lines = [json.dumps(record, separators=(',', ':')) + '\n'
+             for record in records]
+    return len(records), ''.join(lines).encode('utf-8')
+
+
+class _JSONLWriter(object):
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter(object):
+    # pages are converted independently, so a column that is empty on
+    # one page comes back typed null and is cast to the file's schema
+
+    def __init__(self, path):
+        import pyarrow.parquet
+
+        self.path = path
+        self.pyarrow_parquet = pyarrow.parquet
+        self.writer = None
+
+    def write(self, table):
+        if self.writer is None:
+            import pyarrow as pa
+
+            schema = pa.schema(
+                [field.with_type(pa.string())
+                 if pa.types.is_null(field.type) else field
+                 for field in table.schema])
+            self.writer = self.pyarrow_parquet.ParquetWriter(self.path,
+                                                             schema)
+        if table.schema != self.writer.schema:
+            table = table.cast(self.writer.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _format_for(path, format):
+    if format is None:
+        format = _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise ValueError('cannot tell the format of {!r}, pass format='
+                             .format(path))
+    if format not in FORMATS:
+        raise ValueError('unknown format {!r}, expected one of {}'
+                         .format(format, ', '.join(FORMATS)))
+    return format
+
+
+def _transform_all(pages, options, processes, max_pending, mp_context):
+    # transformed pages in order
+    if processes == 0:
+        for page in pages:
+            yield transform_page(page.body, page.count, *options)
+        return
+    with ProcessPoolExecutor(processes, mp_context) as pool:
+        pending = deque()
+        try:
+            for page in pages:
+                pending.append(pool.submit(transform_page, page.body,
+                                           page.count, *options))
+                if len(pending) >= max_pending:
+                    # backpressure: the next page is not fetched until
+                    # the oldest one is written
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def export(path, endpoint='launch', format=None, page_size=100,
+           fetch_workers=4, processes=None, max_pending=None, flatten=False,
+           decoder=None, mp_context=None, client=None, **kwargs):
+    '''
+    Export every record of a listing to a file.
+
+    args:
+        path (str): file to write
+        endpoint (function or str): listing function such as launch or
+                                  : agency, or its name or path.
+                                  : Parquet needs one of the columnar
+                                  : schemas: launch, agency, lsp, rocket
+        format (str): 'jsonl' or 'parquet'.  Defaults to the one
+                    : matching the extension of path
+        page_size (int): number of records requested per page
+        fetch_workers (int): number of pages fetched concurrently
+        processes (int): worker processes transforming pages.  Defaults
+                       : to one per CPU.  0 transforms them in this
+                       : process
+        max_pending (int): pages queued in the process pool before
+                         : fetching waits.  Defaults to 2 * processes
+        flatten (bool): see transform_page()
+        decoder (str): JSON backend used by the workers
+        mp_context: multiprocessing context of the pool.  Defaults to
+                  : multiprocessing.get_context('spawn'), as fork is
+                  : unsafe with the fetch threads running
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
+
+    kwargs:
+        any filter accepted by the endpoint function except limit, e.g.
+        mode, startdate, changed.  Without a search option, launches
+        are exported over the full history
+
+    returns:
+        ExportResult
+
+    raises:
+        ImportError if pyarrow is needed but not installed
+        requests.HTTPError if a page request fails
+    '''
+    format = _format_for(path, format)
+    endpoint = resolve(endpoint)
+    if format == 'parquet' and endpoint.path not in SCHEMAS:
+        raise ValueError('no columnar schema for {!r}, expected one of {}'
+                         .format(endpoint.path, ', '.join(sorted(SCHEMAS))))
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * max(processes, 1)
+    if mp_context is None and processes:
+        mp_context = multiprocessing.get_context('spawn')
+    options = (endpoint.path, format, flatten, decoder)
+    pages = iter_pages(endpoint, page_size, fetch_workers, client=client,
+                       **endpoint.full_listing(kwargs))
+
+    writer = (_ParquetWriter if format == 'parquet' else _JSONLWriter)(path)
+    results = _transform_all(pages, options, processes, max_pending,
+                             mp_context)
+    records = written = 0
+    try:
+        for count, data in results:
+            writer.write(data)
+            records += count
+            written += 1
+    finally:
+        results.close()
+        pages.close()
+        writer.close()
+    return ExportResult(path, format, records, written)
+
+
+__all__ = ['ExportResult', 'FORMATS', 'export', 'transform_page',]
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+
+'''
+index.py
+
+In-memory query index over mirrored launches.
+
+A LaunchIndex answers the same keyword arguments as launch() without a
+round trip.  Launches are kept in a list sorted by NET, searched with
+bisect for date ranges, and in hash indexes by rocket, location, launch
+service provider and status id for equality filters.  It is loaded from
+a sync.Mirror, or any iterable of verbose launch records, and can be
+refreshed incrementally after each sync.
+
+    >>> index = LaunchIndex.from_mirror(mirror)
+    >>> index.query(rocketid=188, startdate='2019-01-01', limit=5)
+
+A LaunchTimeline is a LaunchIndex that also orders launches by launch
+window, to answer what launches next, in a time range and with a
+window open at a given time.  Once its data is older than max_age it
+refreshes itself from the API before answering.
+
+classes:
+    LaunchIndex
+    LaunchTimeline
+'''
+
+
+import calendar
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from launchlibrary.columnar import net_stamp, parse_stamp
+from launchlibrary.endpoints import ENDPOINTS
+
+
+_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+# query kwarg -> keys leading to the indexed id in a launch record
+_HASHED = (
+    ('rocketid', ('rocket', 'id')),
+    ('locationid', ('location', 'id')),
+    ('lsp', ('lsp', 'id')),
+    ('status', ('status',)),
+)
+
+# kwargs narrowing the search.  Without any of them the API, and the
+# index, return the next launches
+_SEARCH_KWARGS = frozenset(('id', 'name', 'startdate', 'enddate', 'next',
+                            'rocketid', 'locationid', 'lsp', 'status',
+                            'changed'))
+
+
+def _dig(record, path):
+    for key in path:
+        if not isinstance(record, dict):
+            return None
+        record = record.get(key)
+    return record
+
+
+def _net_stamp(record):
+    # launches without a NET sort first
+    return net_stamp(record) or 0
+
+
+def _window(record):
+    # (start, end) timestamps of the launch window, the NET when unknown
+    start = (record.get('wsstamp') or parse_stamp(record.get('windowstart'))
+             or _net_stamp(record))
+    end = (record.get('westamp') or parse_stamp(record.get('windowend'))
+           or 0)
+    return start, max(start, end)
+
+
+def _parse_date(value, end=False):
+    # dates are UTC; a bare end date covers the whole day
+    if isinstance(value, (int, float)):
+        return value
+    for date_format in _DATE_FORMATS:
+        try:
+            stamp = calendar.timegm(time.strptime(value, date_format))
+        except ValueError:
+            continue
+        if end and date_format == '%Y-%m-%d':
+            stamp += 86399
+        return stamp
+    raise ValueError('unrecognised date {!r}'.format(value))
+
+
+def _key(value):
+    # ids may be given as numbers or strings, lsp also by abbreviation
+    if isinstance(value, str):
+        value = value.strip()
+        return int(value) if value.isdigit() else value.lower()
+    return value
+
+
+class LaunchIndex(object):
+    '''
+    Queryable in-memory store of launch records.
+
+    args:
+        records (iterable): launch record dictionaries to load
+    '''
+
+    def __init__(self, records=()):
+        self._records = {} # id -> record
+        self._stamps = {} # id -> NET timestamp
+        self._order = [] # (NET timestamp, id) sorted
+        self._hashes = {name: {} for name, _ in _HASHED}
+        self.changed = None # newest changed value loaded
+        self.update(records)
+
+    @classmethod
+    def from_mirror(cls, mirror, endpoint='launch'):
+        '''
+        Build an index from the launches stored in a sync.Mirror.
+
+        returns:
+            LaunchIndex
+        '''
+        return cls(mirror.records(endpoint))
+
+    def refresh(self, mirror, endpoint='launch'):
+        '''
+        Load the launches changed in a sync.Mirror since the newest one
+        already indexed, e.g. after SyncEngine.sync().
+
+        returns:
+            number of records loaded
+        '''
+        return self.update(mirror.records(endpoint, changed=self.changed))
+
+    def update(self, records):
+        '''
+        Add launch records, replacing any already indexed with the same
+        id.
+
+        returns:
+            number of records loaded
+        '''
+        loaded = 0
+        for record in records:
+            id = record['id']
+            if id in self._records:
+                self._remove(id)
+            self._add(id, record)
+            changed = record.get('changed')
+            if changed and (self.changed is None or changed > self.changed):
+                self.changed = changed
+            loaded += 1
+        return loaded
+
+    def remove(self, id):
+        '''
+        Drop a launch from the index.
+
+        raises:
+            KeyError if the launch is not indexed
+        '''
+        if id not in self._records:
+            raise KeyError(id)
+        self._remove(id)
+
+    def _add(self, id, record):
+        stamp = _net_stamp(record)
+        self._records[id] = record
+        self._stamps[id] = stamp
+        insort(self._order, (stamp, id))
+        for name, path in _HASHED:
+            for value in self._hash_keys(name, record, path):
+                self._hashes[name].setdefault(value, set()).add(id)
+
+    def _remove(self, id):
+        record = self._records.pop(id)
+        stamp = self._stamps.pop(id)
+        del self._order[bisect_left(self._order, (stamp, id))]
+        for name, path in _HASHED:
+            hashed = self._hashes[name]
+            for value in self._hash_keys(name, record, path):
+                ids = hashed[value]
+                ids.discard(id)
+                if not ids:
+                    del hashed[value]
+
+    @staticmethod
+    def _hash_keys(name, record, path):
+        value = _dig(record, path)
+        keys = [] if value is None else [value]
+        if name == 'lsp':
+            abbrev = _dig(record, ('lsp', 'abbrev'))
+            if abbrev:
+                keys.append(abbrev.lower())
+        return keys
+
+    def get(self, id):
+        '''
+        Get one launch by id.
+
+        returns:
+            dictionary or None
+        '''
+        return self._records.get(id)
+
+    def query(self, now=None, **kwargs):
+        '''
+        Search the index like launch(**kwargs) searches the API.
+
+        Supported kwargs are id, name (case-insensitive substring),
+        startdate, enddate, next, rocketid, locationid, lsp (id or
+        abbreviation), changed, sort, limit and offset, plus status
+        (status id), which the API does not offer.  mode, seq and format
+        are accepted and ignored: records are returned as they were
+        stored.  Without any search option the next 10 launches are
+        returned.
+
+        args:
+            now (float): timestamp used for next and the default search.
+                       : Defaults to the current time
+
+        returns:
+            dictionary shaped like the API's payload, with launches,
+            total, offset and count keys
+
+        raises:
+            TypeError for a kwarg launch() does not accept
+        '''
+        kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        params = {k: v for k, v in kwargs.items() if k != 'status'}
+        if params:
+            ENDPOINTS['launch'].check_params(params)
+        if now is None:
+            now = time.time()
+        limit = int(kwargs.get('limit', 10))
+        offset = int(kwargs.get('offset', 0))
+
+        start = end = None
+        if 'startdate' in kwargs:
+            start = _parse_date(kwargs['startdate'])
+        if 'enddate' in kwargs:
+            end = _parse_date(kwargs['enddate'], end=True)
+        if 'next' in kwargs:
+            start = now if start is None else max(start, now)
+            limit = int(kwargs['next'])
+        elif not _SEARCH_KWARGS.intersection(kwargs):
+            start = now
+
+        candidates = None
+        if 'id' in kwargs:
+            candidates = {_key(kwargs['id'])}
+        for name, _ in _HASHED:
+            if name in kwargs:
+                ids = self._hashes[name].get(_key(kwargs[name]), ())
+                candidates = (set(ids) if candidates is None
+                              else candidates.intersection(ids))
+
+        if candidates is None:
+            lo = 0 if start is None else bisect_left(self._order, (start,))
+            hi = (len(self._order) if end is None
+                  else bisect_right(self._order, (end, float('inf'))))
+            ids = [id for _, id in self._order[lo:hi]]
+        else:
+            rows = []
+            for id in candidates:
+                stamp = self._stamps.get(id)
+                if (stamp is not None
+                        and (start is None or stamp >= start)
+                        and (end is None or stamp <= end)):
+                    rows.append((stamp, id))
+            rows.sort()
+            ids = [id for _, id in rows]
+
+        records = [self._records[id] for id in ids]
+        if 'name' in kwargs:
+            name = kwargs['name'].lower()
+            records = [r for r in records
+                       if name in (r.get('name') or '').lower()]
+        if 'changed' in kwargs:
+            changed = kwargs['changed']
+            records = [r for r in records if (r.get('changed') or '')
+                       >= changed]
+        if kwargs.get('sort') == 'desc':
+            records.reverse()
+
+        page = records[offset:offset + limit]
+        return {'launches': page, 'total': len(records), 'offset': offset,
+                'count': len(page)}
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, id):
+        return id in self._records
+
+
+class LaunchTimeline(LaunchIndex):
+    '''
+    LaunchIndex of upcoming launches ordered by NET and by launch
+    window, kept current incrementally: by update() with the records of
+    a delta sync, refresh() from a sync.Mirror, or sync() from the API.
+
+    Every update counts as fresh data.  When the last one is older than
+    max_age, next(), between() and overlapping() first fetch the
+    launches they need from the API; otherwise they never touch the
+    network.
+
+        >>> timeline = LaunchTimeline.from_mirror(mirror, max_age=600)
+        >>> timeline.next(5)
+        >>> timeline.overlapping()
+
+    args:
+        records (iterable): launch record dictionaries to load
+        max_age (float): seconds after the last update when the
+                       : timeline is stale.  None never falls back to
+                       : the API
+        client (LaunchLibraryClient): client used when falling back.
+                                    : Defaults to the shared client
+        sync_size (int): launches fetched by sync() at least
+    '''
+
+    def __init__(self, records=(), max_age=None, client=None,
+                 sync_size=50):
+        self._windows = [] # (window start, id) sorted
+        self._window_of = {} # id -> (window start, window end)
+        self._longest = 0 # longest window indexed, in seconds
+        self.max_age = max_age
+        self.client = client
+        self.sync_size = sync_size
+        self.synced_at = None
+        super().__init__(records)
+        if not self._records:
+            # nothing to answer from yet
+            self.synced_at = None
+
+    @classmethod
+    def from_mirror(cls, mirror, endpoint='launch', **kwargs):
+        '''
+        Build a timeline from the launches stored in a sync.Mirror.
+
+        kwargs:
+            see LaunchTimeline
+
+        returns:
+            LaunchTimeline
+        '''
+        return cls(mirror.records(endpoint), **kwargs)
+
+    def update(self, records):
+        loaded = super().update(records)
+        self.synced_at = time.time()
+        return loaded
+
+    def _add(self, id, record):
+        super()._add(id, record)
+        window = _window(record)
+        self._window_of[id] = window
+        insort(self._windows, (window[0], id))
+        self._longest = max(self._longest, window[1] - window[0])
+
+    def _remove(self, id):
+        super()._remove(id)
+        window = self._window_of.pop(id)
+        del self._windows[bisect_left(self._windows, (window[0], id))]
+
+    def is_stale(self, now=None):
+        '''
+        Tell whether the last update is older than max_age.
+        '''
+        if self.max_age is None:
+            return False
+        if self.synced_at is None:
+            return True
+        now = time.time() if now is None else now
+        return now - self.synced_at > self.max_age
+
+    def sync(self, next=None, **kwargs):
+        '''
+        Fetch the upcoming launches from the API and load them.
+
+        args:
+            next (int): number of launches fetched.  Defaults to
+                      : sync_size
+
+        kwargs:
+            further launch() kwargs, e.g. startdate and enddate
+
+        returns:
+            number of records loaded
+
+        raises:
+            requests.HTTPError if the request fails
+        '''
+        from launchlibrary.launchlibrary import paginate
+
+        if next is not None:
+            kwargs['next'] = max(next, self.sync_size)
+        elif 'startdate' not in kwargs:
+            kwargs['next'] = self.sync_size
+        kwargs.setdefault('mode', 'verbose')
+        if 'next' in kwargs:
+            # next= answers in a single page
+            client = self.client
+            if client is None:
+                from launchlibrary.client import get_default_client
+                client = get_default_client()
+            payload = client.get_json('launch', ENDPOINTS['launch']
+                                      .prepare(kwargs))
+            return self.update(payload['launches'])
+        return self.update(paginate('launch', client=self.client,
+                                    **kwargs))
+
+    def next(self, n=10, now=None):
+        '''
+        Get the next launches, like launch(next=n).
+
+        args:
+            n (int): number of launches
+            now (float): UNIX time, defaults to the current time
+
+        returns:
+            list of launch dictionaries by NET
+        '''
+        if self.is_stale():
+            self.sync(next=n)
+        now = time.time() if now is None else now
+        i = bisect_left(self._order, (now,))
+        return [self._records[id] for _, id in self._order[i:i + n]]
+
+    def between(self, start, end):
+        '''
+        Get the launches whose NET is within a time range.
+
+        args:
+            start: UNIX time or 'yyyy-mm-dd[ hh:mm[:ss]]' UTC date
+            end: UNIX time or date.  A bare date covers the whole day
+
+        returns:
+            list of launch dictionaries by NET
+        '''
+        start = _parse_date(start)
+        end = _parse_date(end, end=True)
+        if self.is_stale():
+            self.sync(startdate=time.strftime('%Y-%m-%d',
+                                              time.gmtime(start)),
+                      enddate=time.strftime('%Y-%m-%d', time.gmtime(end)))
+        lo = bisect_left(self._order, (start,))
+        hi = bisect_right(self._order, (end, float('inf')))
+        return [self._records[id] for _, id in self._order[lo:hi]]
+
+    def overlapping(self, start=None, end=None):
+        '''
+        Get the launches whose window is open at a time, or overlaps a
+        time range.  A launch without a window counts as one open at
+        its NET.
+
+        args:
+            start: UNIX time or date, defaults to the current time
+            end: UNIX time or date, defaults to start
+
+        returns:
+            list of launch dictionaries by window start
+        '''
+        if self.is_stale():
+            self.sync()
+        start = time.time() if start is None else _parse_date(start)
+        end = start if end is None else _parse_date(end, end=True)
+        # a window overlapping [start, end] opens at most _longest
+        # seconds before start
+        lo = bisect_left(self._windows, (start - self._longest,))
+        hi = bisect_right(self._windows, (end, float('inf')))
+        return [self._records[id] for _, id in self._windows[lo:hi]
+                if self._window_of[id][1] >= start]
+
+
+__all__ = ['LaunchIndex', 'LaunchTimeline',]
@@ -26,170 +26,344 @@ functions:
     rocket_event
     rocket_family
     changelog
+    paginate
+    iter_pages
+    get_many
+
+The endpoint functions are generated from the table in endpoints.py
+and share a pooled LaunchLibraryClient (see client.py) so connections
+are reused between calls.  Given expand=, they return the decoded
+listing with the referenced entities resolved, see expand.py.
 '''
 
 
-import requests
+import math
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
+from requests import RequestException
 
-def agency(**kwargs):
-    '''
-    Get spaces agencies.
+from launchlibrary.client import get_default_client
+from launchlibrary.endpoints import ENDPOINTS, resolve
+from launchlibrary.expand import expand_payload, prepare_expand
 
-    kwargs:
-        mode (str): How the data shall be returned. list, summary, verbose
-        id (int): ID of a specific agency
-        name (str): name of a specific agency
-        abbrev (str): abbreviation of a specific agency
-        type (int): agency type ID
-        countryCode (str): three letter country code for agency's country
-                         : of origin
-        islsp (int): whether or not this agency is a launch service
-                   : provide. 0 for no, 1 for yes
-        changed (str): changed on or after the supplied date
 
-    returns:
-        requests.Response object
-    '''
-    resp = requests.get('https://launchlibrary.net/1.4/agency',
-                        params=kwargs)
-    return resp
+def _endpoint_function(name):
+    endpoint = ENDPOINTS[name]
 
+    def call(expand=None, **kwargs):
+        if expand is None:
+            return get_default_client().call(endpoint, kwargs)
+        expand, params = prepare_expand(endpoint, expand, kwargs)
+        payload = get_default_client().get_json(endpoint.path, params)
+        return expand_payload(payload, endpoint, expand)
 
-def agency_type(**kwargs):
-    '''
-    Get agency type.
+    call.__name__ = call.__qualname__ = endpoint.name
+    call.__doc__ = endpoint.doc
+    return call
 
-    kwargs:
-        name (str): name for the agency type
-        id (int): ID for the integer type
-        changed (str): changed on or after the supplied date
 
-    returns:
-        requests.Response object
-    '''
-    resp = requests.get('https://launchlibrary.net/1.4/agencytype',
-                        params=kwargs)
-    return resp
+# generated from the endpoint table, see endpoints.py for their kwargs
+agency = _endpoint_function('agency')
+agency_type = _endpoint_function('agency_type')
+calendar = _endpoint_function('calendar')
+event_type = _endpoint_function('event_type')
+launch = _endpoint_function('launch')
+launch_event = _endpoint_function('launch_event')
+launch_providers = _endpoint_function('launch_providers')
+launch_status = _endpoint_function('launch_status')
+location = _endpoint_function('location')
+mission = _endpoint_function('mission')
+mission_event = _endpoint_function('mission_event')
+mission_type = _endpoint_function('mission_type')
+pad = _endpoint_function('pad')
+payload = _endpoint_function('payload')
+rocket = _endpoint_function('rocket')
+rocket_event = _endpoint_function('rocket_event')
+rocket_family = _endpoint_function('rocket_family')
 
 
-def calendar(**kwargs):
+def paginate(endpoint, page_size=100, max_workers=4, max_records=None,
+             client=None, **kwargs):
     '''
-    An alias for launch() that automatically sets format='ics'
-
-    A .ics file is universal calendar format used by several email
-    and calendar programs.
-    To parse an ICS file in Python, check out the icalendar package.
-    https://pypi.org/project/icalendar/
+    Iterate over every record of a paginated listing.
+
+    The first page is fetched to learn the listing's total, then the
+    remaining pages are fetched concurrently.  Records are yielded as
+    soon as the pages arrive, always in offset order.  At most
+    2 * max_workers pages are held in memory at a time.
+
+    args:
+        endpoint (function or str): listing function such as launch or
+                                  : agency, or its name or path
+        page_size (int): number of records requested per page
+        max_workers (int): number of pages fetched concurrently
+        max_records (int): stop after this many records.  Defaults to
+                         : the whole listing
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
 
     kwargs:
-        mode (str): list, summary, or verbose
-        sort (str): 'asc' for ascending, 'desc' for descending
-                  : Defaults to ascending
-        seq (int): sequence number to pass in
-
-        ** If all search options are omitted, next 10 launches **
-        ** are returned by default                             **
-
-        next (int): gets the next N launches
-        startdate (str): date/time to start the search at
-        enddate (str): date/time to end the search at
-        limit (int): limit of responses.  Default is 10
-        offset (int): offset for pagination
-        id (int): ID of the launch you are searching for
-        name (str): name of the launch you are searching for
-        locationid (int): locationID you are searching for
-        rocketid (int): rocketID you are searching for
-        lsp (str): Laucnh Service Provider for the launch
-        changed (str): changed on or after the supplied date
+        any filter accepted by the endpoint function except limit,
+        e.g. mode, fields, name, changed.  offset sets where iteration
+        starts
 
     returns:
-        requests.Response object
-    '''
-    resp = requests.get('https://launchlibrary.net/1.4/calendar',
-                        params=kwargs)
-    return resp
-
+        generator of record dictionaries
 
-def launch(**kwargs):
+    raises:
+        requests.HTTPError if a page request fails
     '''
-    Get launch data.
-
-    kwargs:
-        mode (str): list, summary, or verbose
-        sort (str): sorts by NET
-                  : 'asc' for ascending, 'desc' for descending
-                  : Defaults to ascending
-        seq (int): sequence number to pass in
-
-        ** If all search options are omitted, next 10 launches **
-        ** are returned by default                             **
-
-        next (int): gets the next N launches
-        startdate (str): date/time to start the search at
-        enddate (str): date/time to end the search at
-        limit (int): limit of responses.  Default is 10
-        offset (int): offset for pagination
-        id (int): ID of the launch you are searching for
-        name (str): name of the launch you are searching for
-        locationid (int): locationID you are searching for
-        rocketid (int): rocketID you are searching for
-        lsp (str): Laucnh Service Provider for the launch
-        changed (str): changed on or after the supplied date
-
-    returns:
-        requests.Response object
+    if 'limit' in kwargs:
+        raise TypeError('paginate() sets limit itself, use page_size')
+    endpoint = resolve(endpoint)
+    if not endpoint.paginated:
+        raise ValueError('{!r} is not a paginated listing'
+                         .format(endpoint.name))
+    kwargs = endpoint.prepare(kwargs)
+    key = endpoint.result_key
+    if client is None:
+        client = get_default_client()
+    start = kwargs.pop('offset', 0)
+
+    def fetch(offset, limit):
+        return client.get_json(endpoint.path,
+                               dict(kwargs, offset=offset, limit=limit))
+
+    first = fetch(start, page_size)
+    end = first['total']
+    if max_records is not None:
+        end = min(end, start + max_records)
+    records = first[key][:end - start]
+    yield from records
+    # the server may cap the page size below what was asked for
+    step = len(first[key]) or page_size
+    offsets = range(start + step, end, step)
+    for offset, page in _windowed(lambda offset: fetch(offset, step),
+                                  offsets, max_workers):
+        yield from page[key][:end - offset]
+
+
+def _windowed(fetch, offsets, max_workers):
+    # yield (offset, fetch(offset)) in offset order, with at most
+    # 2 * max_workers results fetched or in flight ahead of the caller
+    if not offsets:
+        return
+    pending = deque()
+    offsets = iter(offsets)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for offset in offsets:
+            pending.append((offset, pool.submit(fetch, offset)))
+            if len(pending) >= 2 * max_workers:
+                break
+        while pending:
+            offset, future = pending.popleft()
+            result = future.result()
+            for next_offset in offsets:
+                pending.append(
+                    (next_offset, pool.submit(fetch, next_offset)))
+                break
+            yield offset, result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+
+Page = namedtuple('Page', ['offset', 'count', 'body'])
+Page.__doc__ = '''
+    A listing page as returned by the API, not decoded.
+
+    fields:
+        offset (int): offset of the page's first record
+        count (int): number of leading records of the page that belong
+                   : to the iteration.  The last page may hold more
+                   : when max_records cuts it
+        body (bytes): the JSON response body
     '''
-    resp = requests.get('https://launchlibrary.net/1.4/launch',
-                        params=kwargs)
-    return resp
 
 
-def launch_providers(**kwargs):
+def iter_pages(endpoint, page_size=100, max_workers=4, max_records=None,
+               client=None, **kwargs):
     '''
-    Get launch service provider data.
-    A launch service provider (LSP) is an agency with the islsp flag
-    set to 1.
+    Iterate over the raw pages of a paginated listing, e.g. to decode
+    them elsewhere (see export.py).
+
+    Pages are fetched concurrently like paginate() and yielded in
+    offset order.  Only the first page is decoded, to learn the
+    listing's total.  At most 2 * max_workers pages are held in memory
+    at a time, so a slow consumer slows the fetching down.
+
+    args:
+        endpoint (function or str): see paginate()
+        page_size (int): number of records requested per page
+        max_workers (int): number of pages fetched concurrently
+        max_records (int): stop after this many records
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
 
     kwargs:
-        mode (str): How the data shall be returned. list, summary, verbose
-        id (int): ID of a specific agency
-        name (str): name of a specific agency
-        abbrev (str): abbreviation of a specific agency
-        type (int): agency type ID
-        countryCode (str): three letter country code for agency's country
-                         : of origin
-        changed (str): changed on or after the supplied date
+        see paginate()
 
     returns:
-        requests.Response object
+        generator of Page
+
+    raises:
+        requests.HTTPError if a page request fails
+    '''
+    if 'limit' in kwargs:
+        raise TypeError('iter_pages() sets limit itself, use page_size')
+    endpoint = resolve(endpoint)
+    if not endpoint.paginated:
+        raise ValueError('{!r} is not a paginated listing'
+                         .format(endpoint.name))
+    kwargs = endpoint.prepare(kwargs)
+    if client is None:
+        client = get_default_client()
+    start = kwargs.pop('offset', 0)
+
+    def fetch(offset, limit):
+        resp = client.request(endpoint.path,
+                              dict(kwargs, offset=offset, limit=limit))
+        resp.raise_for_status()
+        return resp.content
+
+    body = fetch(start, page_size)
+    first = client.decode(body)
+    end = first['total']
+    if max_records is not None:
+        end = min(end, start + max_records)
+    received = len(first[endpoint.result_key])
+    yield Page(start, max(0, min(received, end - start)), body)
+    step = received or page_size
+    offsets = range(start + step, end, step)
+    for offset, body in _windowed(lambda offset: fetch(offset, step),
+                                  offsets, max_workers):
+        yield Page(offset, min(step, end - offset), body)
+
+
+BatchResult = namedtuple('BatchResult', ['id', 'record', 'error'])
+BatchResult.__doc__ = '''
+    Outcome of one id looked up by get_many().
+
+    fields:
+        id (int): the id that was asked for
+        record (dict): the record, or None if the lookup failed
+        error (Exception): why the lookup failed, or None
     '''
-    resp = requests.get('https://launchlibrary.net/1.4/lsp',
-                        params=kwargs)
-    return resp
 
 
-def launch_status(**kwargs):
+def get_many(endpoint, ids, max_workers=8, page_size=100, listing_min=50,
+             client=None, **kwargs):
     '''
-    Get launch status.
+    Look up many records of an endpoint by id.
+
+    Ids are deduplicated and those with a fresh cached response are
+    served locally.  The rest are fetched with as few requests as
+    possible: one request per id on a thread pool, or, when the ids
+    cover enough of the listing that reading it whole takes fewer
+    requests, a concurrent paginate() over the listing.  The listing is
+    read over the full history (see Endpoint.full_listing()), since
+    the launch listing otherwise only holds upcoming launches, and ids
+    it did not reach because a page failed are looked up one by one.
+
+    args:
+        endpoint (function or str): listing function such as launch or
+                                  : agency, or its name or path
+        ids (iterable): ids to look up
+        max_workers (int): number of requests in flight at a time
+        page_size (int): page size when reading the whole listing
+        listing_min (int): only consider reading the whole listing when
+                         : at least this many ids are missing.  It costs
+                         : one extra request to learn the listing size
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
 
     kwargs:
-        name (str): name for the launch status
-        id (int): ID for the launch status
-        changed (str): changed on or after the supplied date
+        any filter accepted by the endpoint function except id, limit
+        and offset, e.g. mode
 
     returns:
-        requests.Response object
+        list of BatchResult, one per id in the order given.  Lookups
+        that failed carry the exception instead of a record: a
+        LookupError if the id does not exist, or the requests error
     '''
-    resp = requests.get('https://launchlibrary.net/1.4/launchstatus',
-                        params=kwargs)
-    return resp
+    endpoint = resolve(endpoint)
+    if not endpoint.paginated:
+        raise ValueError('{!r} is not a paginated listing'
+                         .format(endpoint.name))
+    for name in ('id', 'limit', 'offset'):
+        if name in kwargs:
+            raise TypeError('get_many() sets {} itself'.format(name))
+    kwargs = endpoint.prepare(kwargs)
+    if client is None:
+        client = get_default_client()
+    ids = list(ids)
+    key = endpoint.result_key
+    found = {} # id -> record or exception
+
+    missing = []
+    for id in dict.fromkeys(ids):
+        payload = client.get_cached_json(endpoint.path, dict(kwargs, id=id))
+        if payload is not None and payload.get(key):
+            found[id] = payload[key][0]
+        else:
+            missing.append(id)
+
+    if len(missing) >= listing_min and len(missing) > 1:
+        listing = endpoint.full_listing(kwargs)
+        wanted = {str(id): id for id in missing}
+        try:
+            probe = client.get_json(endpoint.path, dict(listing, limit=1))
+            if math.ceil(probe['total'] / page_size) < len(missing):
+                for record in paginate(endpoint, page_size, max_workers,
+                                       client=client, **listing):
+                    id = wanted.pop(str(record.get('id')), None)
+                    if id is not None:
+                        found[id] = record
+                        if not wanted:
+                            break
+                # the whole listing was read
+                for id in wanted.values():
+                    found[id] = _not_found(endpoint, id)
+                wanted = {}
+        except RequestException:
+            pass # look the rest up one by one
+        missing = list(wanted.values())
+
+    def fetch(id):
+        try:
+            records = client.get_json(endpoint.path,
+                                      dict(kwargs, id=id))[key]
+        except Exception as e:
+            return e
+        return records[0] if records else _not_found(endpoint, id)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for id, result in zip(missing, pool.map(fetch, missing)):
+                found[id] = result
+
+    results = []
+    for id in ids:
+        result = found[id]
+        if isinstance(result, Exception):
+            results.append(BatchResult(id, None, result))
+        else:
+            results.append(BatchResult(id, result, None))
+    return results
+
+
+def _not_found(endpoint, id):
+    return LookupError('no {} with id {!r}'.format(endpoint.name, id))
 
 
 __all__ = ['agency', 'agency_type', 'calendar', 'event_type', 'launch',
            'launch_event', 'launch_providers', 'launch_status', 'location',
            'mission', 'mission_event', 'mission_type', 'pad', 'payload',
-           'rocket', 'rocket_event', 'rocket_family']
+           'rocket', 'rocket_event', 'rocket_family', 'paginate',
+           'iter_pages', 'get_many', 'BatchResult', 'Page']
 
 
 if __name__ == '__main__':
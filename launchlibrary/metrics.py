@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+'''
+metrics.py
+
+Per-request instrumentation of LaunchLibraryClient.
+
+Hooks passed to the client (hooks=[...] or add_hook()) are called with
+a RequestMetrics after every request() and get_json() call, whether it
+succeeded or raised.  The time of a call is broken down into:
+
+    queue_wait  waiting for a rate limit token, and for a thread and a
+                concurrency slot when called through the async client
+    ttfb        sending the request until the response headers arrived.
+                requests does not expose connection set up, so checking
+                a connection out of the pool, DNS, TCP and TLS are
+                included here
+    download    reading the response body
+    decode      decoding the JSON body (get_json() only)
+
+HistogramAggregator keeps histograms of these in process.
+PrometheusHook and OpenTelemetryHook export them through
+prometheus_client and opentelemetry-api, which are optional and only
+imported when the hooks are created.
+
+classes:
+    RequestMetrics
+    Histogram
+    HistogramAggregator
+    PrometheusHook
+    OpenTelemetryHook
+'''
+
+
+import threading
+import time
+from bisect import bisect_left
+
+
+PHASES = ('queue_wait', 'ttfb', 'download', 'decode', 'total')
+
+# upper bounds in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestMetrics(object):
+    '''
+    Timings and outcome of one client call.  Durations are in seconds
+    and are None when the phase did not happen, e.g. ttfb for a cache
+    hit.
+
+    attributes:
+        endpoint (str): endpoint path, e.g. 'launch'
+        status (int): HTTP status returned to the caller
+        queue_wait (float): see the module docstring
+        ttfb (float): see the module docstring
+        download (float): see the module docstring
+        decode (float): see the module docstring
+        total (float): the whole call
+        bytes (int): body bytes received, after decompression, summed
+                   : over retries
+        wire_bytes (int): body bytes received over the network, before
+                        : decompression, summed over retries
+        cache (str): hit, miss, revalidated, stale (expired entry
+                   : served as is), mirror (offline answer from a
+                   : sync.Mirror), bypass (not cached) or coalesced
+                   : (shared another call's request)
+        retries (int): requests retried
+        error (Exception): what the call raised, if anything
+        started (float): time.perf_counter() when the call was made
+    '''
+
+    __slots__ = ('endpoint', 'status', 'queue_wait', 'ttfb', 'download',
+                 'decode', 'total', 'bytes', 'wire_bytes', 'cache',
+                 'retries', 'error', 'started')
+
+    def __init__(self, endpoint):
+        self.started = time.perf_counter()
+        self.endpoint = endpoint
+        self.status = None
+        self.queue_wait = 0.0
+        self.ttfb = None
+        self.download = None
+        self.decode = None
+        self.total = None
+        self.bytes = 0
+        self.wire_bytes = 0
+        self.cache = None
+        self.retries = 0
+        self.error = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return 'RequestMetrics({})'.format(', '.join(
+            '{}={!r}'.format(k, v) for k, v in self.to_dict().items()))
+
+
+class Histogram(object):
+    '''
+    Fixed bucket histogram.
+
+    args:
+        buckets (tuple): sorted upper bounds of the buckets.  Values
+                       : above the last bound go in an overflow bucket
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        '''
+        Estimate a quantile by interpolating inside its bucket.
+
+        args:
+            q (float): between 0 and 1, e.g. 0.99
+
+        returns:
+            float, or None if nothing was observed
+        '''
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else self.min
+                upper = (self.buckets[i] if i < len(self.buckets)
+                         else self.max)
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'min': self.min,
+                'max': self.max,
+                'mean': self.sum / self.count if self.count else None,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9),
+                'p99': self.quantile(0.99)}
+
+
+class HistogramAggregator(object):
+    '''
+    Hook aggregating RequestMetrics in process: a Histogram per endpoint
+    and phase, and counters of calls, errors, decompressed and wire
+    bytes, retries and cache statuses per endpoint.
+
+        >>> aggregator = HistogramAggregator()
+        >>> client = LaunchLibraryClient(hooks=[aggregator])
+        >>> ...
+        >>> aggregator.snapshot()['launch']['ttfb']['p99']
+
+    args:
+        buckets (tuple): see Histogram
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _new_endpoint(self):
+        return {'calls': 0, 'errors': 0, 'bytes': 0, 'wire_bytes': 0,
+                'retries': 0, 'cache': {},
+                'histograms': {phase: Histogram(self.buckets)
+                               for phase in PHASES}}
+
+    def __call__(self, metrics):
+        with self._lock:
+            stats = self._endpoints.get(metrics.endpoint)
+            if stats is None:
+                stats = self._endpoints[metrics.endpoint] = \
+                    self._new_endpoint()
+            stats['calls'] += 1
+            stats['errors'] += metrics.error is not None
+            stats['bytes'] += metrics.bytes
+            stats['wire_bytes'] += metrics.wire_bytes
+            stats['retries'] += metrics.retries
+            if metrics.cache is not None:
+                stats['cache'][metrics.cache] = \
+                    stats['cache'].get(metrics.cache, 0) + 1
+            for phase, histogram in stats['histograms'].items():
+                value = getattr(metrics, phase)
+                if value is not None:
+                    histogram.observe(value)
+
+    def snapshot(self):
+        '''
+        Get the aggregated metrics.
+
+        returns:
+            dictionary of endpoint path to a dictionary with the calls,
+            errors, bytes, wire_bytes, retries and cache counters and,
+            for each phase, the summary given by Histogram.to_dict()
+        '''
+        with self._lock:
+            result = {}
+            for endpoint, stats in self._endpoints.items():
+                summary = {k: v for k, v in stats.items()
+                           if k != 'histograms'}
+                summary['cache'] = dict(stats['cache'])
+                for phase, histogram in stats['histograms'].items():
+                    summary[phase] = histogram.to_dict()
+                result[endpoint] = summary
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+def _labels(metrics):
+    return {'endpoint': metrics.endpoint,
+            'status': str(metrics.status or 'error'),
+            'cache': metrics.cache or 'none'}
+
+
+class PrometheusHook(object):
+    '''
+    Hook exporting RequestMetrics to Prometheus.
+
+    Exposes <namespace>_request_phase_seconds (histogram by endpoint and
+    phase), <namespace>_requests_total (by endpoint, status and cache),
+    <namespace>_response_bytes_total (decompressed),
+    <namespace>_response_wire_bytes_total and <namespace>_retries_total
+    (by endpoint).
+
+    args:
+        registry (prometheus_client.CollectorRegistry): defaults to the
+                                                      : global registry
+        namespace (str): metric name prefix
+        buckets (tuple): histogram buckets in seconds
+
+    raises:
+        ImportError if prometheus_client is not installed
+    '''
+
+    def __init__(self, registry=None, namespace='launchlibrary',
+                 buckets=DEFAULT_BUCKETS):
+        import prometheus_client
+
+        kwargs = {'namespace': namespace}
+        if registry is not None:
+            kwargs['registry'] = registry
+        self.phases = prometheus_client.Histogram(
+            'request_phase_seconds', 'Time spent per phase of a request',
+            ['endpoint', 'phase'], buckets=buckets, **kwargs)
+        self.requests = prometheus_client.Counter(
+            'requests_total', 'Client calls',
+            ['endpoint', 'status', 'cache'], **kwargs)
+        self.bytes = prometheus_client.Counter(
+            'response_bytes_total', 'Body bytes after decompression',
+            ['endpoint'], **kwargs)
+        self.wire_bytes = prometheus_client.Counter(
+            'response_wire_bytes_total', 'Body bytes received',
+            ['endpoint'], **kwargs)
+        self.retries = prometheus_client.Counter(
+            'retries_total', 'Requests retried', ['endpoint'], **kwargs)
+
+    def __call__(self, metrics):
+        for phase in PHASES:
+            value = getattr(metrics, phase)
+            if value is not None:
+                self.phases.labels(metrics.endpoint, phase).observe(value)
+        self.requests.labels(**_labels(metrics)).inc()
+        if metrics.bytes:
+            self.bytes.labels(metrics.endpoint).inc(metrics.bytes)
+            self.wire_bytes.labels(metrics.endpoint).inc(metrics.wire_bytes)
+        if metrics.retries:
+            self.retries.labels(metrics.endpoint).inc(metrics.retries)
+
+
+class OpenTelemetryHook(object):
+    '''
+    Hook recording RequestMetrics with OpenTelemetry instruments.
+
+    Records launchlibrary.request.<phase> histograms (seconds) and the
+    launchlibrary.requests, launchlibrary.response.bytes,
+    launchlibrary.response.wire_bytes and launchlibrary.retries
+    counters, with endpoint, status and cache attributes.
+
+    args:
+        meter (opentelemetry.metrics.Meter): defaults to a meter from
+                                           : the global meter provider
+
+    raises:
+        ImportError if opentelemetry-api is not installed
+    '''
+
+    def __init__(self, meter=None):
+        if meter is None:
+            from opentelemetry import metrics as otel_metrics
+            meter = otel_metrics.get_meter('launchlibrary')
+        self.phases = {
+            phase: meter.create_histogram(
+                'launchlibrary.request.' + phase, unit='s',
+                description='Time spent in the {} phase'.format(phase))
+            for phase in PHASES}
+        self.requests = meter.create_counter(
+            'launchlibrary.requests', description='Client calls')
+        self.bytes = meter.create_counter(
+            'launchlibrary.response.bytes', unit='By',
+            description='Body bytes after decompression')
+        self.wire_bytes = meter.create_counter(
+            'launchlibrary.response.wire_bytes', unit='By',
+            description='Body bytes received')
+        self.retries = meter.create_counter(
+            'launchlibrary.retries', description='Requests retried')
+
+    def __call__(self, metrics):
+        attributes = _labels(metrics)
+        for phase, histogram in self.phases.items():
+            value = getattr(metrics, phase)
+            if value is not None:
+                histogram.record(value, attributes)
+        self.requests.add(1, attributes)
+        if metrics.bytes:
+            self.bytes.add(metrics.bytes, attributes)
+            self.wire_bytes.add(metrics.wire_bytes, attributes)
+        if metrics.retries:
+            self.retries.add(metrics.retries, attributes)
+
+
+__all__ = ['DEFAULT_BUCKETS', 'Histogram', 'HistogramAggregator',
+           'OpenTelemetryHook', 'PHASES', 'PrometheusHook',
+           'RequestMetrics',]
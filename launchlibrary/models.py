@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+'''
+models.py
+
+Typed record models for Launch Library payloads.
+
+A model wraps the decoded dictionary of one record without copying it.
+Scalar fields are read straight from that dictionary on attribute
+access, and nested objects (a launch's rocket, location, missions, ...)
+are only wrapped in their own model the first time they are accessed,
+then kept in a slot.  The dictionary stays reachable through the raw
+attribute.
+
+Only the wrapping is lazy: the JSON body is decoded in full up front,
+by the client's decoder (see decoding.py).  What is saved is the work
+and memory of building model objects for nesting that is never read.
+LaunchLibraryClient.get_records() fetches, decodes and wraps in one
+call:
+
+    >>> launches = client.get_records('launch', Launch, {'next': 5})
+    >>> launches[0].rocket.name
+
+classes:
+    Record
+    Agency
+    AgencyType
+    LaunchStatus
+    Mission
+    Pad
+    Location
+    RocketFamily
+    Rocket
+    Launch
+
+functions:
+    from_payload
+    from_response
+'''
+
+
+class Record(object):
+    '''
+    Base class of the record models.
+
+    Subclasses list the attributes holding nested records in _nested,
+    mapping each to the model class used to wrap it, and declare a slot
+    for each of them so the wrapped value is cached on first access.
+
+    args:
+        raw (dict): the decoded JSON object of the record
+    '''
+
+    __slots__ = ('_raw',)
+
+    _nested = {} # attribute name -> model class
+    _result_key = None # key of the record list in a listing payload
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        # only reached when the attribute is not set on the instance
+        if name.startswith('_'):
+            raise AttributeError(name)
+        raw = self._raw
+        model = self._nested.get(name)
+        if model is not None:
+            value = _wrap(raw.get(name), model)
+            object.__setattr__(self, name, value)
+            return value
+        try:
+            return raw[name]
+        except KeyError:
+            raise AttributeError('{} has no field {!r}'.format(
+                type(self).__name__, name)) from None
+
+    @property
+    def raw(self):
+        '''
+        The decoded JSON object this record wraps.
+        '''
+        return self._raw
+
+    def to_dict(self):
+        '''
+        Get the record as a plain dictionary.
+
+        returns:
+            the dictionary the record wraps, not a copy
+        '''
+        return self._raw
+
+    def get(self, name, default=None):
+        '''
+        Get a field, or default if the payload does not have it.
+        '''
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            return default
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._raw == other._raw
+
+    def __hash__(self):
+        return hash((type(self), self._raw.get('id')))
+
+    def __repr__(self):
+        return '{}(id={!r}, name={!r})'.format(
+            type(self).__name__, self._raw.get('id'), self._raw.get('name'))
+
+    def __getstate__(self):
+        return self._raw
+
+    def __setstate__(self, raw):
+        self._raw = raw
+
+
+def _wrap(value, model):
+    if isinstance(value, dict):
+        return model(value)
+    if isinstance(value, list):
+        return [model(v) if isinstance(v, dict) else v for v in value]
+    # list mode payloads reference some objects by id only
+    return value
+
+
+class Agency(Record):
+    '''
+    A space agency or launch service provider.
+
+    fields:
+        id, name, abbrev, countryCode, type, islsp, infoURLs, wikiURL,
+        changed
+    '''
+
+    __slots__ = ()
+    _result_key = 'agencies'
+
+
+class AgencyType(Record):
+    '''
+    A category of agency, e.g. Government.
+
+    fields:
+        id, name, changed
+    '''
+
+    __slots__ = ()
+    _result_key = 'types'
+
+
+class LaunchStatus(Record):
+    '''
+    A launch status, e.g. Go or Success.
+
+    fields:
+        id, name, description, changed
+    '''
+
+    __slots__ = ()
+    _result_key = 'types'
+
+
+class Mission(Record):
+    '''
+    A mission flown by a launch.
+
+    fields:
+        id, name, description, type, typeName, agencies, payloads
+    '''
+
+    __slots__ = ('agencies',)
+    _nested = {'agencies': Agency}
+    _result_key = 'missions'
+
+
+class Pad(Record):
+    '''
+    A launch pad.
+
+    fields:
+        id, name, latitude, longitude, mapURL, infoURLs, wikiURL,
+        agencies, changed
+    '''
+
+    __slots__ = ('agencies',)
+    _nested = {'agencies': Agency}
+    _result_key = 'pads'
+
+
+class Location(Record):
+    '''
+    A launch site made up of one or more pads.
+
+    fields:
+        id, name, countryCode, infoURL, wikiURL, pads, changed
+    '''
+
+    __slots__ = ('pads',)
+    _nested = {'pads': Pad}
+    _result_key = 'locations'
+
+
+class RocketFamily(Record):
+    '''
+    A family of launch vehicles.
+
+    fields:
+        id, name, agencies, changed
+    '''
+
+    __slots__ = ('agencies',)
+    _nested = {'agencies': Agency}
+    _result_key = 'RocketFamilies'
+
+
+class Rocket(Record):
+    '''
+    A launch vehicle configuration.
+
+    fields:
+        id, name, configuration, familyname, family, agencies, wikiURL,
+        infoURLs, imageURL, imageSizes, changed
+    '''
+
+    __slots__ = ('family', 'agencies')
+    _nested = {'family': RocketFamily, 'agencies': Agency}
+    _result_key = 'rockets'
+
+
+class Launch(Record):
+    '''
+    A launch.
+
+    fields:
+        id, name, windowstart, windowend, net, wsstamp, westamp,
+        netstamp, isostart, isoend, isonet, status, inhold, tbdtime,
+        tbddate, probability, holdreason, failreason, hashtag, vidURLs,
+        infoURLs, location, rocket, missions, lsp, changed
+    '''
+
+    __slots__ = ('location', 'rocket', 'missions', 'lsp')
+    _nested = {'location': Location, 'rocket': Rocket, 'missions': Mission,
+               'lsp': Agency}
+    _result_key = 'launches'
+
+
+def from_payload(payload, model):
+    '''
+    Wrap the records of a decoded listing payload.
+
+    args:
+        payload (dict): decoded JSON of a listing, e.g. launch().json()
+        model (type): Record subclass of the listing's records
+
+    returns:
+        list of model instances
+    '''
+    return [model(raw) for raw in payload.get(model._result_key, ())]
+
+
+def from_response(resp, model, client=None):
+    '''
+    Decode a listing response and wrap its records.
+
+    args:
+        resp (requests.Response): response of an endpoint function
+        model (type): Record subclass of the listing's records
+
+    kwargs:
+        client (LaunchLibraryClient): client whose decoder is used.
+                                    : Defaults to the shared client
+
+    returns:
+        list of model instances
+    '''
+    if client is None:
+        from launchlibrary.client import get_default_client
+        client = get_default_client()
+    return from_payload(client.decode(resp.content), model)
+
+
+__all__ = ['Agency', 'AgencyType', 'Launch', 'LaunchStatus', 'Location',
+           'Mission', 'Pad', 'Record', 'Rocket', 'RocketFamily',
+           'from_payload', 'from_response',]
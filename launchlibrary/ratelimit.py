@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+'''
+ratelimit.py
+
+Client side rate limiting with token buckets.
+
+A bucket holds up to capacity tokens and refills at rate tokens per
+second.  Every request takes one token, waiting for it if the bucket is
+empty, so sustained throughput stays at rate while bursts of up to
+capacity requests go through at once.  Waiting callers reserve their
+token before sleeping, so they are served in arrival order and the
+lock is never held while sleeping.
+
+classes:
+    TokenBucket
+    AsyncTokenBucket
+'''
+
+
+import threading
+import time
+
+
+class _Bucket(object):
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None
+                              else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity,
+                               self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def _reserve(self, tokens):
+        # take the tokens now, possibly going into debt, and return how
+        # long the caller has to wait for the debt to be repaid
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens=1):
+        '''
+        Take tokens only if they are available right away.
+
+        returns:
+            True if the tokens were taken
+        '''
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def pause(self, seconds):
+        '''
+        Hold back every caller for at least seconds, e.g. when the
+        server answered 429 Too Many Requests with a Retry-After.
+        '''
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class TokenBucket(_Bucket):
+    '''
+    Token bucket shared between threads.
+
+    args:
+        rate (float): tokens added per second, i.e. the sustained number
+                    : of requests per second
+        capacity (float): maximum burst size.  Defaults to one second
+                        : worth of tokens
+    '''
+
+    def acquire(self, tokens=1):
+        '''
+        Take tokens, sleeping until they are available.
+
+        returns:
+            the number of seconds spent waiting
+        '''
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class AsyncTokenBucket(_Bucket):
+    '''
+    Token bucket for asyncio.  Waiting only suspends the calling task.
+    It may be shared between event loops and threads.
+
+    args:
+        rate (float): see TokenBucket
+        capacity (float): see TokenBucket
+    '''
+
+    async def acquire(self, tokens=1):
+        '''
+        Take tokens, waiting asynchronously until they are available.
+
+        returns:
+            the number of seconds spent waiting
+        '''
+        import asyncio
+
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+__all__ = ['AsyncTokenBucket', 'TokenBucket',]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+'''
+retry.py
+
+Retrying failed requests and tripping a circuit breaker when the API
+keeps failing.
+
+classes:
+    RetryPolicy
+    CircuitBreaker
+    CircuitOpenError
+'''
+
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+class CircuitOpenError(requests.RequestException):
+    '''
+    Raised instead of sending a request while the circuit breaker is
+    open.
+
+    attributes:
+        retry_at (float): time.monotonic() at which a trial request will
+                        : be let through again
+    '''
+
+    def __init__(self, message, retry_at):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+class RetryPolicy(object):
+    '''
+    When and how long to wait before retrying a request.
+
+    Delays grow exponentially with full jitter, i.e. a random delay
+    between 0 and min(max_backoff, backoff * 2 ** attempt), unless the
+    server sent a Retry-After header, which is honoured.
+
+    args:
+        max_retries (int): retries after the first attempt
+        backoff (float): base delay in seconds
+        max_backoff (float): cap on the computed delay in seconds
+        max_retry_after (float): cap on a server supplied Retry-After
+        statuses (tuple): response statuses worth retrying
+        exceptions (tuple): exception types worth retrying
+    '''
+
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30.0,
+                 max_retry_after=300.0,
+                 statuses=(429, 500, 502, 503, 504),
+                 exceptions=(requests.ConnectionError, requests.Timeout)):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+
+    def should_retry(self, attempt, resp=None, error=None):
+        '''
+        Decide whether a failed attempt is retried.
+
+        args:
+            attempt (int): number of retries already made
+            resp (requests.Response): the response, if one arrived
+            error (Exception): the exception raised, if any
+
+        returns:
+            bool
+        '''
+        if attempt >= self.max_retries:
+            return False
+        if error is not None:
+            return isinstance(error, self.exceptions)
+        return resp is not None and resp.status_code in self.statuses
+
+    def delay(self, attempt, resp=None):
+        '''
+        Get the number of seconds to wait before the next attempt.
+
+        args:
+            attempt (int): number of retries already made
+            resp (requests.Response): the failed response, if any
+        '''
+        retry_after = None if resp is None else retry_after_seconds(resp)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        ceiling = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+
+def retry_after_seconds(resp):
+    '''
+    Parse the Retry-After header of a response.
+
+    returns:
+        float seconds, or None if the header is missing or malformed
+    '''
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class CircuitBreaker(object):
+    '''
+    Stops sending requests for a while after repeated failures.
+
+    The breaker is closed while requests succeed.  After
+    failure_threshold consecutive failures it opens and every request
+    fails fast with CircuitOpenError.  Once recovery_timeout seconds
+    have passed a single trial request is let through (half open): if
+    it succeeds the breaker closes, otherwise it opens again.
+
+    args:
+        failure_threshold (int): consecutive failures opening the breaker
+        recovery_timeout (float): seconds to stay open
+    '''
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        '''
+        Check that a request may be sent.
+
+        raises:
+            CircuitOpenError if the breaker is open
+        '''
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_at = self._opened_at + self.recovery_timeout
+            if self.state == self.OPEN and time.monotonic() >= retry_at:
+                self.state = self.HALF_OPEN
+                return
+            raise CircuitOpenError(
+                'circuit breaker is {} after {} failures'.format(
+                    self.state, self.failures), retry_at)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+__all__ = ['CircuitBreaker', 'CircuitOpenError', 'RetryPolicy',
+           'retry_after_seconds',]
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+'''
+snapshot.py
+
+Compact binary snapshots of mirrored records, read through mmap.
+
+Loading a large JSON dump at start up parses every record, and every
+worker process ends up with its own copy.  A snapshot is written once,
+e.g. after each sync, and opened with mmap: opening it reads a small
+header, records are only decoded when asked for, and processes mapping
+the same file, or forked from one that did, share its pages through
+the OS page cache.
+
+Layout (little endian, sections 8 byte aligned):
+
+    header      magic, version, section count, string pool offset and
+                string count
+    sections    one directory entry per endpoint: name, record count
+                and the offsets of its columns and records
+    columns     per section, record ids sorted ascending (int64), NET
+                and changed timestamps (int64, 0 when absent) and the
+                offset of every record (uint64), all in id order
+    records     values tagged with one byte.  Strings, including dict
+                keys, are uint32 references into the string pool
+    strings     every distinct string once: uint64 end offsets, then
+                the UTF-8 data
+
+Looking a record up by id is a binary search over the mapped id column
+followed by decoding that one record.  Records are decoded in Python,
+so reading every record of a snapshot is slower than parsing the same
+JSON with a C decoder; snapshots pay off when a process starts often
+and reads a fraction of the records (see benchmarks/bench_snapshot.py).
+
+    >>> write_snapshot('mirror.snap', {'launch': launches})
+    >>> with Snapshot('mirror.snap') as snapshot:
+    ...     snapshot.get('launch', 1590)
+
+classes:
+    Snapshot
+
+functions:
+    write_snapshot
+    dump_mirror
+'''
+
+
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+from launchlibrary.columnar import CHANGED_FORMAT, net_stamp, parse_stamp
+
+
+MAGIC = b'LLSNAP\x00\x00'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sIIQQ') # magic, version, sections, strings
+_SECTION = struct.Struct('<IIQQQQQ') # name, count, column offsets, blob
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+
+# value tags
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _DICT, _BIGINT = range(9)
+
+_I64_MIN, _I64_MAX = -2 ** 63, 2 ** 63 - 1
+
+COLUMNS = ('ids', 'netstamp', 'changed')
+
+
+def _pad(size):
+    return -size % 8
+
+
+class _Encoder(object):
+    # encodes records, interning their strings
+
+    def __init__(self):
+        self.strings = {}
+
+    def string(self, value):
+        sid = self.strings.get(value)
+        if sid is None:
+            sid = self.strings[value] = len(self.strings)
+        return sid
+
+    def encode(self, value, out):
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            if _I64_MIN <= value <= _I64_MAX:
+                out.append(_INT)
+                out += _I64.pack(value)
+            else:
+                out.append(_BIGINT)
+                out += _U32.pack(self.string(str(value)))
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _F64.pack(value)
+        elif isinstance(value, str):
+            out.append(_STR)
+            out += _U32.pack(self.string(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            out += _U32.pack(len(value))
+            for item in value:
+                self.encode(item, out)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            out += _U32.pack(len(value))
+            for key, item in value.items():
+                out += _U32.pack(self.string(str(key)))
+                self.encode(item, out)
+        else:
+            raise TypeError('cannot store {!r} in a snapshot'
+                            .format(type(value).__name__))
+
+
+def write_snapshot(path, sections):
+    '''
+    Write records to a snapshot file.  The file is written next to path
+    and renamed over it when complete, so readers never see half a
+    snapshot.
+
+    args:
+        path (str): file to write
+        sections (dict): endpoint path -> iterable of record
+                       : dictionaries with an integer id key, e.g.
+                       : {'launch': launches, 'agency': agencies}
+
+    returns:
+        number of records written
+    '''
+    encoder = _Encoder()
+    built = []
+    for name, records in sections.items():
+        records = sorted(records, key=lambda record: record['id'])
+        blob = bytearray()
+        offsets = []
+        for record in records:
+            offsets.append(len(blob))
+            encoder.encode(record, blob)
+        columns = (
+            [record['id'] for record in records],
+            [int(net_stamp(record) or 0) for record in records],
+            [parse_stamp(record.get('changed'), CHANGED_FORMAT) or 0
+             for record in records],
+        )
+        built.append((encoder.string(name), records, columns, offsets,
+                      blob))
+
+    position = _HEADER.size + _SECTION.size * len(built)
+    body = []
+    directory = []
+    for sid, records, columns, offsets, blob in built:
+        count = len(records)
+        column_offsets = []
+        for values in columns:
+            column_offsets.append(position)
+            body.append(struct.pack('<{}q'.format(count), *values))
+            position += 8 * count
+        offsets_at = position
+        body.append(struct.pack('<{}Q'.format(count), *offsets))
+        position += 8 * count
+        blob_at = position
+        body.append(bytes(blob) + b'\x00' * _pad(len(blob)))
+        position += len(blob) + _pad(len(blob))
+        directory.append(_SECTION.pack(sid, count, column_offsets[0],
+                                       column_offsets[1], column_offsets[2],
+                                       offsets_at, blob_at))
+
+    strings = [s.encode('utf-8') for s in encoder.strings]
+    ends = []
+    end = 0
+    for data in strings:
+        end += len(data)
+        ends.append(end)
+    header = _HEADER.pack(MAGIC, VERSION, len(built), position,
+                          len(strings))
+
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.writelines(directory)
+        f.writelines(body)
+        f.write(struct.pack('<{}Q'.format(len(ends)), *ends))
+        f.writelines(strings)
+    os.replace(tmp, path)
+    return sum(len(records) for _, records, _, _, _ in built)
+
+
+def dump_mirror(mirror, path, endpoints=None):
+    '''
+    Write the records of a sync.Mirror to a snapshot.
+
+    args:
+        mirror (sync.Mirror): mirror to read
+        path (str): file to write
+        endpoints (tuple): endpoints included.  Defaults to those synced
+                         : by default, see sync.DEFAULT_ENDPOINTS
+
+    returns:
+        number of records written
+    '''
+    if endpoints is None:
+        from launchlibrary.sync import DEFAULT_ENDPOINTS as endpoints
+    return write_snapshot(path, {endpoint: mirror.records(endpoint)
+                                 for endpoint in endpoints})
+
+
+class _Section(object):
+
+    def __init__(self, buffer, entry):
+        (_, self.count, ids_at, netstamp_at, changed_at, offsets_at,
+         self.blob) = entry
+        end = 8 * self.count
+        self.columns = {
+            'ids': buffer[ids_at:ids_at + end].cast('q'),
+            'netstamp': buffer[netstamp_at:netstamp_at + end].cast('q'),
+            'changed': buffer[changed_at:changed_at + end].cast('q'),
+        }
+        self.offsets = buffer[offsets_at:offsets_at + end].cast('Q')
+
+
+class Snapshot(object):
+    '''
+    Read only view of a snapshot file.  Nothing but the header and the
+    section directory is read when it is opened.
+
+    args:
+        path (str): snapshot file, see write_snapshot()
+
+    raises:
+        ValueError if the file is not a snapshot, or of another version
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        buffer = self._buffer
+        if len(buffer) < _HEADER.size:
+            raise ValueError('{} is not a snapshot'.format(self.path))
+        magic, version, sections, strings_at, strings = \
+            _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError('{} is not a snapshot'.format(self.path))
+        if version != VERSION:
+            raise ValueError('{} is a version {} snapshot, expected {}'
+                             .format(self.path, version, VERSION))
+        self._ends = buffer[strings_at:strings_at + 8 * strings].cast('Q')
+        self._strings_at = strings_at + 8 * strings
+        self._strings = [None] * strings # decoded on first use
+        self._sections = {}
+        for i in range(sections):
+            entry = _SECTION.unpack_from(buffer,
+                                         _HEADER.size + i * _SECTION.size)
+            self._sections[self._string(entry[0])] = _Section(buffer, entry)
+
+    def _string(self, sid):
+        value = self._strings[sid]
+        if value is None:
+            start = self._ends[sid - 1] if sid else 0
+            value = str(self._buffer[self._strings_at + start:
+                                     self._strings_at + self._ends[sid]],
+                        'utf-8')
+            self._strings[sid] = value
+        return value
+
+    def _decode(self, position):
+        # returns the value at position and the position after it.  The
+        # common cases are inlined, this runs for every value read
+        buffer = self._mmap
+        strings = self._strings
+        unpack_u32 = _U32.unpack_from
+        tag = buffer[position]
+        position += 1
+        if tag == _DICT:
+            count, = unpack_u32(buffer, position)
+            position += 4
+            value = {}
+            for _ in range(count):
+                sid, = unpack_u32(buffer, position)
+                key = strings[sid] or self._string(sid)
+                tag = buffer[position + 4]
+                position += 5
+                if tag == _STR:
+                    sid, = unpack_u32(buffer, position)
+                    value[key] = strings[sid] or self._string(sid)
+                    position += 4
+                elif tag == _INT:
+                    value[key], = _I64.unpack_from(buffer, position)
+                    position += 8
+                elif tag == _NONE:
+                    value[key] = None
+                else:
+                    value[key], position = self._decode(position - 1)
+            return value, position
+        if tag == _STR:
+            sid, = unpack_u32(buffer, position)
+            return strings[sid] or self._string(sid), position + 4
+        if tag == _INT:
+            return _I64.unpack_from(buffer, position)[0], position + 8
+        if tag == _LIST:
+            count, = unpack_u32(buffer, position)
+            position += 4
+            value = []
+            for _ in range(count):
+                item, position = self._decode(position)
+                value.append(item)
+            return value, position
+        if tag == _NONE:
+            return None, position
+        if tag == _FLOAT:
+            return _F64.unpack_from(buffer, position)[0], position + 8
+        if tag in (_TRUE, _FALSE):
+            return tag == _TRUE, position
+        if tag == _BIGINT:
+            sid, = unpack_u32(buffer, position)
+            return int(self._string(sid)), position + 4
+        raise ValueError('corrupt snapshot {}: tag {} at {}'
+                         .format(self.path, tag, position - 1))
+
+    def _section(self, endpoint):
+        try:
+            return self._sections[endpoint]
+        except KeyError:
+            raise KeyError('no {!r} records in {}'.format(endpoint,
+                                                          self.path))
+
+    @property
+    def endpoints(self):
+        '''
+        Endpoint paths held by the snapshot.
+        '''
+        return list(self._sections)
+
+    def count(self, endpoint):
+        '''
+        Get the number of records of an endpoint.
+        '''
+        return self._section(endpoint).count
+
+    def column(self, endpoint, name):
+        '''
+        Get a fixed width column of an endpoint, in id order, without
+        copying it out of the mapping.
+
+        args:
+            endpoint (str): endpoint path, e.g. 'launch'
+            name (str): 'ids', 'netstamp' or 'changed' (UNIX times, 0
+                      : when the record has none)
+
+        returns:
+            memoryview of int64
+        '''
+        return self._section(endpoint).columns[name]
+
+    def _record(self, section, i):
+        return self._decode(section.blob + section.offsets[i])[0]
+
+    def get(self, endpoint, id):
+        '''
+        Get one record by id, decoding only that record.
+
+        returns:
+            dictionary or None
+
+        raises:
+            KeyError if the snapshot holds no records of endpoint
+        '''
+        section = self._section(endpoint)
+        ids = section.columns['ids']
+        i = bisect_left(ids, id)
+        if i == section.count or ids[i] != id:
+            return None
+        return self._record(section, i)
+
+    def records(self, endpoint):
+        '''
+        Iterate over the records of an endpoint in id order.
+
+        returns:
+            generator of record dictionaries
+        '''
+        section = self._section(endpoint)
+        for i in range(section.count):
+            yield self._record(section, i)
+
+    def close(self):
+        '''
+        Unmap the file.  Records already returned stay usable, columns
+        must not be used any more.
+        '''
+        if self._mmap is None:
+            return
+        for section in getattr(self, '_sections', {}).values():
+            for column in section.columns.values():
+                column.release()
+            section.offsets.release()
+        if getattr(self, '_ends', None) is not None:
+            self._ends.release()
+        self._buffer.release()
+        self._mmap.close()
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+__all__ = ['COLUMNS', 'Snapshot', 'dump_mirror', 'write_snapshot',]
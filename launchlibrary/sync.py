@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+'''
+sync.py
+
+Incremental synchronisation of a local mirror of the Launch Library.
+
+Every endpoint accepts a changed parameter returning only the records
+changed on or after a date.  The SyncEngine keeps a high-water mark per
+endpoint (the newest changed value it has seen) and on each run fetches
+only the records changed since then, merging them into the Mirror by
+id.  The first run of an endpoint downloads the full listing, asking
+for launches changed since CHANGED_FLOOR, as without a search option
+the API only lists upcoming launches.
+
+classes:
+    Mirror
+    SyncEngine
+'''
+
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from launchlibrary.endpoints import resolve
+from launchlibrary.launchlibrary import paginate
+
+
+DEFAULT_ENDPOINTS = ('launch', 'agency', 'rocket', 'pad')
+
+
+class Mirror(object):
+    '''
+    Local copy of Launch Library records stored in a SQLite file.
+
+    Records are kept per endpoint and keyed by id, together with the
+    high-water mark of each endpoint.
+
+    args:
+        path (str): path of the database file, or ':memory:'
+    '''
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS records (
+            endpoint TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            changed TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (endpoint, id)
+        );
+        CREATE TABLE IF NOT EXISTS watermarks (
+            endpoint TEXT PRIMARY KEY,
+            changed TEXT,
+            synced_at REAL NOT NULL
+        );
+    '''
+
+    def __init__(self, path=':memory:'):
+        if path != ':memory:':
+            path = os.path.abspath(path)
+        self.path = path
+        self._local = threading.local()
+        self._shared = None
+        if path == ':memory:':
+            # an in-memory database only exists on its one connection
+            self._shared = self._connect()
+        self._connection().executescript(self._SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        if self.path != ':memory:':
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connection(self):
+        if self._shared is not None:
+            return self._shared
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def merge(self, endpoint, records):
+        '''
+        Insert or replace records by id.
+
+        args:
+            endpoint (str): endpoint the records came from
+            records (iterable): record dictionaries with an id key
+
+        returns:
+            number of records merged
+        '''
+        rows = [(endpoint, record['id'], record.get('changed'),
+                 json.dumps(record)) for record in records]
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return len(rows)
+
+    def get(self, endpoint, id):
+        '''
+        Get one record by id.
+
+        returns:
+            dictionary or None
+        '''
+        row = self._connection().execute(
+            'SELECT data FROM records WHERE endpoint = ? AND id = ?',
+            (endpoint, id)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def records(self, endpoint, changed=None):
+        '''
+        Iterate over the records of an endpoint in id order.
+
+        args:
+            endpoint (str): endpoint the records came from
+            changed (str): only records changed on or after this
+                         : 'yyyy-mm-dd hh:mm:ss' date
+
+        returns:
+            generator of record dictionaries
+        '''
+        if changed is None:
+            cursor = self._connection().execute(
+                'SELECT data FROM records WHERE endpoint = ? ORDER BY id',
+                (endpoint,))
+        else:
+            cursor = self._connection().execute(
+                'SELECT data FROM records WHERE endpoint = ? '
+                'AND changed >= ? ORDER BY id', (endpoint, changed))
+        for data, in cursor:
+            yield json.loads(data)
+
+    def count(self, endpoint):
+        '''
+        Get the number of records mirrored for an endpoint.
+        '''
+        count, = self._connection().execute(
+            'SELECT COUNT(*) FROM records WHERE endpoint = ?',
+            (endpoint,)).fetchone()
+        return count
+
+    def watermark(self, endpoint):
+        '''
+        Get the newest changed value seen for an endpoint.
+
+        returns:
+            str in the 'yyyy-mm-dd hh:mm:ss' format, or None if the
+            endpoint was never synced
+        '''
+        row = self._connection().execute(
+            'SELECT changed FROM watermarks WHERE endpoint = ?',
+            (endpoint,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_watermark(self, endpoint, changed):
+        '''
+        Record the high-water mark of an endpoint.
+        '''
+        self._connection().execute(
+            'INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)',
+            (endpoint, changed, time.time()))
+
+    def close(self):
+        '''
+        Close the calling thread's connection to the database.
+        '''
+        conn = self._shared or getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SyncEngine(object):
+    '''
+    Keeps a Mirror up to date using the changed parameter.
+
+    args:
+        mirror (Mirror): where records and high-water marks are stored
+        client (LaunchLibraryClient): client used for the requests.
+                                    : Defaults to the shared client
+        endpoints (tuple): endpoints synced by sync_all()
+        mode (str): detail level requested, list, summary or verbose
+        page_size (int): see launchlibrary.paginate()
+        max_workers (int): see launchlibrary.paginate()
+        batch_size (int): number of records merged per transaction
+    '''
+
+    def __init__(self, mirror, client=None, endpoints=DEFAULT_ENDPOINTS,
+                 mode='verbose', page_size=100, max_workers=4,
+                 batch_size=500):
+        self.mirror = mirror
+        self.client = client
+        self.endpoints = tuple(endpoints)
+        self.mode = mode
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    def sync(self, endpoint):
+        '''
+        Fetch the records of an endpoint changed since its high-water
+        mark and merge them into the mirror.  The high-water mark only
+        moves once every changed record has been stored, so an
+        interrupted run is simply repeated next time.
+
+        args:
+            endpoint (str): endpoint name, e.g. 'launch'
+
+        returns:
+            number of records merged
+        '''
+        watermark = self.mirror.watermark(endpoint)
+        kwargs = {'mode': self.mode}
+        if watermark is not None:
+            kwargs['changed'] = watermark
+        else:
+            kwargs = resolve(endpoint).full_listing(kwargs)
+        records = paginate(endpoint, page_size=self.page_size,
+                           max_workers=self.max_workers,
+                           client=self.client, **kwargs)
+        merged = 0
+        newest = watermark
+        batch = []
+        for record in records:
+            changed = record.get('changed')
+            if changed and (newest is None or changed > newest):
+                newest = changed
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                merged += self.mirror.merge(endpoint, batch)
+                batch = []
+        if batch:
+            merged += self.mirror.merge(endpoint, batch)
+        self.mirror.set_watermark(endpoint, newest)
+        return merged
+
+    def sync_all(self):
+        '''
+        Run sync() for every configured endpoint.
+
+        returns:
+            dictionary of endpoint name to number of records merged
+        '''
+        return {endpoint: self.sync(endpoint) for endpoint in self.endpoints}
+
+
+__all__ = ['Mirror', 'SyncEngine',]
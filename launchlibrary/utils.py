@@ -7,53 +7,125 @@ This module contains utility functions used for various reasons in the
 launchlibrary API wrapper.
 
 functions:
+    iter_ics_events
+    iter_ics_lines
     parse_ics_calendar_format
 '''
 
 
-def parse_ics_calendar_format(ics_response_string):
+def _split_chunks(chunks):
+    buffer = b''
+    for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b'\n')
+        buffer = lines.pop()
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def iter_ics_lines(source, chunked=False):
     '''
-    Parses an ICS string returned by the calendar(format='ics') call.
+    Iterate over the content lines of an ICS calendar, unfolding lines
+    continued over several physical lines (RFC 5545 section 3.1).
+
+    Only one logical line is held in memory at a time.
 
     args:
-        ics_response_string (str): the string returned in the content
-                                   of the call to callendar(format='ics')
+        source: a requests.Response, read incrementally (pass one
+              : obtained with stream=True, e.g. from
+              : LaunchLibraryClient.stream(), to avoid loading the
+              : body), or an iterable of lines as bytes or str, with or
+              : without their line terminators
+        chunked (bool): source yields arbitrary chunks of bytes rather
+                      : than whole lines, e.g. Response.iter_content()
+
     returns:
-        dictionary with the key:value pairs given in the content string
+        generator of bytes, one per content line, without terminator
     '''
-    ret = dict()
-    lines = ics_response_string.splitlines()
-    first_four = lines[:4]
-    rest = lines[4:]
-    for item in first_four:
-        key, value = item.split(b':', maxsplit=1)
-        ret[key] = value
-    ret['launches'] = __parse_ics_launches(rest)
-    return ret
+    if hasattr(source, 'iter_content'):
+        source, chunked = source.iter_content(chunk_size=8192), True
+    if chunked:
+        source = _split_chunks(source)
+    pending = None
+    for line in source:
+        if isinstance(line, str):
+            line = line.encode('utf-8')
+        line = line.rstrip(b'\r\n')
+        if not line:
+            continue
+        if line[:1] in (b' ', b'\t'):
+            # continuation of the previous line, minus the fold space
+            if pending is not None:
+                pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
 
 
-def __parse_ics_launches(launches_list):
+def iter_ics_events(source, header=None, chunked=False):
     '''
-    Function for internal use only.
-    Used by parse_ics_calendar_format() to parse the list of launches
-    provided by the call to calendar(format='ics')
+    Iterate over the VEVENTs of an ICS calendar one at a time, e.g. the
+    launches returned by calendar().  Memory use does not depend on the
+    size of the calendar.
 
     args:
-        launches_list (list): list of launches in ics format
+        source: see iter_ics_lines()
+        chunked (bool): see iter_ics_lines()
+        header (dict): if given, the calendar level properties (BEGIN,
+                     : VERSION, PRODID, ...) are stored in it as they
+                     : are read
 
     returns:
-        list of launches
+        generator of dictionaries, one per event, mapping each property
+        name (bytes, including any parameters) to its value (bytes).
+        BEGIN and END are included as they were by
+        parse_ics_calendar_format().  Properties of components nested
+        in an event, such as VALARM, are skipped.
     '''
-    ret = [] # list of launches to return
-    __d = dict() # used for storing the intermediate dictionary
-    for item in launches_list:
-        key, value = item.split(b':', maxsplit=1)
+    event = None
+    depth = 0 # components opened inside the current event
+    for line in iter_ics_lines(source, chunked):
+        key, _, value = line.partition(b':')
+        if event is None:
+            if key == b'BEGIN' and value == b'VEVENT':
+                event = {key: value}
+            elif header is not None and key != b'END':
+                header[key] = value
+            continue
         if key == b'BEGIN':
-            __d.clear() # clear intermediate dictionary at the start
-        __d[key] = value
-        if key == b'END':
-            ret.append(__d) # append intermediate dictionary at the end
+            depth += 1
+        elif key == b'END' and depth:
+            depth -= 1
+        elif depth == 0:
+            event[key] = value
+            if key == b'END':
+                yield event
+                event = None
+
+
+def parse_ics_calendar_format(ics_response_string):
+    '''
+    Parses an ICS string returned by the calendar(format='ics') call.
+
+    For large calendars prefer iter_ics_events(), which does not build
+    the full list in memory.
+
+    args:
+        ics_response_string (bytes): the string returned in the content
+                                     of the call to callendar(format='ics')
+    returns:
+        dictionary with the key:value pairs given in the content string
+        and the list of events under 'launches'
+    '''
+    ret = dict()
+    ret['launches'] = list(iter_ics_events(
+        ics_response_string.splitlines(), header=ret))
     return ret
 
 
-__all__ = ['parse_ics_calendar_format',]
+__all__ = ['iter_ics_events', 'iter_ics_lines',
+           'parse_ics_calendar_format',]
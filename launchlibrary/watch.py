@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+'''
+watch.py
+
+Change notifications for upcoming launches.
+
+Instead of polling launch(next=N) and comparing the whole listing every
+few seconds, watch() polls it for the caller and only yields a
+ChangeEvent when a launch is added or removed, or its status, NET or
+launch window changes.  Each poll is a conditional request answered
+with 304 Not Modified while the listing is unchanged, and a body that
+does come back is hashed before being decoded, so an unchanged listing
+costs a round trip and no decoding.  The pace adapts to the nearest
+NET: every few seconds when a launch is imminent, every few minutes
+when nothing is close.
+
+    >>> for event in watch(next=5):
+    ...     if event.kind == STATUS:
+    ...         notify(event.launch['name'], event.launch['status'])
+
+classes:
+    ChangeEvent
+    Watcher
+
+functions:
+    diff_launches
+    watch
+    awatch
+'''
+
+
+import asyncio
+import hashlib
+import time
+from collections import namedtuple
+
+from launchlibrary.aio import get_default_async_client
+from launchlibrary.client import get_default_client
+from launchlibrary.columnar import net_stamp
+from launchlibrary.endpoints import ENDPOINTS
+
+
+# ChangeEvent kinds
+NEW = 'new'
+REMOVED = 'removed'
+STATUS = 'status'
+NET = 'net'
+WINDOW = 'window'
+
+# launch keys fetched by a Watcher, all available in list mode
+WATCHED_FIELDS = ('id', 'name', 'net', 'windowstart', 'windowend',
+                  'status', 'tbddate', 'tbdtime', 'changed')
+
+DEFAULT_MIN_INTERVAL = 5.0
+DEFAULT_MAX_INTERVAL = 300.0
+DEFAULT_SCALE = 60.0
+
+
+class ChangeEvent(namedtuple('ChangeEvent', ['kind', 'id', 'launch',
+                                             'previous'])):
+    '''
+    A change to one watched launch.
+
+    fields:
+        kind (str): NEW, REMOVED (no longer in the listing, e.g. it has
+                  : launched or been pushed out of the next N), STATUS,
+                  : NET or WINDOW (windowstart or windowend moved)
+        id (int): launch id
+        launch (dict): the launch as now listed, None when REMOVED
+        previous (dict): the launch as last listed, None when NEW
+    '''
+
+    __slots__ = ()
+
+
+def diff_launches(previous, current):
+    '''
+    Compare two listings of the same launches by id.
+
+    args:
+        previous (dict): launch id -> launch as last listed
+        current (dict): launch id -> launch as now listed
+
+    returns:
+        list of ChangeEvent in the order of current, followed by the
+        REMOVED events.  A launch whose status and NET both changed
+        gives two events
+    '''
+    events = []
+    for id, launch in current.items():
+        old = previous.get(id)
+        if old is None:
+            events.append(ChangeEvent(NEW, id, launch, None))
+            continue
+        if launch.get('status') != old.get('status'):
+            events.append(ChangeEvent(STATUS, id, launch, old))
+        if launch.get('net') != old.get('net'):
+            events.append(ChangeEvent(NET, id, launch, old))
+        if (launch.get('windowstart') != old.get('windowstart')
+                or launch.get('windowend') != old.get('windowend')):
+            events.append(ChangeEvent(WINDOW, id, launch, old))
+    for id, old in previous.items():
+        if id not in current:
+            events.append(ChangeEvent(REMOVED, id, None, old))
+    return events
+
+
+class Watcher(object):
+    '''
+    Poll state behind watch() and awatch(): the listing last seen, its
+    ETag and hash.
+
+    args:
+        client (LaunchLibraryClient): defaults to the default client
+        next (int): number of upcoming launches watched
+        params (dict): further launch() kwargs narrowing the listing,
+                     : e.g. {'lsp': 121}
+        min_interval (float): shortest time between polls, in seconds
+        max_interval (float): longest time between polls, in seconds
+        scale (float): poll this many times over the time left before
+                     : the nearest NET, e.g. every minute when it is an
+                     : hour away, within the two intervals
+        initial (bool): report the launches of the first poll as NEW.
+                      : When False they only become the baseline
+    '''
+
+    def __init__(self, client=None, next=10, params=None,
+                 min_interval=DEFAULT_MIN_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, scale=DEFAULT_SCALE,
+                 initial=True):
+        params = dict(params or {}, next=next, fields=WATCHED_FIELDS)
+        self.client = client
+        self.params = ENDPOINTS['launch'].prepare(params)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.scale = scale
+        self.initial = initial
+        self.launches = None # id -> launch, in listing order
+        self.etag = None
+        self.digest = None
+
+    def poll(self):
+        '''
+        Fetch the listing, unless it is unchanged, and diff it against
+        the previous one.
+
+        returns:
+            list of ChangeEvent, empty when nothing changed
+
+        raises:
+            requests.HTTPError if the response has an error status
+        '''
+        client = self.client or get_default_client()
+        headers = {'If-None-Match': self.etag} if self.etag else None
+        resp = client.request('launch', self.params, headers)
+        if resp.status_code == 304:
+            return []
+        resp.raise_for_status()
+        self.etag = resp.headers.get('ETag')
+        digest = hashlib.blake2b(resp.content, digest_size=16).digest()
+        if digest == self.digest:
+            return []
+        self.digest = digest
+        current = {launch['id']: launch
+                   for launch in client.decode(resp.content)['launches']}
+        previous, self.launches = self.launches, current
+        if previous is None:
+            previous = {}
+            if not self.initial:
+                return []
+        return diff_launches(previous, current)
+
+    def interval(self, now=None):
+        '''
+        Get the time to wait before the next poll, from the nearest NET
+        of the listing last seen.  Launches whose NET has passed but
+        which are still listed, e.g. holding, keep the pace at
+        min_interval.
+
+        args:
+            now (float): UNIX time, defaults to time.time()
+
+        returns:
+            seconds
+        '''
+        if now is None:
+            now = time.time()
+        stamps = [stamp for stamp in map(net_stamp,
+                                         (self.launches or {}).values())
+                  if stamp is not None]
+        if not stamps:
+            return self.max_interval
+        wait = (min(stamps) - now) / self.scale
+        return min(self.max_interval, max(self.min_interval, wait))
+
+
+def watch(client=None, next=10, params=None, **kwargs):
+    '''
+    Watch the upcoming launches, polling until the generator is closed.
+
+    args:
+        client (LaunchLibraryClient): defaults to the default client
+        next (int): number of upcoming launches watched
+        params (dict): further launch() kwargs narrowing the listing
+        **kwargs: passed to Watcher, e.g. min_interval
+
+    returns:
+        generator of ChangeEvent
+
+    raises:
+        requests.HTTPError if a poll fails.  Pass a client with retry
+        set to ride out transient errors
+    '''
+    watcher = Watcher(client, next, params, **kwargs)
+    while True:
+        for event in watcher.poll():
+            yield event
+        time.sleep(watcher.interval())
+
+
+async def awatch(client=None, next=10, params=None, **kwargs):
+    '''
+    Async version of watch().
+
+        >>> async for event in awatch(next=5):
+        ...     print(event.kind, event.id)
+
+    args:
+        client (aio.AsyncLaunchLibraryClient): defaults to the default
+                                             : async client
+        next (int): number of upcoming launches watched
+        params (dict): further launch() kwargs narrowing the listing
+        **kwargs: passed to Watcher, e.g. min_interval
+
+    returns:
+        async generator of ChangeEvent
+    '''
+    if client is None:
+        client = get_default_async_client()
+    watcher = Watcher(client.client, next, params, **kwargs)
+    while True:
+        for event in await client.run(watcher.poll):
+            yield event
+        await asyncio.sleep(watcher.interval())
+
+
+__all__ = ['ChangeEvent', 'NET', 'NEW', 'REMOVED', 'STATUS', 'WINDOW',
+           'Watcher', 'awatch', 'diff_launches', 'watch',]
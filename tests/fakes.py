@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+'''
+fakes.py
+
+Test doubles for exercising LaunchLibraryClient without the network.
+
+classes:
+    FakeAdapter
+'''
+
+
+import json
+import threading
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class FakeAdapter(BaseAdapter):
+    '''
+    Transport adapter that answers requests from a handler function
+    instead of the network.  Mount it on a client's session.
+
+    args:
+        handler (callable): called as handler(path, params, request) and
+                          : returns either a JSON-serialisable object or
+                          : a (status, body, headers) tuple
+    '''
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.calls = [] # (path, params) for every request sent
+        self._lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        parts = urlsplit(request.url)
+        path = parts.path.rsplit('/', 1)[-1]
+        params = dict(parse_qsl(parts.query))
+        with self._lock:
+            self.calls.append((path, params))
+        result = self.handler(path, params, request)
+        if isinstance(result, tuple):
+            status, body, headers = result
+        else:
+            status, body, headers = 200, result, {}
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        resp = Response()
+        resp.status_code = status
+        resp._content = body
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.url = request.url
+        resp.request = request
+        resp.encoding = 'utf-8'
+        resp.reason = 'OK' if status < 400 else 'Error'
+        return resp
+
+    def close(self):
+        pass
+
+
+def mount(client, handler):
+    '''
+    Mount a FakeAdapter built from handler on client's session.
+
+    returns:
+        FakeAdapter
+    '''
+    adapter = FakeAdapter(handler)
+    client.session.mount('https://', adapter)
+    client.session.mount('http://', adapter)
+    return adapter
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+'''
+mockserver.py
+
+Local stand-in for launchlibrary.net that replays the recorded payloads
+in tests/fixtures over real HTTP.
+
+Every endpoint of the table in endpoints.py is served.  Listings honour
+the filters of the live API (id, name, abbrev, type, countryCode,
+islsp, changed, ...), offset and limit, and launches also the date,
+rocket, location and provider searches and the list, summary and
+verbose modes, ordered by netstamp.  Like the live API, sort is
+ignored.  Endpoints without
+a recording answer with an empty listing until records are added with
+add_records().  Responses carry an ETag and answer If-None-Match with
+304 Not Modified, and are gzip compressed when the client accepts it.
+
+Latency and errors can be injected to exercise timeouts, retries and
+the circuit breaker:
+
+    >>> with MockLaunchLibrary(latency=0.05) as server:
+    ...     server.fail(429, headers={'Retry-After': '1'})
+    ...     client = LaunchLibraryClient(base_url=server.url, retry=2)
+
+classes:
+    MockLaunchLibrary
+'''
+
+
+import calendar
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from launchlibrary.endpoints import ENDPOINTS, MODE_FIELDS
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fixtures')
+
+# endpoint path -> recorded fixture file name
+FIXTURES = {
+    'agency': 'agency.json',
+    'agencytype': 'agencytype.json',
+    'calendar': 'calendar.ics',
+    'launch': 'launch_verbose.json',
+    'launchstatus': 'launchstatus.json',
+}
+
+# the fixtures were recorded in May 2019; the server's clock is set just
+# before their launches so that launch() returns them as upcoming
+RECORDED_AT = 1557900000
+
+LAUNCH_MODES = dict(MODE_FIELDS['launch'])
+DEFAULT_MODE = 'summary'
+
+# parameters that do not filter records
+_CONTROL_PARAMS = frozenset(('mode', 'limit', 'offset', 'sort', 'format'))
+
+# launch search options.  Without any of them the next launches are
+# listed
+_LAUNCH_SEARCH = frozenset(('id', 'name', 'startdate', 'enddate', 'next',
+                            'rocketid', 'locationid', 'lsp', 'changed'))
+
+_LAUNCH_PARAMS = _LAUNCH_SEARCH | _CONTROL_PARAMS | {'seq'}
+
+_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+_BY_PATH = {endpoint.path: endpoint for endpoint in ENDPOINTS.values()}
+
+
+def _contains(field, value):
+    return value.lower() in str(field or '').lower()
+
+
+def _in_list(field, value):
+    return value in str(field or '').split(',')
+
+
+def _since(field, value):
+    return str(field or '') >= value
+
+
+def _equal(field, value):
+    return str(field).lower() == value.lower()
+
+
+def _date(value, end=False):
+    # a bare end date covers the whole day
+    for date_format in _DATE_FORMATS:
+        try:
+            stamp = calendar.timegm(time.strptime(value, date_format))
+        except ValueError:
+            continue
+        if end and date_format == '%Y-%m-%d':
+            stamp += 86399
+        return stamp
+    raise ValueError('unrecognised date {!r}'.format(value))
+
+
+def _refers_to(field, value):
+    # field holds an entity, or its id; lsp is also searched by abbrev
+    if isinstance(field, dict):
+        return (_equal(field.get('id'), value)
+                or _equal(field.get('abbrev'), value))
+    return field is not None and _equal(field, value)
+
+
+_MATCHERS = {
+    'name': _contains,
+    'countryCode': _in_list,
+    'changed': _since,
+}
+
+
+class MockLaunchLibrary(object):
+    '''
+    Threaded HTTP server replaying recorded Launch Library responses.
+
+    args:
+        latency (float): seconds slept before answering each request
+        error_rate (float): fraction of requests answered with a 503
+        seed (int): seed of the random error injection
+        now (float): the server's clock, used by launch searches
+        fixtures_dir (str): directory holding the recorded payloads
+        compress (bool): gzip bodies for clients accepting gzip
+
+    attributes:
+        url (str): base URL to pass to LaunchLibraryClient, once started
+        requests (list): (path, params) of every request received
+    '''
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0,
+                 now=RECORDED_AT, fixtures_dir=FIXTURES_DIR, compress=True):
+        self.latency = latency
+        self.compress = compress
+        self.error_rate = error_rate
+        self.now = now
+        self.requests = []
+        self.url = None
+        self._random = random.Random(seed)
+        self._failures = deque() # (status, headers) to answer with next
+        self._records = {}
+        self._calendar = b''
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._load(fixtures_dir)
+
+    def _load(self, fixtures_dir):
+        for path, name in FIXTURES.items():
+            with open(os.path.join(fixtures_dir, name), 'rb') as f:
+                data = f.read()
+            if path == 'calendar':
+                self._calendar = data
+            else:
+                payload = json.loads(data)
+                self._records[path] = payload[_BY_PATH[path].result_key]
+
+    def add_records(self, path, records):
+        '''
+        Replace the records served by an endpoint, e.g. with a generated
+        listing large enough to paginate.
+
+        args:
+            path (str): endpoint path, e.g. 'launch'
+            records (list): record dictionaries
+        '''
+        with self._lock:
+            self._records[path] = list(records)
+
+    def fail(self, status=503, times=1, headers=None):
+        '''
+        Answer the next requests with an error.
+
+        args:
+            status (int): HTTP status to answer with
+            times (int): number of requests to fail
+            headers (dict): response headers, e.g. Retry-After
+        '''
+        with self._lock:
+            for _ in range(times):
+                self._failures.append((status, dict(headers or {})))
+
+    def start(self):
+        '''
+        Start serving on a free local port in a background thread.
+
+        returns:
+            self
+        '''
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        server.daemon_threads = True
+        server.mock = self
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever,
+                                        args=(0.05,),
+                                        name='mock-launchlibrary',
+                                        daemon=True)
+        self._thread.start()
+        self.url = 'http://127.0.0.1:{}/1.4/'.format(server.server_port)
+        return self
+
+    def stop(self):
+        '''
+        Stop the server and wait for its thread to finish.
+        '''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def respond(self, target, headers):
+        '''
+        Build the response to a GET request.
+
+        args:
+            target (str): request path and query string
+            headers (mapping): request headers
+
+        returns:
+            (status, body, headers) tuple
+        '''
+        parts = urlsplit(target)
+        path = parts.path.rstrip('/').rsplit('/', 1)[-1]
+        params = dict(parse_qsl(parts.query))
+        with self._lock:
+            self.requests.append((path, params))
+            failure = self._failures.popleft() if self._failures else None
+            if failure is None and self._random.random() < self.error_rate:
+                failure = (503, {})
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            status, failure_headers = failure
+            return status, b'', failure_headers
+        endpoint = _BY_PATH.get(path)
+        if endpoint is None:
+            return 404, b'', {}
+        if endpoint.result_key is None:
+            body, content_type = self._calendar, 'text/calendar'
+        else:
+            try:
+                payload = self.listing(endpoint, params)
+            except (TypeError, ValueError) as e:
+                body = json.dumps({'status': 'error', 'msg': str(e)})
+                return 400, body.encode('utf-8'), {}
+            body = json.dumps(payload).encode('utf-8')
+            content_type = 'application/json'
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+        if headers.get('If-None-Match') == etag:
+            return 304, b'', {'ETag': etag}
+        response_headers = {'Content-Type': content_type, 'ETag': etag,
+                            'Vary': 'Accept-Encoding'}
+        if self.compress and 'gzip' in headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            response_headers['Content-Encoding'] = 'gzip'
+        return 200, body, response_headers
+
+    def listing(self, endpoint, params):
+        '''
+        Get the payload of a listing request.
+
+        args:
+            endpoint (endpoints.Endpoint): the endpoint requested
+            params (dict): query string parameters
+
+        returns:
+            dictionary shaped like the live API's payload
+        '''
+        if endpoint.path == 'launch':
+            return self._launches(params)
+        with self._lock:
+            if endpoint.path == 'lsp':
+                records = [r for r in self._records.get('agency', ())
+                           if r.get('islsp') == 1]
+            else:
+                records = list(self._records.get(endpoint.path, ()))
+        for key, value in params.items():
+            if key in _CONTROL_PARAMS:
+                continue
+            match = _MATCHERS.get(key, _equal)
+            records = [r for r in records if match(r.get(key), value)]
+        offset = int(params.get('offset', 0))
+        page = records[offset:offset + int(params.get('limit', 10))]
+        return {endpoint.result_key: page, 'total': len(records),
+                'offset': offset, 'count': len(page)}
+
+    def _launches(self, params):
+        for key in params:
+            if key not in _LAUNCH_PARAMS:
+                raise TypeError('unknown parameter {!r}'.format(key))
+        mode = params.get('mode', DEFAULT_MODE)
+        if mode not in LAUNCH_MODES:
+            raise ValueError('unknown mode {!r}'.format(mode))
+        with self._lock:
+            records = list(self._records.get('launch', ()))
+        # ordered by NET
+        records.sort(key=lambda r: (r.get('netstamp') or 0, r['id']))
+        limit = int(params.get('limit', 10))
+        start = end = None
+        if 'startdate' in params:
+            start = _date(params['startdate'])
+        if 'enddate' in params:
+            end = _date(params['enddate'], end=True)
+        if 'next' in params:
+            start = self.now if start is None else max(start, self.now)
+            limit = int(params['next'])
+        elif not _LAUNCH_SEARCH.intersection(params):
+            start = self.now
+        if start is not None:
+            records = [r for r in records
+                       if (r.get('netstamp') or 0) >= start]
+        if end is not None:
+            records = [r for r in records
+                       if (r.get('netstamp') or 0) <= end]
+        for key, field in (('id', 'id'), ('rocketid', 'rocket'),
+                           ('locationid', 'location'), ('lsp', 'lsp')):
+            if key in params:
+                records = [r for r in records
+                           if _refers_to(r.get(field), params[key])]
+        for key in ('name', 'changed'):
+            if key in params:
+                match = _MATCHERS[key]
+                records = [r for r in records
+                           if match(r.get(key), params[key])]
+        offset = int(params.get('offset', 0))
+        page = records[offset:offset + limit]
+        keys = LAUNCH_MODES[mode]
+        if keys is not None:
+            page = [{k: v for k, v in launch.items() if k in keys}
+                    for launch in page]
+        return {'launches': page, 'total': len(records), 'offset': offset,
+                'count': len(page)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1' # keep connections alive for pooling
+
+    def do_GET(self):
+        status, body, headers = self.server.mock.respond(self.path,
+                                                         self.headers)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+__all__ = ['MockLaunchLibrary',]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+'''
+test_aio.py
+
+Offline tests for the asyncio interface.
+'''
+
+
+import asyncio
+import threading
+import time
+from unittest import TestCase
+
+from requests import Response
+
+from launchlibrary import aio
+from launchlibrary import client as client_module
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.client import LaunchLibraryClient
+
+from tests.fakes import mount
+
+
+class ConcurrencyProbe(object):
+    '''
+    Handler that records the highest number of overlapping requests.
+    '''
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, path, params, request):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {'launches': [{'id': int(params.get('id', 0))}],
+                'total': 1, 'count': 1, 'offset': 0}
+
+
+class TestAsyncLaunchLibraryClient(TestCase):
+
+    def test_request_returns_response(self):
+        async def main():
+            async with AsyncLaunchLibraryClient() as client:
+                mount(client.client, ConcurrencyProbe(0))
+                return await client.request('launch', {'id': 1})
+        resp = asyncio.run(main())
+        self.assertIsInstance(resp, Response)
+        self.assertEqual(resp.json()['launches'][0]['id'], 1)
+
+    def test_concurrency_is_bounded(self):
+        probe = ConcurrencyProbe()
+
+        async def main():
+            async with AsyncLaunchLibraryClient(max_concurrency=4) as client:
+                mount(client.client, probe)
+                return await asyncio.gather(*[
+                    client.request('launch', {'id': i}) for i in range(20)
+                ])
+        responses = asyncio.run(main())
+        ids = [r.json()['launches'][0]['id'] for r in responses]
+        self.assertEqual(ids, list(range(20)))
+        self.assertLessEqual(probe.peak, 4)
+        self.assertGreater(probe.peak, 1)
+
+    def test_default_concurrency(self):
+        async_client = AsyncLaunchLibraryClient()
+        self.assertEqual(async_client.max_concurrency,
+                         aio.DEFAULT_MAX_CONCURRENCY)
+        self.assertEqual(async_client.client.pool_maxsize,
+                         aio.DEFAULT_MAX_CONCURRENCY)
+        async_client.close()
+
+    def test_shares_existing_client(self):
+        client = LaunchLibraryClient()
+        async_client = AsyncLaunchLibraryClient(client)
+        self.assertIs(async_client.client, client)
+        self.assertEqual(async_client.max_concurrency, client.pool_maxsize)
+        async_client.close()
+
+
+class TestModuleCoroutines(TestCase):
+
+    def tearDown(self):
+        aio.set_default_async_client(None)
+
+    def test_launch(self):
+        async_client = AsyncLaunchLibraryClient()
+        adapter = mount(async_client.client, ConcurrencyProbe(0))
+        aio.set_default_async_client(async_client)
+        resp = asyncio.run(aio.launch(id=7))
+        self.assertEqual(resp.json()['launches'][0]['id'], 7)
+        self.assertEqual(adapter.calls, [('launch', {'id': '7'})])
+
+    def test_default_follows_default_client(self):
+        first = LaunchLibraryClient()
+        client_module.set_default_client(first)
+        self.assertIs(aio.get_default_async_client().client, first)
+        second = LaunchLibraryClient(base_url='http://localhost:1/')
+        adapter = mount(second, ConcurrencyProbe(0))
+        client_module.set_default_client(second)
+        try:
+            self.assertIs(aio.get_default_async_client().client, second)
+            asyncio.run(aio.launch(id=7))
+            self.assertEqual(adapter.calls, [('launch', {'id': '7'})])
+        finally:
+            client_module.set_default_client(None)
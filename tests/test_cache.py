@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+'''
+test_cache.py
+
+Offline tests for the response caches.
+'''
+
+
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from launchlibrary.cache import (CacheEntry, MemoryCache, OfflineCacheMiss,
+                                 SQLiteCache, make_key)
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.sync import Mirror
+
+from tests.fakes import mount
+from tests.mockserver import MockLaunchLibrary
+
+
+class Revalidating(object):
+    '''
+    Handler that sends an ETag and answers 304 when it matches.
+    '''
+
+    def __init__(self):
+        self.version = 1
+
+    def __call__(self, path, params, request):
+        etag = '"v{}"'.format(self.version)
+        if request.headers.get('If-None-Match') == etag:
+            return 304, b'', {'ETag': etag}
+        body = {'types': [{'id': 1, 'name': 'Government',
+                           'version': self.version}],
+                'total': 1, 'count': 1, 'offset': 0}
+        return 200, body, {'ETag': etag,
+                           'Content-Type': 'application/json'}
+
+
+def entry(body=b'{}', ttl=60):
+    return CacheEntry(200, {}, body, 'https://example.test/', time.time(),
+                      time.time() + ttl)
+
+
+class TestMakeKey(TestCase):
+
+    def test_normalizes_params(self):
+        self.assertEqual(make_key('launch', {'id': 5, 'mode': 'list'}),
+                         make_key('launch', {'mode': 'list', 'id': '5'}))
+
+    def test_drops_none(self):
+        self.assertEqual(make_key('launch', {'id': None}), 'launch')
+
+    def test_endpoint_is_part_of_key(self):
+        self.assertNotEqual(make_key('lsp', {'id': 44}),
+                            make_key('agency', {'id': 44}))
+
+
+class TestCacheEntry(TestCase):
+
+    def test_wire_headers_dropped(self):
+        with MockLaunchLibrary() as server:
+            client = LaunchLibraryClient(base_url=server.url,
+                                         cache=MemoryCache())
+            wire = client.request('launch', {'mode': 'verbose'})
+            cached = client.request('launch', {'mode': 'verbose'})
+            client.close()
+        self.assertEqual(wire.headers['Content-Encoding'], 'gzip')
+        self.assertIsNot(cached, wire)
+        self.assertNotIn('Content-Encoding', cached.headers)
+        self.assertEqual(int(cached.headers['Content-Length']),
+                         len(cached.content))
+        self.assertEqual(cached.content, wire.content)
+        self.assertEqual(cached.headers['ETag'], wire.headers['ETag'])
+
+    def test_old_entries_cleaned_when_served(self):
+        stored = entry(b'{"id": 1}')._replace(
+            headers={'Content-Encoding': 'gzip', 'Content-Length': '3'})
+        resp = stored.to_response()
+        self.assertNotIn('Content-Encoding', resp.headers)
+        self.assertEqual(resp.headers['Content-Length'], '9')
+
+
+class TestMemoryCache(TestCase):
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', entry())
+        cache.set('b', entry())
+        cache.get('a') # a is now most recently used
+        cache.set('c', entry())
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_per_endpoint_ttl(self):
+        cache = MemoryCache(ttls={'launch': 5}, default_ttl=7)
+        self.assertEqual(cache.ttl_for('launch'), 5)
+        self.assertEqual(cache.ttl_for('agencytype'), 86400)
+        self.assertEqual(cache.ttl_for('changelog'), 7)
+
+
+class TestSQLiteCache(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        cache = SQLiteCache(self.path)
+        stored = entry(b'{"id": 1}')._replace(headers={'ETag': '"x"'})
+        cache.set('launch?id=1', stored)
+        self.assertEqual(cache.get('launch?id=1'), stored)
+        self.assertIsNone(cache.get('launch?id=2'))
+        self.assertEqual(len(cache), 1)
+
+    def test_wal_mode(self):
+        cache = SQLiteCache(self.path)
+        mode, = cache._connection().execute(
+            'PRAGMA journal_mode').fetchone()
+        self.assertEqual(mode, 'wal')
+
+    def test_shared_between_instances(self):
+        SQLiteCache(self.path).set('agency?id=44', entry(b'nasa'))
+        self.assertEqual(SQLiteCache(self.path).get('agency?id=44').body,
+                         b'nasa')
+
+    def test_usable_from_other_threads(self):
+        cache = SQLiteCache(self.path)
+        cache.set('a', entry(b'a'))
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(cache.get('a')))
+        thread.start()
+        thread.join()
+        self.assertEqual(result[0].body, b'a')
+
+    def test_sweep_removes_long_expired_entries(self):
+        cache = SQLiteCache(self.path, keep_stale=10, sweep_interval=3600)
+        cache.set('fresh', entry())
+        cache.set('old', entry(ttl=-20))
+        cache.set('stale', entry(ttl=-5))
+        self.assertEqual(cache.sweep(), 1)
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('stale'))
+        self.assertIsNotNone(cache.get('fresh'))
+
+    def test_size_cap_evicts_soonest_expiring(self):
+        cache = SQLiteCache(self.path, max_bytes=25)
+        cache.set('a', entry(b'x' * 10, ttl=10))
+        cache.set('b', entry(b'x' * 10, ttl=30))
+        cache.set('c', entry(b'x' * 10, ttl=20))
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_running_size_total(self):
+        cache = SQLiteCache(self.path)
+
+        def total():
+            size, = cache._connection().execute(
+                'SELECT size FROM totals').fetchone()
+            return size
+
+        cache.set('a', entry(b'x' * 10))
+        cache.set('b', entry(b'x' * 20))
+        cache.set('a', entry(b'x' * 5))
+        self.assertEqual(total(), 25)
+        cache.set('old', entry(b'x' * 7, ttl=-100000))
+        cache.sweep()
+        self.assertEqual(total(), 25)
+        # a database written before the total existed starts from a scan
+        cache._connection().execute('DROP TABLE totals')
+        self.assertEqual(len(SQLiteCache(self.path)), 2)
+        self.assertEqual(total(), 25)
+        cache.clear()
+        self.assertEqual(total(), 0)
+
+    def test_client_uses_sqlite_cache(self):
+        client = LaunchLibraryClient(cache=SQLiteCache(self.path))
+        adapter = mount(client, Revalidating())
+        client.request('agencytype', {'id': 1})
+        other = LaunchLibraryClient(cache=SQLiteCache(self.path))
+        other_adapter = mount(other, Revalidating())
+        resp = other.request('agencytype', {'id': 1})
+        self.assertEqual(resp.json()['types'][0]['name'], 'Government')
+        self.assertEqual(len(adapter.calls), 1)
+        self.assertEqual(len(other_adapter.calls), 0)
+
+
+class TestClientCaching(TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.client = LaunchLibraryClient(cache=self.cache)
+        self.handler = Revalidating()
+        self.adapter = mount(self.client, self.handler)
+
+    def expire_all(self):
+        for key in list(self.cache._entries):
+            stale = self.cache._entries[key]._replace(expires_at=0)
+            self.cache._entries[key] = stale
+
+    def test_fresh_entry_is_served_locally(self):
+        first = self.client.request('agencytype', {'id': 1})
+        second = self.client.request('agencytype', {'id': '1'})
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(self.adapter.calls), 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_expired_entry_is_revalidated(self):
+        self.client.request('agencytype', {'id': 1})
+        self.expire_all()
+        resp = self.client.request('agencytype', {'id': 1})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['types'][0]['version'], 1)
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+        self.assertEqual(len(self.adapter.calls), 2)
+        # the revalidated entry is fresh again
+        self.client.request('agencytype', {'id': 1})
+        self.assertEqual(len(self.adapter.calls), 2)
+
+    def test_changed_resource_is_downloaded(self):
+        self.client.request('agencytype', {'id': 1})
+        self.expire_all()
+        self.handler.version = 2
+        resp = self.client.request('agencytype', {'id': 1})
+        self.assertEqual(resp.json()['types'][0]['version'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_zero_ttl_disables_caching(self):
+        self.cache.ttls['agencytype'] = 0
+        self.client.request('agencytype')
+        self.client.request('agencytype')
+        self.assertEqual(len(self.adapter.calls), 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_errors_are_not_cached(self):
+        mount(self.client, lambda path, params, request: (500, b'', {}))
+        self.client.request('launch')
+        self.assertEqual(len(self.cache), 0)
+
+
+class TestStaleWhileRevalidate(TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.client = LaunchLibraryClient(cache=self.cache,
+                                          stale_while_revalidate=60)
+        self.handler = Revalidating()
+        self.adapter = mount(self.client, self.handler)
+        self.client.request('agencytype', {'id': 1})
+
+    def tearDown(self):
+        self.client.close()
+
+    def expire(self, seconds_ago=1):
+        key = make_key('agencytype', {'id': 1})
+        self.cache.set(key, self.cache.get(key)._replace(
+            expires_at=time.time() - seconds_ago))
+
+    def test_stale_entry_served_while_refreshing(self):
+        release = threading.Event()
+
+        def slow(path, params, request):
+            release.wait(5)
+            return self.handler(path, params, request)
+        mount(self.client, slow)
+        self.handler.version = 2
+        self.expire()
+        start = time.perf_counter()
+        for _ in range(3):
+            resp = self.client.request('agencytype', {'id': 1})
+            self.assertEqual(resp.json()['types'][0]['version'], 1)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(self.cache.stats()['stale'], 3)
+        release.set()
+        # close() waits for the refresh, one for the three calls
+        self.client.close()
+        resp = self.client.request('agencytype', {'id': 1})
+        self.assertEqual(resp.json()['types'][0]['version'], 2)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_refresh_errors_keep_stale_entry(self):
+        mount(self.client, lambda path, params, request: (503, b'', {}))
+        self.expire()
+        self.client.request('agencytype', {'id': 1})
+        self.client.close()
+        resp = self.client.request('agencytype', {'id': 1})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_too_stale_entry_is_revalidated_first(self):
+        self.expire(seconds_ago=120)
+        self.client.request('agencytype', {'id': 1})
+        self.assertEqual(len(self.adapter.calls), 2)
+        self.assertEqual(self.cache.stats()['revalidations'], 1)
+        self.assertEqual(self.cache.stats()['stale'], 0)
+
+
+class TestOffline(TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.client = LaunchLibraryClient(cache=self.cache)
+        self.adapter = mount(self.client, Revalidating())
+
+    def test_serves_cache_only(self):
+        self.client.request('agencytype', {'id': 1})
+        key = make_key('agencytype', {'id': 1})
+        self.cache.set(key, self.cache.get(key)._replace(expires_at=0))
+        self.client.offline = True
+        resp = self.client.request('agencytype', {'id': 1})
+        self.assertEqual(resp.json()['types'][0]['id'], 1)
+        with self.assertRaises(OfflineCacheMiss) as raised:
+            self.client.request('agencytype', {'id': 2})
+        self.assertEqual(raised.exception.key, 'agencytype?id=2')
+        with self.assertRaises(OfflineCacheMiss):
+            self.client.stream('calendar')
+        # per-request headers bypass the cache, so they cannot be served
+        with self.assertRaises(OfflineCacheMiss):
+            self.client.request('agencytype', {'id': 1},
+                                headers={'If-None-Match': '"x"'})
+        self.assertEqual(len(self.adapter.calls), 1)
+
+    def test_mirror_answers_id_lookups(self):
+        mirror = Mirror()
+        mirror.merge('launch', [{'id': 1590, 'name': 'Starlink'}])
+        client = LaunchLibraryClient(offline=True, mirror=mirror)
+        adapter = mount(client, Revalidating())
+        launches = client.get_json('launch', {'id': 1590})['launches']
+        self.assertEqual(launches, [{'id': 1590, 'name': 'Starlink'}])
+        for params in ({'id': 1}, {'id': 1590, 'next': 5}, None):
+            with self.assertRaises(OfflineCacheMiss):
+                client.get_json('launch', params)
+        self.assertEqual(adapter.calls, [])
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+'''
+test_client.py
+
+Offline tests for the LaunchLibraryClient.
+'''
+
+
+from unittest import TestCase
+
+from requests import Response
+
+from launchlibrary import client as client_module
+from launchlibrary import launchlibrary
+from launchlibrary.decoding import accept_encoding
+from launchlibrary.client import LaunchLibraryClient
+
+from tests.fakes import mount
+
+
+def agencies(path, params, request):
+    return {'agencies': [{'id': 44, 'abbrev': 'NASA'}],
+            'total': 1, 'count': 1, 'offset': 0}
+
+
+class TestLaunchLibraryClient(TestCase):
+
+    def test_request_builds_url(self):
+        client = LaunchLibraryClient(base_url='https://example.test/1.4')
+        adapter = mount(client, agencies)
+        resp = client.request('agency', {'id': 44})
+        self.assertIsInstance(resp, Response)
+        self.assertEqual(resp.url, 'https://example.test/1.4/agency?id=44')
+        self.assertEqual(adapter.calls, [('agency', {'id': '44'})])
+
+    def test_session_is_reused(self):
+        client = LaunchLibraryClient()
+        mount(client, agencies)
+        session = client.session
+        client.request('agency')
+        client.request('agency')
+        self.assertIs(client.session, session)
+
+    def test_keep_alive_disabled(self):
+        client = LaunchLibraryClient(keep_alive=False)
+        self.assertEqual(client.session.headers['Connection'], 'close')
+
+    def test_accept_encoding(self):
+        client = LaunchLibraryClient()
+        self.assertEqual(client.session.headers['Accept-Encoding'],
+                         accept_encoding())
+        self.assertIn('gzip', accept_encoding())
+        client = LaunchLibraryClient(compression=False)
+        self.assertEqual(client.session.headers['Accept-Encoding'],
+                         'identity')
+
+    def test_context_manager_closes(self):
+        with LaunchLibraryClient() as client:
+            self.assertIsInstance(client, LaunchLibraryClient)
+
+
+class TestDefaultClient(TestCase):
+
+    def tearDown(self):
+        client_module.set_default_client(None)
+
+    def test_default_client_is_shared(self):
+        client_module.set_default_client(None)
+        first = client_module.get_default_client()
+        self.assertIs(first, client_module.get_default_client())
+
+    def test_module_functions_use_default_client(self):
+        client = LaunchLibraryClient()
+        adapter = mount(client, agencies)
+        client_module.set_default_client(client)
+        resp_json = launchlibrary.agency(abbrev='NASA').json()
+        self.assertEqual(resp_json['agencies'][0]['id'], 44)
+        self.assertEqual(adapter.calls, [('agency', {'abbrev': 'NASA'})])
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+'''
+test_coalesce.py
+
+Tests for single-flight request coalescing.
+'''
+
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.coalesce import AsyncSingleFlight, SingleFlight
+
+from tests.fakes import mount
+
+
+def slow_launches(path, params, request):
+    time.sleep(0.05)
+    return {'launches': [{'id': 1}], 'total': 1, 'count': 1, 'offset': 0}
+
+
+class TestSingleFlight(TestCase):
+
+    def test_concurrent_calls_share_result(self):
+        flight = SingleFlight()
+        calls = []
+        gate = threading.Event()
+
+        def work():
+            calls.append(1)
+            gate.wait(1)
+            return object()
+
+        with ThreadPoolExecutor(8) as pool:
+            futures = [pool.submit(flight.do, 'k', work) for _ in range(8)]
+            while flight.stats()['calls'] < 8:
+                time.sleep(0.001)
+            gate.set()
+            results = [f.result() for f in futures]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(flight.stats(), {'calls': 8, 'coalesced': 7,
+                                          'in_flight': 0})
+
+    def test_errors_are_shared_and_forgotten(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise KeyError('boom')
+
+        with self.assertRaises(KeyError):
+            flight.do('k', fail)
+        self.assertEqual(flight.do('k', lambda: 5), 5)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+        flight.do('k', lambda: 1)
+        flight.do('k', lambda: 2)
+        self.assertEqual(flight.stats()['coalesced'], 0)
+
+
+class TestAsyncSingleFlight(TestCase):
+
+    def test_concurrent_coroutines_share_result(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return object()
+
+        async def main():
+            return await asyncio.gather(*[flight.do('k', work)
+                                          for _ in range(10)])
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(flight.stats()['coalesced'], 9)
+        self.assertEqual(len(flight), 0)
+
+    def test_cancelling_leader_keeps_work_running(self):
+        flight = AsyncSingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return 'done'
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do('k', work))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.do('k', work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+        self.assertEqual(asyncio.run(main()), 'done')
+
+
+class TestClientCoalescing(TestCase):
+
+    def test_threads_share_one_request(self):
+        client = LaunchLibraryClient(coalesce=True)
+        adapter = mount(client, slow_launches)
+        with ThreadPoolExecutor(10) as pool:
+            payloads = list(pool.map(
+                lambda _: client.get_json('launch', {'next': 10}),
+                range(10)))
+        self.assertEqual(len(adapter.calls), 1)
+        self.assertTrue(all(p is payloads[0] for p in payloads))
+        self.assertGreater(client.single_flight.stats()['coalesced'], 0)
+
+    def test_different_params_are_separate(self):
+        client = LaunchLibraryClient(coalesce=True)
+        adapter = mount(client, slow_launches)
+        with ThreadPoolExecutor(2) as pool:
+            list(pool.map(lambda n: client.request('launch', {'next': n}),
+                          (5, 10)))
+        self.assertEqual(len(adapter.calls), 2)
+
+    def test_off_by_default(self):
+        self.assertIsNone(LaunchLibraryClient().single_flight)
+
+    def test_asyncio_shares_one_request(self):
+        async def main():
+            async with AsyncLaunchLibraryClient(coalesce=True) as client:
+                adapter = mount(client.client, slow_launches)
+                await asyncio.gather(*[
+                    client.call('agency', {'id': 44}) for _ in range(20)])
+                return adapter, client.single_flight.stats()
+        adapter, stats = asyncio.run(main())
+        self.assertEqual(len(adapter.calls), 1)
+        self.assertEqual(stats['coalesced'], 19)
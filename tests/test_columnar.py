@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+'''
+test_columnar.py
+
+Tests for the columnar export.  The pyarrow and pandas conversions are
+skipped when those libraries are not installed.
+'''
+
+
+import json
+import os
+import unittest
+from datetime import datetime, timezone
+from unittest import TestCase
+
+from launchlibrary import columnar, models
+from launchlibrary.columnar import ColumnBuilder
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name + '.json')) as f:
+        return json.load(f)
+
+
+def installed(name):
+    try:
+        __import__(name)
+    except ImportError:
+        return False
+    return True
+
+
+class TestColumnBuilder(TestCase):
+
+    def test_flattens_nested_objects(self):
+        builder = ColumnBuilder('launch')
+        builder.append(load('launch_verbose'))
+        columns = builder.to_columns()
+        self.assertEqual(len(builder), 4)
+        self.assertEqual(columns['id'][0], 1590)
+        self.assertEqual(columns['rocket_name'][0], 'Falcon 9 Block 5')
+        self.assertEqual(columns['lsp_abbrev'][0], 'SpX')
+        self.assertEqual(columns['pad_id'][0], 84)
+        self.assertEqual(columns['mission_name'][0], 'Starlink v0.9')
+
+    def test_list_mode_references(self):
+        builder = ColumnBuilder('launch')
+        builder.append([{'id': 1, 'lsp': 121}])
+        columns = builder.to_columns()
+        self.assertEqual(columns['lsp_id'], [121])
+        self.assertEqual(columns['lsp_name'], [None])
+        self.assertEqual(columns['rocket_id'], [None])
+
+    def test_batches_append(self):
+        payload = load('launch_verbose')
+        builder = ColumnBuilder('launch')
+        builder.append(payload['launches'][:2])
+        builder.append(models.from_payload(
+            {'launches': payload['launches'][2:]}, models.Launch))
+        self.assertEqual(builder.to_columns()['id'],
+                         [l['id'] for l in payload['launches']])
+
+    def test_unknown_endpoint(self):
+        with self.assertRaises(ValueError):
+            ColumnBuilder('calendar')
+
+
+@unittest.skipUnless(installed('pyarrow'), 'pyarrow is not installed')
+class TestStamps(TestCase):
+
+    def test_parse_stamp(self):
+        self.assertEqual(columnar.parse_stamp('May 16, 2019 02:30:00 UTC'),
+                         1557973800)
+        self.assertEqual(columnar.parse_stamp('2019-05-16 02:30:00',
+                                              columnar.CHANGED_FORMAT),
+                         1557973800)
+        self.assertIsNone(columnar.parse_stamp(None))
+        self.assertIsNone(columnar.parse_stamp('TBD'))
+
+    def test_net_stamp_prefers_netstamp(self):
+        net = 'May 16, 2019 02:30:00 UTC'
+        self.assertEqual(columnar.net_stamp({'netstamp': 1, 'net': net}), 1)
+        self.assertEqual(columnar.net_stamp({'netstamp': 0, 'net': net}),
+                         1557973800)
+        self.assertIsNone(columnar.net_stamp({'id': 1}))
+
+
+class TestToArrow(TestCase):
+
+    def test_table(self):
+        table = columnar.to_arrow([load('launch_verbose')])
+        self.assertEqual(table.num_rows, 4)
+        net = table.column('net').to_pylist()[0]
+        self.assertEqual(net, datetime(2019, 5, 16, 2, 30,
+                                       tzinfo=timezone.utc))
+
+    def test_missing_dates_are_null(self):
+        table = columnar.to_arrow([{'id': 1}, {'id': 2, 'net': 'TBD'}])
+        self.assertEqual(table.column('net').null_count, 2)
+
+    def test_agencies(self):
+        table = columnar.to_arrow(load('agency'), endpoint='agency')
+        self.assertIn('NASA', table.column('abbrev').to_pylist())
+
+
+@unittest.skipUnless(installed('pandas'), 'pandas is not installed')
+class TestToDataFrame(TestCase):
+
+    def test_dataframe(self):
+        df = columnar.to_dataframe(load('launch_verbose')['launches'])
+        self.assertEqual(len(df), 4)
+        self.assertEqual(str(df['net'].dt.tz), 'UTC')
+        self.assertEqual(df['changed'].iloc[0].year, 2019)
+        self.assertEqual(df.groupby('lsp_abbrev').size()['SpX'], 1)
+
+    def test_empty(self):
+        df = ColumnBuilder('rocket').to_dataframe()
+        self.assertEqual(len(df), 0)
+        self.assertIn('family_name', df.columns)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+'''
+test_decoding.py
+
+Tests for the pluggable JSON decoders.
+'''
+
+
+from unittest import TestCase
+
+from requests import HTTPError
+
+from launchlibrary import models
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.decoding import available_backends, get_decoder
+
+from tests.fakes import mount
+
+
+def launches(path, params, request):
+    return {'launches': [{'id': 1, 'name': 'Electron | Test'}],
+            'total': 1, 'count': 1, 'offset': 0}
+
+
+class TestGetDecoder(TestCase):
+
+    def test_json_always_available(self):
+        self.assertIn('json', available_backends())
+        self.assertEqual(get_decoder('json')(b'{"id": 1}'), {'id': 1})
+
+    def test_default_decodes_bytes(self):
+        self.assertEqual(get_decoder()(b'[1, 2]'), [1, 2])
+
+    def test_every_backend_agrees(self):
+        body = b'{"launches": [{"id": 1, "name": "\\u00e9"}], "total": 1}'
+        expected = get_decoder('json')(body)
+        for backend in available_backends():
+            self.assertEqual(get_decoder(backend)(body), expected, backend)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            get_decoder('yaml')
+
+
+class TestClientDecoding(TestCase):
+
+    def test_get_json(self):
+        client = LaunchLibraryClient(decoder='json')
+        mount(client, launches)
+        self.assertEqual(client.get_json('launch')['launches'][0]['id'], 1)
+
+    def test_custom_decoder(self):
+        calls = []
+
+        def decode(body):
+            calls.append(body)
+            return {}
+
+        client = LaunchLibraryClient(decoder=decode)
+        mount(client, launches)
+        client.get_json('launch')
+        self.assertIsInstance(calls[0], bytes)
+
+    def test_get_records(self):
+        client = LaunchLibraryClient()
+        mount(client, launches)
+        launch, = client.get_records('launch', models.Launch)
+        self.assertIsInstance(launch, models.Launch)
+        self.assertEqual(launch.name, 'Electron | Test')
+
+    def test_from_response_uses_client_decoder(self):
+        calls = []
+
+        def decode(body):
+            calls.append(body)
+            return get_decoder('json')(body)
+
+        client = LaunchLibraryClient(decoder=decode)
+        mount(client, launches)
+        resp = client.request('launch')
+        launch, = models.from_response(resp, models.Launch, client)
+        self.assertEqual(launch.id, 1)
+        self.assertEqual(calls, [resp.content])
+
+    def test_error_status_raises(self):
+        client = LaunchLibraryClient()
+        mount(client, lambda path, params, request: (404, b'', {}))
+        with self.assertRaises(HTTPError):
+            client.get_json('launch')
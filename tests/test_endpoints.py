@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+'''
+test_endpoints.py
+
+Tests for the endpoint table and the functions generated from it.
+'''
+
+
+import asyncio
+from unittest import TestCase
+
+from launchlibrary import aio, launchlibrary
+from launchlibrary import client as client_module
+from launchlibrary.cache import DEFAULT_TTLS
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.endpoints import ENDPOINTS, resolve
+
+from tests.fakes import mount
+
+
+def empty(path, params, request):
+    return {'total': 0, 'count': 0, 'offset': 0}
+
+
+class TestEndpointTable(TestCase):
+
+    def test_every_exported_function_exists(self):
+        namespace = {}
+        exec('from launchlibrary.launchlibrary import *', namespace)
+        for name in launchlibrary.__all__:
+            self.assertIn(name, namespace)
+        helpers = {'paginate', 'iter_pages', 'get_many', 'BatchResult',
+                   'Page'}
+        self.assertEqual(set(ENDPOINTS),
+                         set(launchlibrary.__all__) - helpers)
+
+    def test_resolve(self):
+        lsp = ENDPOINTS['launch_providers']
+        self.assertIs(resolve('launch_providers'), lsp)
+        self.assertIs(resolve('lsp'), lsp)
+        self.assertIs(resolve(launchlibrary.pad), ENDPOINTS['pad'])
+        with self.assertRaises(ValueError):
+            resolve('changelog')
+
+    def test_cache_ttls_come_from_table(self):
+        for endpoint in ENDPOINTS.values():
+            self.assertEqual(DEFAULT_TTLS[endpoint.path], endpoint.ttl)
+
+    def test_generated_docstrings(self):
+        self.assertIn('islsp', launchlibrary.agency.__doc__)
+        self.assertEqual(launchlibrary.rocket_family.__name__,
+                         'rocket_family')
+
+
+class TestGeneratedFunctions(TestCase):
+
+    def setUp(self):
+        client = LaunchLibraryClient()
+        self.adapter = mount(client, empty)
+        client_module.set_default_client(client)
+
+    def tearDown(self):
+        aio.set_default_async_client(None)
+        client_module.set_default_client(None)
+
+    def test_every_function_hits_its_path(self):
+        for name, endpoint in ENDPOINTS.items():
+            getattr(launchlibrary, name)(id=1)
+            self.assertEqual(self.adapter.calls[-1],
+                             (endpoint.path, {'id': '1'}))
+
+    def test_every_coroutine_hits_its_path(self):
+        async def main():
+            for name in ENDPOINTS:
+                await getattr(aio, name)()
+        asyncio.run(main())
+        self.assertEqual([path for path, _ in self.adapter.calls],
+                         [e.path for e in ENDPOINTS.values()])
+
+    def test_unknown_parameter(self):
+        with self.assertRaises(TypeError):
+            launchlibrary.rocket(rocketid=5)
+        self.assertEqual(self.adapter.calls, [])
+
+    def test_fields_pick_smallest_mode(self):
+        launchlibrary.launch(fields=('id', 'name', 'net'))
+        launchlibrary.launch(fields='id,inhold')
+        launchlibrary.launch(fields=['id', 'rocket'])
+        launchlibrary.launch(fields=['id'], mode='verbose')
+        self.assertEqual([params.get('mode')
+                          for _, params in self.adapter.calls],
+                         ['list', 'summary', 'verbose', 'verbose'])
+
+    def test_fields_without_known_modes(self):
+        launchlibrary.agency(fields=('id', 'name'))
+        self.assertEqual(self.adapter.calls, [('agency', {})])
+        self.assertIsNone(ENDPOINTS['agency'].mode_for(('id',)))
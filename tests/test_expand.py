@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+'''
+test_expand.py
+
+Tests for resolving the entities launches refer to, against the mock
+server.
+'''
+
+
+import asyncio
+import json
+import os
+import threading
+import time
+from unittest import TestCase
+
+from launchlibrary import aio
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary import client as client_module
+from launchlibrary import launchlibrary
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.expand import (EntityCache, aexpand_records,
+                                  check_expand, expand_records,
+                                  prepare_expand, set_default_entity_cache)
+
+from tests.fakes import mount
+from tests.mockserver import MockLaunchLibrary
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_launches():
+    with open(os.path.join(FIXTURES, 'launch_verbose.json')) as f:
+        return json.load(f)['launches']
+
+
+def start_server():
+    # the recordings hold agencies but no rockets or locations, serve
+    # the ones embedded in the launches
+    server = MockLaunchLibrary()
+    launches = load_launches()
+    server.add_records('rocket', [l['rocket'] for l in launches])
+    server.add_records('location', [l['location'] for l in launches])
+    server.start()
+    return server
+
+
+class TestEntityCache(TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        self.client = LaunchLibraryClient(base_url=self.server.url)
+        self.cache = EntityCache(client=self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def entity_requests(self):
+        return [(path, params['id']) for path, params in self.server.requests
+                if path != 'launch']
+
+    def launches(self, mode):
+        return self.client.get_json('launch', {'mode': mode})['launches']
+
+    def test_list_mode_lsp(self):
+        records = self.launches('list') * 3
+        expanded = expand_records(records, 'launch', ['lsp'], self.cache)
+        # four providers, each requested once
+        self.assertEqual(sorted(self.entity_requests()),
+                         [('lsp', '115'), ('lsp', '121'), ('lsp', '147'),
+                          ('lsp', '63')])
+        self.assertEqual([r['lsp']['islsp'] for r in expanded], [1] * 12)
+        # the same object wherever the entity is referenced
+        self.assertIs(expanded[0]['lsp'], expanded[4]['lsp'])
+        self.assertIs(expanded[1]['lsp'], expanded[9]['lsp'])
+        # the records given are left alone
+        self.assertNotIn('islsp', records[0]['lsp'])
+
+    def test_verbose_mode_rocket_and_location(self):
+        records = self.launches('verbose')
+        copies = json.loads(json.dumps(records))
+        expanded = expand_records(records + copies, 'launch',
+                                  'rocket,location', self.cache)
+        # the embedded entities are whole, nothing is fetched
+        self.assertEqual(self.entity_requests(), [])
+        self.assertEqual([r['rocket']['id'] for r in expanded[:4]],
+                         [188, 148, 27, 74])
+        self.assertIs(expanded[2]['location'], expanded[6]['location'])
+        self.assertIs(expanded[1]['rocket'], expanded[5]['rocket'])
+        again = expand_records(copies, 'launch', 'rocket', self.cache)
+        self.assertIs(again[0]['rocket'], expanded[0]['rocket'])
+        self.assertEqual(self.entity_requests(), [])
+
+    def test_identity_across_calls_until_ttl(self):
+        first = self.cache.get_many('rocket', [188], now=1000)[188]
+        again = self.cache.get_many('rocket', ['188'], now=1000 + 3599)
+        self.assertIs(again['188'], first)
+        self.assertEqual(len(self.entity_requests()), 1)
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 1, 'misses': 1, 'size': 1})
+        self.cache.get_many('rocket', [188], now=1000 + 3600)
+        self.assertEqual(len(self.entity_requests()), 2)
+
+    def test_put_and_missing_entities(self):
+        rocket = load_launches()[0]['rocket']
+        self.assertIs(self.cache.put('rocket', rocket), rocket)
+        records = [{'id': 1, 'rocket': rocket}, {'id': 2, 'rocket': 9}]
+        expanded = expand_records(records, 'launch', 'rocket', self.cache)
+        self.assertIs(expanded[0]['rocket'], rocket)
+        # unknown ids are left as references
+        self.assertEqual(expanded[1]['rocket'], 9)
+        self.assertEqual(self.entity_requests(), [('rocket', '9')])
+
+
+class ConcurrencyProbe(object):
+    # answers id lookups of any entity, recording the highest number of
+    # overlapping requests
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, path, params, request):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        key = {'rocket': 'rockets', 'location': 'locations'}[path]
+        return {key: [{'id': int(params['id'])}], 'total': 1, 'count': 1,
+                'offset': 0}
+
+
+class TestAsyncExpansion(TestCase):
+
+    def test_requests_bounded_by_async_client(self):
+        probe = ConcurrencyProbe()
+        client = LaunchLibraryClient()
+        adapter = mount(client, probe)
+        records = [{'id': n, 'rocket': n, 'location': n} for n in range(6)]
+
+        async def main():
+            async with AsyncLaunchLibraryClient(
+                    client, max_concurrency=2) as async_client:
+                return await asyncio.gather(*(
+                    aexpand_records(records, 'launch',
+                                    ['rocket', 'location'], EntityCache(),
+                                    async_client)
+                    for _ in range(3)))
+
+        results = asyncio.run(main())
+        client.close()
+        self.assertLessEqual(probe.peak, 2)
+        # three caches, each fetching six rockets and six locations
+        self.assertEqual(len(adapter.calls), 36)
+        for expanded in results:
+            self.assertEqual([r['rocket']['id'] for r in expanded],
+                             list(range(6)))
+
+
+class TestCheckExpand(TestCase):
+
+    def test_keys(self):
+        self.assertEqual(check_expand('launch', 'lsp,rocket,lsp'),
+                         ['lsp', 'rocket'])
+        with self.assertRaises(ValueError):
+            check_expand('launch', ['pad'])
+        with self.assertRaises(ValueError):
+            check_expand('agency', ['lsp'])
+
+    def test_modes(self):
+        self.assertEqual(check_expand('launch', ['lsp'], 'list'), ['lsp'])
+        for mode in ('list', 'summary'):
+            with self.assertRaisesRegex(ValueError, 'verbose mode'):
+                check_expand('launch', ['lsp', 'rocket'], mode)
+        self.assertEqual(check_expand('launch', ['location'], 'verbose'),
+                         ['location'])
+
+    def test_mode_requested_when_omitted(self):
+        self.assertEqual(prepare_expand('launch', ['lsp'], {'next': 5}),
+                         (['lsp'], {'next': 5}))
+        self.assertEqual(prepare_expand('launch', ['rocket'], {}),
+                         (['rocket'], {'mode': 'verbose'}))
+        self.assertEqual(
+            prepare_expand('launch', ['lsp'], {'fields': 'id,net'}),
+            (['lsp'], {'mode': 'list'}))
+
+
+class TestExpandArgument(TestCase):
+
+    def setUp(self):
+        self.server = start_server()
+        client = LaunchLibraryClient(base_url=self.server.url)
+        client_module.set_default_client(client)
+        set_default_entity_cache(EntityCache(client=client))
+
+    def tearDown(self):
+        set_default_entity_cache(None)
+        aio.set_default_async_client(None)
+        client_module.set_default_client(None)
+        self.server.stop()
+
+    def test_launch(self):
+        payload = launchlibrary.launch(mode='list', expand=['lsp'])
+        self.assertEqual([r['lsp']['abbrev'] for r in payload['launches']],
+                         ['SpX', 'RL', 'ASA', 'RFSA'])
+        self.assertEqual(payload['total'], 4)
+        again = launchlibrary.launch(mode='list', expand=['lsp'])
+        self.assertIs(again['launches'][0]['lsp'],
+                      payload['launches'][0]['lsp'])
+        # two listings, four providers
+        self.assertEqual(len(self.server.requests), 6)
+        with self.assertRaises(ValueError):
+            launchlibrary.launch(mode='list', expand=['rocket'])
+        with self.assertRaises(ValueError):
+            launchlibrary.launch(expand=['missions'])
+        self.assertEqual(len(self.server.requests), 6)
+
+    def test_verbose_requested_for_rocket(self):
+        payload = launchlibrary.launch(expand=['rocket', 'location'])
+        self.assertEqual(self.server.requests[0][1].get('mode'), 'verbose')
+        self.assertEqual([r['rocket']['id'] for r in payload['launches']],
+                         [188, 148, 27, 74])
+        # verbose launches embed both, only the listing is requested
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_coroutine(self):
+        payload = asyncio.run(aio.launch(expand=['rocket', 'location']))
+        self.assertEqual([r['rocket']['id'] for r in payload['launches']],
+                         [188, 148, 27, 74])
+        self.assertEqual(payload['launches'][1]['location']['id'], 40)
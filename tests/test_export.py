@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+'''
+test_export.py
+
+Offline tests for the bulk export pipeline, and a test against the
+mock server.
+'''
+
+
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase, mock, skipIf
+
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.export import export, transform_page
+
+from tests.fakes import mount
+from tests.mockserver import RECORDED_AT, MockLaunchLibrary
+from tests.test_paginate import Listing
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+
+class VerboseListing(Listing):
+    '''
+    Listing of launches with nested rocket and location records.
+    '''
+
+    def __init__(self, total, **kwargs):
+        super().__init__(total, **kwargs)
+        for record in self.records:
+            record.update({
+                'name': 'Launch {}'.format(record['id']),
+                'net': 'May 16, 2019 02:30:00 UTC',
+                'probability': None if record['id'] < 30 else 90,
+                'rocket': {'id': 1, 'name': 'Falcon 9'},
+                'location': {'id': 2, 'pads': [{'id': 3, 'name': 'SLC'}]}})
+
+
+class TestExport(TestCase):
+
+    def setUp(self):
+        self.client = LaunchLibraryClient()
+        self.adapter = mount(self.client, VerboseListing(95))
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.dir.name, name)
+
+    def read_jsonl(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_jsonl_in_order(self):
+        for processes in (0, 2):
+            path = self.path('launches{}.jsonl'.format(processes))
+            result = export(path, page_size=10, processes=processes,
+                            max_pending=2, client=self.client)
+            self.assertEqual((result.format, result.records, result.pages),
+                             ('jsonl', 95, 10))
+            records = self.read_jsonl(path)
+            self.assertEqual([r['id'] for r in records], list(range(95)))
+            self.assertEqual(records[0]['rocket']['name'], 'Falcon 9')
+
+    def test_flatten(self):
+        path = self.path('flat.jsonl')
+        export(path, page_size=50, processes=0, flatten=True,
+               max_records=3, client=self.client)
+        records = self.read_jsonl(path)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['rocket_name'], 'Falcon 9')
+        self.assertEqual(records[0]['pad_name'], 'SLC')
+
+    @skipIf(pq is None, 'pyarrow not installed')
+    def test_parquet(self):
+        path = self.path('launches.parquet')
+        # the first page has no probability, later pages do
+        result = export(path, page_size=20, processes=2,
+                        client=self.client)
+        table = pq.read_table(path)
+        self.assertEqual(result.records, 95)
+        self.assertEqual(table.column('id').to_pylist(), list(range(95)))
+        self.assertEqual(table.column('probability').to_pylist()[-1], '90')
+        self.assertEqual(table.schema.field('net').type.tz, 'UTC')
+
+    def test_pool_spawns_workers(self):
+        path = self.path('launches.jsonl')
+        with mock.patch('launchlibrary.export.ProcessPoolExecutor',
+                        wraps=ProcessPoolExecutor) as pool:
+            export(path, page_size=50, processes=1, client=self.client)
+        self.assertEqual(pool.call_args[0][1].get_start_method(), 'spawn')
+
+    def test_format_errors(self):
+        with self.assertRaises(ValueError):
+            export(self.path('launches.csv'), client=self.client)
+        with self.assertRaises(ValueError):
+            export(self.path('pads.parquet'), 'pad', client=self.client)
+        self.assertEqual(self.adapter.calls, [])
+
+    def test_transform_page(self):
+        body = json.dumps({'launches': [{'id': 1}, {'id': 2}]}).encode()
+        count, data = transform_page(body, 1)
+        self.assertEqual((count, data), (1, b'{"id":1}\n'))
+
+
+class TestExportFromMockServer(TestCase):
+
+    def test_launch_history(self):
+        past = [{'id': i, 'name': 'launch {}'.format(i),
+                 'netstamp': RECORDED_AT - 86400 * (300 - i),
+                 'changed': '2018-01-01 00:00:00'} for i in range(300)]
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                MockLaunchLibrary() as server:
+            server.add_records('launch', past)
+            client = LaunchLibraryClient(base_url=server.url)
+            path = os.path.join(tmpdir, 'launches.jsonl')
+            result = export(path, page_size=100, processes=0,
+                            mode='verbose', client=client)
+            client.close()
+        self.assertEqual((result.records, result.pages), (300, 3))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+'''
+test_get_many.py
+
+Offline tests for launchlibrary.get_many(), and tests against the mock
+server.
+'''
+
+
+from unittest import TestCase
+
+from requests import HTTPError
+
+from launchlibrary import launchlibrary
+from launchlibrary.cache import MemoryCache
+from launchlibrary.client import LaunchLibraryClient
+
+from tests.fakes import mount
+from tests.mockserver import RECORDED_AT, MockLaunchLibrary
+
+
+class Agencies(object):
+    '''
+    Handler serving an agency listing filterable by id.
+    '''
+
+    def __init__(self, total, broken=(), broken_offsets=()):
+        self.records = [{'id': i, 'name': 'agency {}'.format(i)}
+                        for i in range(1, total + 1)]
+        self.broken = set(broken)
+        self.broken_offsets = set(broken_offsets)
+
+    def __call__(self, path, params, request):
+        records = self.records
+        if int(params.get('offset', 0)) in self.broken_offsets:
+            return 500, b'', {}
+        if 'id' in params:
+            if int(params['id']) in self.broken:
+                return 500, b'', {}
+            records = [r for r in records if r['id'] == int(params['id'])]
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 10))
+        page = records[offset:offset + limit]
+        return {'agencies': page, 'total': len(records), 'count': len(page),
+                'offset': offset}
+
+
+class TestGetMany(TestCase):
+
+    def get_many(self, handler, ids, cache=None, **kwargs):
+        client = LaunchLibraryClient(cache=cache)
+        adapter = mount(client, handler)
+        results = launchlibrary.get_many('agency', ids, client=client,
+                                         **kwargs)
+        return results, adapter
+
+    def test_results_in_input_order(self):
+        results, adapter = self.get_many(Agencies(20), [7, 3, 7, 12])
+        self.assertEqual([r.id for r in results], [7, 3, 7, 12])
+        self.assertEqual([r.record['id'] for r in results], [7, 3, 7, 12])
+        self.assertTrue(all(r.error is None for r in results))
+        # the duplicate id is fetched once
+        self.assertEqual(len(adapter.calls), 3)
+
+    def test_per_id_errors(self):
+        results, _ = self.get_many(Agencies(5, broken=[2]), [1, 2, 99])
+        self.assertIsNotNone(results[0].record)
+        self.assertIsInstance(results[1].error, HTTPError)
+        self.assertIsInstance(results[2].error, LookupError)
+        self.assertIsNone(results[2].record)
+
+    def test_cached_ids_are_served_locally(self):
+        cache = MemoryCache()
+        client = LaunchLibraryClient(cache=cache)
+        adapter = mount(client, Agencies(10))
+        client.get_json('agency', {'id': 4})
+        results = launchlibrary.get_many('agency', [4, 5], client=client)
+        self.assertEqual([r.record['id'] for r in results], [4, 5])
+        self.assertEqual([p for _, p in adapter.calls],
+                         [{'id': '4'}, {'id': '5'}])
+
+    def test_dense_ids_read_the_listing(self):
+        ids = list(range(1, 151))
+        results, adapter = self.get_many(Agencies(200), ids, page_size=100)
+        self.assertEqual([r.record['id'] for r in results], ids)
+        # one size probe plus two pages instead of 150 lookups
+        self.assertEqual(len(adapter.calls), 3)
+
+    def test_sparse_ids_are_fetched_one_by_one(self):
+        ids = list(range(1, 1000, 10))
+        results, adapter = self.get_many(Agencies(1000), ids, page_size=10)
+        self.assertEqual(len(results), 100)
+        self.assertEqual(len(adapter.calls), 101)
+
+    def test_missing_ids_in_listing(self):
+        results, _ = self.get_many(Agencies(60), list(range(1, 71)),
+                                   page_size=100)
+        self.assertIsInstance(results[-1].error, LookupError)
+        self.assertEqual(results[0].record['id'], 1)
+
+    def test_failed_listing_page_falls_back_to_lookups(self):
+        ids = list(range(1, 151))
+        results, adapter = self.get_many(Agencies(200, broken_offsets=[100]),
+                                         ids, page_size=100)
+        self.assertEqual([r.record['id'] for r in results], ids)
+        # probe, two pages, then the 50 ids of the failed page
+        self.assertEqual(len(adapter.calls), 53)
+
+    def test_rejects_id_kwarg(self):
+        with self.assertRaises(TypeError):
+            launchlibrary.get_many('agency', [1], id=1)
+
+
+class TestGetManyFromMockServer(TestCase):
+
+    def test_past_launches_are_found_in_the_listing(self):
+        past = [{'id': i, 'name': 'launch {}'.format(i),
+                 'netstamp': RECORDED_AT - 86400 * (300 - i),
+                 'changed': '2018-01-01 00:00:00'} for i in range(300)]
+        with MockLaunchLibrary() as server:
+            server.add_records('launch', past)
+            client = LaunchLibraryClient(base_url=server.url)
+            results = launchlibrary.get_many('launch', range(0, 300, 2),
+                                             listing_min=50, client=client)
+            client.close()
+        self.assertEqual([r.error for r in results], [None] * 150)
+        self.assertEqual([r.record['id'] for r in results],
+                         list(range(0, 300, 2)))
+        # a size probe and three pages
+        self.assertEqual(len(server.requests), 4)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+'''
+test_imports.py
+
+Tests for the lazy loading of the package's submodules.
+'''
+
+
+import subprocess
+import sys
+from unittest import TestCase
+
+import launchlibrary
+
+
+def loaded_after(code):
+    # modules of interest loaded by running code in a new interpreter
+    script = code + '\nimport sys\nprint(" ".join(sorted(m for m in ' \
+        '("requests", "asyncio", "sqlite3") if m in sys.modules)))'
+    return subprocess.check_output([sys.executable, '-c', script],
+                                   text=True).split()
+
+
+class TestLazyImports(TestCase):
+
+    def test_package_import_is_light(self):
+        self.assertEqual(loaded_after('import launchlibrary'), [])
+
+    def test_utils_without_http_stack(self):
+        loaded = loaded_after(
+            'import launchlibrary\n'
+            'launchlibrary.utils.parse_ics_calendar_format')
+        self.assertEqual(loaded, [])
+
+    def test_sync_client_without_asyncio(self):
+        self.assertEqual(loaded_after('import launchlibrary.client'),
+                         ['requests'])
+
+    def test_star_import(self):
+        namespace = {}
+        exec('from launchlibrary import *', namespace)
+        self.assertIs(namespace['launchlibrary'],
+                      launchlibrary.launchlibrary)
+        self.assertIs(namespace['utils'], launchlibrary.utils)
+        self.assertIs(namespace['LaunchLibraryClient'],
+                      launchlibrary.LaunchLibraryClient)
+        self.assertNotIn('importlib', namespace)
+        self.assertEqual(set(launchlibrary.__all__),
+                         launchlibrary._SUBMODULES | {'LaunchLibraryClient'})
+
+    def test_attributes(self):
+        from launchlibrary.client import LaunchLibraryClient
+        from launchlibrary import sync
+        self.assertIs(launchlibrary.LaunchLibraryClient, LaunchLibraryClient)
+        self.assertIs(launchlibrary.sync, sync)
+        self.assertIn('watch', dir(launchlibrary))
+        with self.assertRaises(AttributeError):
+            launchlibrary.missing
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+'''
+test_index.py
+
+Tests for the in-memory launch index and timeline.
+'''
+
+
+import copy
+import json
+import os
+from unittest import TestCase
+
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.index import LaunchIndex, LaunchTimeline
+from launchlibrary.sync import Mirror
+from tests.fakes import mount
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# between the first (1590) and second (1712) fixture launches
+NOW = 1558000000
+
+
+def load_launches():
+    with open(os.path.join(FIXTURES, 'launch_verbose.json')) as f:
+        return json.load(f)['launches']
+
+
+def ids(payload):
+    return [launch['id'] for launch in payload['launches']]
+
+
+class TestLaunchIndex(TestCase):
+
+    def setUp(self):
+        self.index = LaunchIndex(load_launches())
+
+    def test_default_is_next_launches(self):
+        self.assertEqual(ids(self.index.query(now=NOW)), [1712, 1501, 1534])
+
+    def test_next(self):
+        payload = self.index.query(now=NOW, next=2)
+        self.assertEqual(ids(payload), [1712, 1501])
+        self.assertEqual(payload['total'], 3)
+        self.assertEqual(payload['count'], 2)
+
+    def test_date_range(self):
+        payload = self.index.query(startdate='2019-05-16',
+                                   enddate='2019-06-20')
+        self.assertEqual(ids(payload), [1590, 1712, 1501])
+        payload = self.index.query(startdate='2019-05-16 03:00:00',
+                                   enddate='2019-05-17')
+        self.assertEqual(ids(payload), [1712])
+
+    def test_hash_indexes(self):
+        self.assertEqual(ids(self.index.query(rocketid=188)), [1590])
+        self.assertEqual(ids(self.index.query(locationid='40')), [1712])
+        self.assertEqual(ids(self.index.query(lsp=63)), [1534])
+        self.assertEqual(ids(self.index.query(lsp='spx')), [1590])
+        self.assertEqual(ids(self.index.query(status=2)), [1712])
+        self.assertEqual(ids(self.index.query(rocketid=188, lsp=63)), [])
+
+    def test_hash_index_with_date_range(self):
+        payload = self.index.query(status=1, startdate='2019-06-01')
+        self.assertEqual(ids(payload), [1501, 1534])
+
+    def test_name_and_changed(self):
+        self.assertEqual(ids(self.index.query(name='falcon')), [1590])
+        payload = self.index.query(changed='2019-05-10 00:00:00')
+        self.assertEqual(ids(payload), [1590, 1712, 1534])
+
+    def test_sort_limit_offset(self):
+        payload = self.index.query(startdate='2019-01-01', sort='desc',
+                                   limit=2, offset=1)
+        self.assertEqual(ids(payload), [1501, 1712])
+        self.assertEqual(payload['total'], 4)
+        self.assertEqual(payload['offset'], 1)
+
+    def test_id(self):
+        self.assertEqual(ids(self.index.query(id='1501')), [1501])
+        self.assertEqual(ids(self.index.query(id=1)), [])
+
+    def test_unknown_kwarg(self):
+        with self.assertRaises(TypeError):
+            self.index.query(abbrev='SpX')
+
+    def test_update_moves_launch(self):
+        moved = copy.deepcopy(self.index.get(1590))
+        moved['netstamp'] = 1565000000
+        moved['rocket']['id'] = 74
+        moved['changed'] = '2019-06-01 00:00:00'
+        self.index.update([moved])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(ids(self.index.query(rocketid=188)), [])
+        self.assertEqual(ids(self.index.query(rocketid=74)), [1534, 1590])
+        self.assertEqual(ids(self.index.query(now=NOW))[-1], 1590)
+        self.assertEqual(self.index.changed, '2019-06-01 00:00:00')
+
+    def test_remove(self):
+        self.index.remove(1712)
+        self.assertNotIn(1712, self.index)
+        self.assertEqual(ids(self.index.query(status=2)), [])
+        with self.assertRaises(KeyError):
+            self.index.remove(1712)
+
+    def test_net_parsed_without_netstamp(self):
+        launch = dict(id=1, name='TBD', net='May 20, 2019 00:00:00 UTC')
+        self.index.update([launch])
+        self.assertEqual(ids(self.index.query(startdate='2019-05-20',
+                                              enddate='2019-05-20')), [1])
+
+
+class TestMirrorLoading(TestCase):
+
+    def test_from_mirror_and_refresh(self):
+        launches = sorted(load_launches(), key=lambda r: r['changed'])
+        mirror = Mirror()
+        mirror.merge('launch', launches[:2])
+        index = LaunchIndex.from_mirror(mirror)
+        self.assertEqual(len(index), 2)
+        mirror.merge('launch', launches[2:])
+        # changed is inclusive, so the newest indexed launch comes again
+        self.assertEqual(index.refresh(mirror), 3)
+        self.assertEqual(len(index), 4)
+        mirror.close()
+
+
+def launch_ids(launches):
+    return [launch['id'] for launch in launches]
+
+
+class TestLaunchTimeline(TestCase):
+
+    def setUp(self):
+        self.timeline = LaunchTimeline(load_launches())
+
+    def test_next(self):
+        self.assertEqual(launch_ids(self.timeline.next(2, now=NOW)),
+                         [1712, 1501])
+        self.assertEqual(launch_ids(self.timeline.next(now=1564575046)),
+                         [1534])
+
+    def test_between(self):
+        self.assertEqual(launch_ids(self.timeline.between('2019-05-16',
+                                                          '2019-06-20')),
+                         [1590, 1712, 1501])
+        self.assertEqual(launch_ids(self.timeline.between(1557973800,
+                                                          1558051200)),
+                         [1590, 1712])
+
+    def test_overlapping(self):
+        # 1590's window runs from 02:30 to 04:00
+        self.assertEqual(launch_ids(self.timeline.overlapping(1557977000)),
+                         [1590])
+        self.assertEqual(launch_ids(self.timeline.overlapping(1557980000)),
+                         [])
+        self.assertEqual(launch_ids(self.timeline.overlapping(
+            '2019-05-16 03:00', '2019-05-17')), [1590, 1712])
+        # an instantaneous window is open at its NET only
+        self.assertEqual(launch_ids(self.timeline.overlapping(1564575046)),
+                         [1534])
+
+    def test_update_and_remove(self):
+        moved = copy.deepcopy(self.timeline.get(1590))
+        moved['netstamp'] = moved['wsstamp'] = 1565000000
+        moved['westamp'] = 1565003600
+        self.timeline.update([moved])
+        self.assertEqual(launch_ids(self.timeline.next(now=NOW)),
+                         [1712, 1501, 1534, 1590])
+        self.assertEqual(launch_ids(self.timeline.overlapping(1557977000)),
+                         [])
+        self.assertEqual(launch_ids(self.timeline.overlapping(1565001000)),
+                         [1590])
+        self.timeline.remove(1590)
+        self.assertEqual(launch_ids(self.timeline.overlapping(1565001000)),
+                         [])
+        self.assertEqual(len(self.timeline), 3)
+
+    def test_is_stale(self):
+        self.assertFalse(self.timeline.is_stale())
+        timeline = LaunchTimeline(load_launches(), max_age=60)
+        self.assertFalse(timeline.is_stale(now=timeline.synced_at + 30))
+        self.assertTrue(timeline.is_stale(now=timeline.synced_at + 90))
+        self.assertTrue(LaunchTimeline(max_age=60).is_stale())
+
+    def test_stale_falls_back_to_api(self):
+        launches = load_launches()
+        client = LaunchLibraryClient()
+        adapter = mount(client, lambda path, params, request: {
+            'launches': launches[1:], 'total': 3, 'offset': 0,
+            'count': 3})
+        timeline = LaunchTimeline(max_age=60, client=client, sync_size=5)
+        self.assertEqual(launch_ids(timeline.next(2, now=NOW)),
+                         [1712, 1501])
+        self.assertEqual(adapter.calls,
+                         [('launch', {'next': '5', 'mode': 'verbose'})])
+        # fresh now, so answered locally
+        self.assertEqual(launch_ids(timeline.next(1, now=NOW)), [1712])
+        self.assertEqual(len(adapter.calls), 1)
+        client.close()
@@ -4,15 +4,43 @@
 test_launchlibrary.py
 
 Main testing module for the launchlibrary module.
+
+The tests run against a local MockLaunchLibrary replaying recorded
+responses.  Set LAUNCHLIBRARY_LIVE=1 to run them against the live
+launchlibrary.net instead.
 '''
 
 
+import os
 from datetime import datetime
 from unittest import TestCase
 
 from requests import Response
 
 from launchlibrary import launchlibrary
+from launchlibrary.client import LaunchLibraryClient, set_default_client
+
+from tests.mockserver import MockLaunchLibrary
+
+
+LIVE = os.environ.get('LAUNCHLIBRARY_LIVE', '') not in ('', '0')
+
+_server = None
+
+
+def setUpModule():
+    global _server
+    if not LIVE:
+        _server = MockLaunchLibrary().start()
+        set_default_client(LaunchLibraryClient(base_url=_server.url))
+
+
+def tearDownModule():
+    global _server
+    if _server is not None:
+        set_default_client(None)
+        _server.stop()
+        _server = None
 
 
 def datetime_from_datestring(date_str):
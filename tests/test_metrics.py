@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+'''
+test_metrics.py
+
+Tests for per-request instrumentation hooks and metrics aggregation.
+'''
+
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock, skipIf
+
+import requests
+
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.cache import MemoryCache
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.metrics import (Histogram, HistogramAggregator,
+                                   OpenTelemetryHook, PrometheusHook)
+
+from tests.fakes import mount
+from tests.mockserver import MockLaunchLibrary
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+try:
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+except ImportError:
+    MeterProvider = None
+
+
+OK = {'agencies': [{'id': 44}], 'total': 1, 'count': 1, 'offset': 0}
+
+
+def ok(path, params, request):
+    return OK
+
+
+def recording_client(handler=ok, **kwargs):
+    seen = []
+    client = LaunchLibraryClient(hooks=[seen.append], **kwargs)
+    mount(client, handler)
+    return client, seen
+
+
+class TestClientHooks(TestCase):
+
+    def test_get_json_timings(self):
+        client, seen = recording_client()
+        client.get_json('agency', {'id': 44})
+        metrics, = seen
+        self.assertEqual(metrics.endpoint, 'agency')
+        self.assertEqual(metrics.status, 200)
+        self.assertEqual(metrics.cache, 'bypass')
+        self.assertEqual(metrics.bytes, len(json.dumps(OK)))
+        for phase in ('ttfb', 'download', 'decode', 'total'):
+            self.assertGreaterEqual(getattr(metrics, phase), 0)
+        self.assertGreaterEqual(metrics.total, metrics.ttfb)
+        self.assertIsNone(metrics.error)
+
+    def test_coalesced_get_json_reported_per_call(self):
+        barrier = threading.Barrier(10)
+
+        def slow(path, params, request):
+            time.sleep(0.2)
+            return OK
+
+        client, seen = recording_client(slow, coalesce=True)
+
+        def call(_):
+            barrier.wait()
+            return client.get_json('agency', {'id': 44})
+
+        with ThreadPoolExecutor(10) as pool:
+            list(pool.map(call, range(10)))
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(sorted(m.cache for m in seen),
+                         ['bypass'] + ['coalesced'] * 9)
+        self.assertTrue(all(m.status == 200 for m in seen))
+
+    def test_request_has_no_decode(self):
+        client, seen = recording_client()
+        client.request('agency')
+        self.assertIsNone(seen[0].decode)
+
+    def test_cache_status(self):
+        client, seen = recording_client(cache=MemoryCache())
+        client.get_json('agency')
+        client.get_json('agency')
+        self.assertEqual([m.cache for m in seen], ['miss', 'hit'])
+        self.assertIsNone(seen[1].ttfb)
+        self.assertEqual(seen[1].bytes, 0)
+
+    def test_retries_counted(self):
+        statuses = [503, 200]
+
+        def flaky(path, params, request):
+            return (statuses.pop(0), OK, {})
+        with mock.patch('launchlibrary.client.time.sleep'):
+            client, seen = recording_client(flaky, retry=2)
+            client.get_json('agency')
+        self.assertEqual(seen[0].retries, 1)
+        self.assertEqual(seen[0].status, 200)
+
+    def test_errors_reported(self):
+        client, seen = recording_client(lambda *args: (404, b'', {}))
+        with self.assertRaises(requests.HTTPError):
+            client.get_json('agency')
+        self.assertEqual(seen[0].status, 404)
+        self.assertIsInstance(seen[0].error, requests.HTTPError)
+
+        def down(path, params, request):
+            raise requests.ConnectionError('refused')
+        client, seen = recording_client(down)
+        with self.assertRaises(requests.ConnectionError):
+            client.request('agency')
+        self.assertIsNone(seen[0].status)
+        self.assertIsInstance(seen[0].error, requests.ConnectionError)
+
+    def test_rate_limit_wait_is_queue_wait(self):
+        client, seen = recording_client(rate_limit=20)
+        client.rate_limiter.try_acquire(client.rate_limiter.capacity)
+        client.request('agency')
+        self.assertGreaterEqual(seen[0].queue_wait, 0.04)
+
+    def test_add_and_remove_hook(self):
+        client = LaunchLibraryClient()
+        mount(client, ok)
+        seen = []
+        client.add_hook(seen.append)
+        client.request('agency')
+        client.remove_hook(seen.append)
+        client.request('agency')
+        self.assertEqual(len(seen), 1)
+
+    def test_async_queue_wait(self):
+        seen = []
+
+        def slow(path, params, request):
+            time.sleep(0.02)
+            return OK
+
+        async def main():
+            async with AsyncLaunchLibraryClient(max_concurrency=1,
+                                                hooks=[seen.append]) as aio:
+                mount(aio.client, slow)
+                await asyncio.gather(*[aio.call('agency', {'id': i})
+                                       for i in range(3)])
+        asyncio.run(main())
+        waits = sorted(m.queue_wait for m in seen)
+        self.assertGreaterEqual(waits[-1], 0.03)
+        self.assertTrue(all(m.total >= m.queue_wait for m in seen))
+
+
+class TestHistogram(TestCase):
+
+    def test_quantiles(self):
+        histogram = Histogram(buckets=(1, 2, 3, 4))
+        for value in (0.5, 1.5, 1.5, 2.5, 3.5, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 6)
+        self.assertEqual(histogram.max, 10)
+        self.assertLessEqual(histogram.quantile(0.5), 2)
+        self.assertGreater(histogram.quantile(0.5), 1)
+        self.assertLessEqual(histogram.quantile(1.0), 10)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_aggregator(self):
+        aggregator = HistogramAggregator()
+        client = LaunchLibraryClient(hooks=[aggregator],
+                                     cache=MemoryCache())
+        mount(client, ok)
+        for _ in range(3):
+            client.get_json('agency')
+        stats = aggregator.snapshot()['agency']
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['cache'], {'miss': 1, 'hit': 2})
+        self.assertEqual(stats['ttfb']['count'], 1)
+        self.assertEqual(stats['decode']['count'], 3)
+        aggregator.reset()
+        self.assertEqual(aggregator.snapshot(), {})
+
+    def test_wire_bytes(self):
+        aggregator = HistogramAggregator()
+        with MockLaunchLibrary() as server:
+            for compression in (True, False):
+                with LaunchLibraryClient(base_url=server.url,
+                                         compression=compression,
+                                         hooks=[aggregator]) as client:
+                    client.get_json('agency')
+                stats = aggregator.snapshot()['agency']
+                aggregator.reset()
+                if compression:
+                    self.assertLess(stats['wire_bytes'], stats['bytes'])
+                else:
+                    self.assertEqual(stats['wire_bytes'], stats['bytes'])
+
+
+class TestExporters(TestCase):
+
+    @skipIf(prometheus_client is None, 'prometheus_client not installed')
+    def test_prometheus(self):
+        registry = prometheus_client.CollectorRegistry()
+        client, _ = recording_client()
+        client.add_hook(PrometheusHook(registry=registry))
+        client.get_json('agency')
+        value = registry.get_sample_value(
+            'launchlibrary_requests_total',
+            {'endpoint': 'agency', 'status': '200', 'cache': 'bypass'})
+        self.assertEqual(value, 1)
+        count = registry.get_sample_value(
+            'launchlibrary_request_phase_seconds_count',
+            {'endpoint': 'agency', 'phase': 'decode'})
+        self.assertEqual(count, 1)
+
+    @skipIf(MeterProvider is None, 'opentelemetry-sdk not installed')
+    def test_opentelemetry(self):
+        reader = InMemoryMetricReader()
+        meter = MeterProvider(metric_readers=[reader]).get_meter('test')
+        client, _ = recording_client()
+        client.add_hook(OpenTelemetryHook(meter))
+        client.get_json('agency')
+        names = {metric.name
+                 for resource in reader.get_metrics_data().resource_metrics
+                 for scope in resource.scope_metrics
+                 for metric in scope.metrics}
+        self.assertIn('launchlibrary.requests', names)
+        self.assertIn('launchlibrary.request.ttfb', names)
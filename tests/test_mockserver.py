@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+'''
+test_mockserver.py
+
+Tests for the local Launch Library stand-in.
+'''
+
+
+import time
+from unittest import TestCase, mock
+
+from launchlibrary.cache import MemoryCache
+from launchlibrary.client import LaunchLibraryClient
+
+from tests.mockserver import MockLaunchLibrary
+
+
+class TestMockLaunchLibrary(TestCase):
+
+    def setUp(self):
+        self.server = MockLaunchLibrary().start()
+        self.client = LaunchLibraryClient(base_url=self.server.url)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_filters_and_pages(self):
+        payload = self.client.get_json('agency', {'countryCode': 'FRA'})
+        self.assertEqual(sorted(a['id'] for a in payload['agencies']),
+                         [27, 115])
+        payload = self.client.get_json('lsp', {'limit': 2, 'offset': 1})
+        self.assertEqual(payload['total'], 5)
+        self.assertEqual(payload['count'], 2)
+        self.assertEqual(payload['offset'], 1)
+
+    def test_launch_search_and_mode(self):
+        payload = self.client.get_json('launch', {'rocketid': 188,
+                                                  'mode': 'list'})
+        self.assertEqual([l['id'] for l in payload['launches']], [1590])
+        self.assertNotIn('rocket', payload['launches'][0])
+
+    def test_launch_searches(self):
+        def ids(**params):
+            payload = self.client.get_json('launch', params)
+            return [l['id'] for l in payload['launches']]
+
+        self.assertEqual(ids(), [1590, 1712, 1501, 1534])
+        self.assertEqual(ids(next=2), [1590, 1712])
+        self.assertEqual(ids(lsp='rl'), [1712])
+        self.assertEqual(ids(lsp=63, locationid=6), [1534])
+        self.assertEqual(ids(startdate='2019-06-01',
+                             enddate='2019-07-31'), [1501, 1534])
+        self.assertEqual(ids(enddate='2019-05-16'), [1590])
+        self.assertEqual(ids(id=1501, limit=1, offset=0), [1501])
+
+    def test_unrecorded_endpoint_is_empty(self):
+        payload = self.client.get_json('mission')
+        self.assertEqual(payload, {'missions': [], 'total': 0,
+                                   'offset': 0, 'count': 0})
+
+    def test_add_records(self):
+        self.server.add_records('launch', [
+            {'id': i, 'name': 'L{}'.format(i), 'netstamp': 1600000000 + i}
+            for i in range(25)])
+        payload = self.client.get_json('launch', {'startdate': '2020-01-01',
+                                                  'limit': 100})
+        self.assertEqual(payload['count'], 25)
+
+    def test_bad_request(self):
+        resp = self.client.request('launch', {'bogus': 1})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_calendar(self):
+        resp = self.client.request('calendar')
+        self.assertEqual(resp.headers['Content-Type'], 'text/calendar')
+        self.assertTrue(resp.content.startswith(b'BEGIN:VCALENDAR'))
+
+    def test_conditional_requests(self):
+        client = LaunchLibraryClient(base_url=self.server.url,
+                                     cache=MemoryCache())
+        with mock.patch('launchlibrary.cache.time.time',
+                        return_value=time.time()) as now:
+            client.request('agency')
+            now.return_value += 7200
+            resp = client.request('agency')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(client.cache.stats()['revalidations'], 1)
+        client.close()
+
+    def test_injected_errors_are_retried(self):
+        self.server.fail(429, headers={'Retry-After': '0'})
+        self.server.fail(503)
+        client = LaunchLibraryClient(base_url=self.server.url, retry=2)
+        self.assertEqual(client.request('agency').status_code, 200)
+        self.assertEqual(len(self.server.requests), 3)
+        client.close()
+
+    def test_latency(self):
+        self.server.latency = 0.05
+        start = time.monotonic()
+        self.client.request('agency')
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_error_rate(self):
+        server = MockLaunchLibrary(error_rate=1.0)
+        with server:
+            client = LaunchLibraryClient(base_url=server.url)
+            self.assertEqual(client.request('agency').status_code, 503)
+            client.close()
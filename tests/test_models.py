@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+'''
+test_models.py
+
+Tests for the typed record models.
+'''
+
+
+import pickle
+from unittest import TestCase
+
+from launchlibrary import models
+from launchlibrary.models import Agency, Launch, Location, Pad, Rocket
+
+
+def verbose_launch():
+    return {
+        'id': 1,
+        'name': 'Falcon 9 Block 5 | Starlink',
+        'net': 'May 3, 2019 00:00:00 UTC',
+        'status': 1,
+        'lsp': {'id': 121, 'name': 'SpaceX', 'abbrev': 'SpX'},
+        'rocket': {'id': 188, 'name': 'Falcon 9 Block 5',
+                   'family': {'id': 1, 'name': 'Falcon'},
+                   'agencies': [{'id': 121, 'name': 'SpaceX'}]},
+        'location': {'id': 16, 'name': 'Cape Canaveral, FL, USA',
+                     'pads': [{'id': 84, 'name': 'SLC-40'}]},
+        'missions': [{'id': 900, 'name': 'Starlink'}],
+    }
+
+
+class TestRecord(TestCase):
+
+    def test_scalar_fields_read_from_raw(self):
+        launch = Launch(verbose_launch())
+        self.assertEqual(launch.id, 1)
+        self.assertEqual(launch.name, 'Falcon 9 Block 5 | Starlink')
+
+    def test_nested_objects_are_wrapped_lazily(self):
+        launch = Launch(verbose_launch())
+        with self.assertRaises(AttributeError):
+            object.__getattribute__(launch, 'rocket') # slot not yet set
+        rocket = launch.rocket
+        self.assertIsInstance(rocket, Rocket)
+        self.assertIs(launch.rocket, rocket) # cached after first access
+        self.assertEqual(rocket.family.name, 'Falcon')
+        self.assertIsInstance(rocket.agencies[0], Agency)
+        self.assertIsInstance(launch.location, Location)
+        self.assertIsInstance(launch.location.pads[0], Pad)
+        self.assertEqual(launch.missions[0].name, 'Starlink')
+        self.assertEqual(launch.lsp.abbrev, 'SpX')
+
+    def test_id_only_references_are_left_alone(self):
+        launch = Launch({'id': 2, 'lsp': 121})
+        self.assertEqual(launch.lsp, 121)
+
+    def test_missing_field(self):
+        launch = Launch({'id': 3})
+        with self.assertRaises(AttributeError):
+            launch.holdreason
+        self.assertIsNone(launch.get('holdreason'))
+        self.assertIsNone(launch.rocket)
+
+    def test_no_instance_dict(self):
+        launch = Launch(verbose_launch())
+        self.assertFalse(hasattr(launch, '__dict__'))
+        with self.assertRaises(AttributeError):
+            launch.extra = 1
+
+    def test_raw_escape_hatch(self):
+        raw = verbose_launch()
+        launch = Launch(raw)
+        self.assertIs(launch.raw, raw)
+        self.assertIs(launch.to_dict(), raw)
+
+    def test_equality_and_pickle(self):
+        launch = Launch(verbose_launch())
+        self.assertEqual(launch, Launch(verbose_launch()))
+        self.assertEqual(pickle.loads(pickle.dumps(launch)), launch)
+
+
+class TestFromPayload(TestCase):
+
+    def test_wraps_listing(self):
+        payload = {'launches': [verbose_launch(), {'id': 2}], 'total': 2,
+                   'count': 2, 'offset': 0}
+        launches = models.from_payload(payload, Launch)
+        self.assertEqual([l.id for l in launches], [1, 2])
+        self.assertIsInstance(launches[0], Launch)
+
+    def test_agencies(self):
+        payload = {'agencies': [{'id': 44, 'abbrev': 'NASA'}]}
+        nasa, = models.from_payload(payload, Agency)
+        self.assertEqual(nasa.abbrev, 'NASA')
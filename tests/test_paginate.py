@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+'''
+test_paginate.py
+
+Offline tests for launchlibrary.paginate().
+'''
+
+
+import random
+import time
+from unittest import TestCase
+
+from launchlibrary import launchlibrary
+from launchlibrary.client import LaunchLibraryClient
+
+from tests.fakes import mount
+
+
+class Listing(object):
+    '''
+    Handler serving a launch listing with offset/limit pagination.
+    '''
+
+    def __init__(self, total, max_limit=None, jitter=0.0):
+        self.records = [{'id': i} for i in range(total)]
+        self.max_limit = max_limit
+        self.jitter = jitter
+
+    def __call__(self, path, params, request):
+        if self.jitter:
+            time.sleep(random.uniform(0, self.jitter))
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 10))
+        if self.max_limit:
+            limit = min(limit, self.max_limit)
+        page = self.records[offset:offset + limit]
+        return {'launches': page, 'total': len(self.records),
+                'count': len(page), 'offset': offset}
+
+
+class TestPaginate(TestCase):
+
+    def paginate(self, handler, endpoint=launchlibrary.launch, **kwargs):
+        client = LaunchLibraryClient()
+        adapter = mount(client, handler)
+        records = list(launchlibrary.paginate(endpoint, client=client,
+                                              **kwargs))
+        return records, adapter
+
+    def test_yields_all_records_in_order(self):
+        records, adapter = self.paginate(Listing(250, jitter=0.01),
+                                         page_size=20, max_workers=4)
+        self.assertEqual([r['id'] for r in records], list(range(250)))
+        self.assertEqual(len(adapter.calls), 13)
+
+    def test_endpoint_by_name(self):
+        records, _ = self.paginate(Listing(30), endpoint='launch',
+                                   page_size=10)
+        self.assertEqual(len(records), 30)
+
+    def test_server_page_cap(self):
+        records, _ = self.paginate(Listing(95, max_limit=10), page_size=50)
+        self.assertEqual([r['id'] for r in records], list(range(95)))
+
+    def test_offset_and_max_records(self):
+        records, _ = self.paginate(Listing(100), page_size=10, offset=15,
+                                   max_records=33)
+        self.assertEqual([r['id'] for r in records], list(range(15, 48)))
+
+    def test_filters_are_forwarded(self):
+        _, adapter = self.paginate(Listing(5), page_size=10, mode='list')
+        self.assertEqual(adapter.calls[0][1]['mode'], 'list')
+
+    def test_single_page(self):
+        records, adapter = self.paginate(Listing(3), page_size=10)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len(adapter.calls), 1)
+
+    def test_rejects_limit(self):
+        with self.assertRaises(TypeError):
+            next(launchlibrary.paginate('launch', limit=5))
+
+    def test_rejects_unknown_endpoint(self):
+        with self.assertRaises(ValueError):
+            next(launchlibrary.paginate('calendar'))
+
+    def test_iter_pages(self):
+        client = LaunchLibraryClient()
+        adapter = mount(client, Listing(95, max_limit=10))
+        pages = list(launchlibrary.iter_pages('launch', page_size=50,
+                                              client=client, offset=5,
+                                              max_records=42))
+        self.assertEqual([(p.offset, p.count) for p in pages],
+                         [(5, 10), (15, 10), (25, 10), (35, 10), (45, 2)])
+        self.assertIsInstance(pages[0].body, bytes)
+        self.assertEqual(len(adapter.calls), 5)
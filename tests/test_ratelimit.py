@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+'''
+test_ratelimit.py
+
+Tests for rate limiting, retries and the circuit breaker.
+'''
+
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+import requests
+
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.ratelimit import AsyncTokenBucket, TokenBucket
+from launchlibrary.retry import (CircuitBreaker, CircuitOpenError,
+                                 RetryPolicy, retry_after_seconds)
+
+from tests.fakes import mount
+
+
+OK = {'agencies': [], 'total': 0, 'count': 0, 'offset': 0}
+
+
+def fake_response(headers):
+    resp = requests.Response()
+    resp.headers.update(headers)
+    return resp
+
+
+def sequence(*results):
+    '''
+    Handler answering with results in turn, then OK forever.
+    '''
+    results = list(results)
+
+    def handler(path, params, request):
+        if results:
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return OK
+    return handler
+
+
+class TestTokenBucket(TestCase):
+
+    def test_burst_then_sustained_rate(self):
+        bucket = TokenBucket(rate=50, capacity=5)
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertEqual(bucket.acquire(), 0)
+        for _ in range(10):
+            bucket.acquire()
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 10 / 50 - 0.02)
+        self.assertLess(elapsed, 10 / 50 + 0.15)
+
+    def test_shared_between_threads(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        start = time.monotonic()
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: bucket.acquire(), range(21)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_try_acquire(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+
+    def test_pause(self):
+        bucket = TokenBucket(rate=1000, capacity=10)
+        bucket.pause(0.05)
+        self.assertFalse(bucket.try_acquire())
+        self.assertGreaterEqual(bucket.acquire(), 0.04)
+
+    def test_rate_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_async_bucket(self):
+        bucket = AsyncTokenBucket(rate=100, capacity=1)
+
+        async def main():
+            start = time.monotonic()
+            await asyncio.gather(*[bucket.acquire() for _ in range(11)])
+            return time.monotonic() - start
+        self.assertGreaterEqual(asyncio.run(main()), 0.09)
+
+
+class TestRetryPolicy(TestCase):
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(
+            retry_after_seconds(fake_response({'Retry-After': '7'})), 7)
+        self.assertIsNone(retry_after_seconds(fake_response({})))
+        self.assertIsNone(
+            retry_after_seconds(fake_response({'Retry-After': 'soon'})))
+
+    def test_retry_after_http_date(self):
+        date = 'Wed, 21 Oct 2099 07:28:00 GMT'
+        resp = fake_response({'Retry-After': date})
+        self.assertGreater(retry_after_seconds(resp), 0)
+        policy = RetryPolicy(max_retry_after=60)
+        self.assertEqual(policy.delay(0, resp), 60)
+
+    def test_jittered_backoff_is_bounded(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(6):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(5, 2 ** attempt))
+
+    def test_should_retry(self):
+        policy = RetryPolicy(max_retries=2)
+        resp = requests.Response()
+        resp.status_code = 503
+        self.assertTrue(policy.should_retry(0, resp))
+        self.assertFalse(policy.should_retry(2, resp))
+        resp.status_code = 404
+        self.assertFalse(policy.should_retry(0, resp))
+        self.assertTrue(policy.should_retry(
+            0, error=requests.ConnectionError()))
+        self.assertFalse(policy.should_retry(0, error=ValueError()))
+
+
+class TestCircuitBreaker(TestCase):
+
+    def test_opens_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        breaker.record_failure()
+        breaker.before_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+        time.sleep(0.06)
+        breaker.before_request()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request() # only one trial at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.before_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+
+@mock.patch('launchlibrary.client.time.sleep')
+class TestClientRetries(TestCase):
+
+    def test_retries_server_errors(self, sleep):
+        client = LaunchLibraryClient(retry=3)
+        adapter = mount(client, sequence((503, b'', {}), (502, b'', {})))
+        resp = client.request('agency')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(adapter.calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_honours_retry_after(self, sleep):
+        client = LaunchLibraryClient(retry=RetryPolicy(), rate_limit=1000)
+        mount(client, sequence((429, b'', {'Retry-After': '2'})))
+        self.assertEqual(client.request('agency').status_code, 200)
+        sleep.assert_any_call(2.0)
+
+    def test_gives_up_and_returns_last_response(self, sleep):
+        client = LaunchLibraryClient(retry=1)
+        adapter = mount(client, lambda *args: (500, b'', {}))
+        self.assertEqual(client.request('agency').status_code, 500)
+        self.assertEqual(len(adapter.calls), 2)
+
+    def test_retries_connection_errors(self, sleep):
+        client = LaunchLibraryClient(retry=2)
+        mount(client, sequence(requests.ConnectionError('reset')))
+        self.assertEqual(client.request('agency').status_code, 200)
+
+    def test_client_errors_are_not_retried(self, sleep):
+        client = LaunchLibraryClient(retry=3)
+        adapter = mount(client, lambda *args: (404, b'', {}))
+        self.assertEqual(client.request('agency').status_code, 404)
+        self.assertEqual(len(adapter.calls), 1)
+        sleep.assert_not_called()
+
+    def test_off_by_default(self, sleep):
+        client = LaunchLibraryClient()
+        self.assertIsNone(client.retry)
+        self.assertIsNone(client.rate_limiter)
+        adapter = mount(client, lambda *args: (503, b'', {}))
+        self.assertEqual(client.request('agency').status_code, 503)
+        self.assertEqual(len(adapter.calls), 1)
+
+    def test_breaker_fails_fast(self, sleep):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        client = LaunchLibraryClient(retry=5, breaker=breaker)
+        adapter = mount(client, lambda *args: (503, b'', {}))
+        with self.assertRaises(CircuitOpenError):
+            client.request('agency')
+        self.assertEqual(len(adapter.calls), 2)
+
+
+class TestAsyncRateLimit(TestCase):
+
+    def test_async_client_is_throttled(self):
+        async def main():
+            bucket = AsyncTokenBucket(rate=100, capacity=1)
+            async with AsyncLaunchLibraryClient(rate_limit=bucket) as client:
+                mount(client.client, lambda *args: OK)
+                start = time.monotonic()
+                await asyncio.gather(*[client.call('agency', {'id': i})
+                                       for i in range(11)])
+                return time.monotonic() - start
+        self.assertGreaterEqual(asyncio.run(main()), 0.09)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+'''
+test_snapshot.py
+
+Tests for binary snapshots of mirrored records.
+'''
+
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from launchlibrary.snapshot import Snapshot, dump_mirror, write_snapshot
+from launchlibrary.sync import Mirror
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load(name, key):
+    with open(os.path.join(FIXTURES, name + '.json')) as f:
+        return json.load(f)[key]
+
+
+class TestSnapshot(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'mirror.snap')
+        self.launches = load('launch_verbose', 'launches')
+        self.agencies = load('agency', 'agencies')
+        write_snapshot(self.path, {'launch': self.launches,
+                                   'agency': self.agencies})
+        self.snapshot = Snapshot(self.path)
+        self.addCleanup(self.snapshot.close)
+
+    def test_round_trip(self):
+        by_id = sorted(self.launches, key=lambda launch: launch['id'])
+        self.assertEqual(list(self.snapshot.records('launch')), by_id)
+        self.assertEqual(self.snapshot.endpoints, ['launch', 'agency'])
+        self.assertEqual(self.snapshot.count('agency'), len(self.agencies))
+
+    def test_get(self):
+        self.assertEqual(self.snapshot.get('launch', 1590),
+                         self.launches[0])
+        self.assertIsNone(self.snapshot.get('launch', 1))
+        self.assertIsNone(self.snapshot.get('launch', 10 ** 6))
+        with self.assertRaises(KeyError):
+            self.snapshot.get('rocket', 1)
+
+    def test_columns(self):
+        ids = self.snapshot.column('launch', 'ids')
+        self.assertEqual(list(ids), sorted(l['id'] for l in self.launches))
+        netstamps = dict(zip(ids, self.snapshot.column('launch',
+                                                       'netstamp')))
+        self.assertEqual(netstamps[1590], 1557973800)
+        # 2019-05-14 16:19:06
+        changed = dict(zip(ids, self.snapshot.column('launch', 'changed')))
+        self.assertEqual(changed[1590], 1557850746)
+
+    def test_strings_are_interned(self):
+        one, two = (self.snapshot.get('launch', id) for id in (1590, 1712))
+        self.assertIs(list(one)[0], list(two)[0])
+
+    def test_scalars(self):
+        record = {'id': 1, 'flag': True, 'off': False, 'ratio': 0.5,
+                  'big': 2 ** 70, 'none': None, 'nested': [[], {}, 'é']}
+        write_snapshot(self.path, {'pad': [record]})
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.get('pad', 1), record)
+            self.assertEqual(list(snapshot.column('pad', 'netstamp')), [0])
+
+    def test_not_a_snapshot(self):
+        path = os.path.join(self.dir.name, 'dump.json')
+        with open(path, 'w') as f:
+            json.dump({'launches': self.launches}, f)
+        with self.assertRaises(ValueError):
+            Snapshot(path)
+
+    def test_dump_mirror(self):
+        mirror = Mirror()
+        mirror.merge('launch', self.launches)
+        self.assertEqual(dump_mirror(mirror, self.path, ('launch', 'pad')),
+                         len(self.launches))
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(snapshot.count('pad'), 0)
+            self.assertEqual(snapshot.get('launch', 1712)['id'], 1712)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+'''
+test_sync.py
+
+Offline tests for the incremental sync engine.
+'''
+
+
+import os
+import tempfile
+from unittest import TestCase
+
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.endpoints import CHANGED_FLOOR
+from launchlibrary.sync import Mirror, SyncEngine
+
+from tests.fakes import mount
+from tests.mockserver import RECORDED_AT, MockLaunchLibrary
+
+
+KEYS = {'launch': 'launches', 'agency': 'agencies', 'rocket': 'rockets',
+        'pad': 'pads'}
+
+
+class ChangingCatalogue(object):
+    '''
+    Handler serving listings that honour the changed parameter.
+    '''
+
+    def __init__(self):
+        self.data = {path: {} for path in KEYS}
+
+    def put(self, path, id, changed, **fields):
+        self.data[path][id] = dict(fields, id=id, changed=changed)
+
+    def __call__(self, path, params, request):
+        records = sorted(self.data[path].values(), key=lambda r: r['id'])
+        if 'changed' in params:
+            records = [r for r in records if r['changed'] >= params['changed']]
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 10))
+        page = records[offset:offset + limit]
+        return {KEYS[path]: page, 'total': len(records),
+                'count': len(page), 'offset': offset}
+
+
+class TestSyncEngine(TestCase):
+
+    def setUp(self):
+        self.catalogue = ChangingCatalogue()
+        for i in range(25):
+            changed = '2019-01-01 00:00:{:02}'.format(i)
+            self.catalogue.put('launch', i, changed,
+                               name='launch {}'.format(i))
+        self.catalogue.put('agency', 44, '2018-06-01 12:00:00', name='NASA')
+        client = LaunchLibraryClient()
+        self.adapter = mount(client, self.catalogue)
+        self.mirror = Mirror()
+        self.engine = SyncEngine(self.mirror, client, page_size=10)
+
+    def test_first_sync_downloads_everything(self):
+        counts = self.engine.sync_all()
+        self.assertEqual(counts, {'launch': 25, 'agency': 1, 'rocket': 0,
+                                  'pad': 0})
+        self.assertEqual(self.mirror.count('launch'), 25)
+        self.assertEqual(self.mirror.watermark('launch'),
+                         '2019-01-01 00:00:24')
+        # without a search option launch() only lists upcoming launches
+        self.assertEqual(self.adapter.calls[0][1],
+                         {'mode': 'verbose', 'changed': CHANGED_FLOOR,
+                          'offset': '0', 'limit': '10'})
+        agency_call = [p for path, p in self.adapter.calls
+                       if path == 'agency'][0]
+        self.assertNotIn('changed', agency_call)
+
+    def test_second_sync_only_moves_deltas(self):
+        self.engine.sync('launch')
+        self.catalogue.put('launch', 3, '2019-02-01 00:00:00',
+                           name='renamed')
+        self.catalogue.put('launch', 99, '2019-02-02 00:00:00',
+                           name='new')
+        self.adapter.calls.clear()
+        merged = self.engine.sync('launch')
+        # changed is inclusive, so the record at the mark comes back too
+        self.assertEqual(merged, 3)
+        self.assertEqual(self.adapter.calls[0][1]['changed'],
+                         '2019-01-01 00:00:24')
+        self.assertEqual(self.mirror.get('launch', 3)['name'], 'renamed')
+        self.assertEqual(self.mirror.get('launch', 99)['name'], 'new')
+        self.assertEqual(self.mirror.count('launch'), 26)
+        self.assertEqual(self.mirror.watermark('launch'),
+                         '2019-02-02 00:00:00')
+
+    def test_watermark_kept_when_nothing_changed(self):
+        self.engine.sync('agency')
+        self.engine.sync('agency')
+        self.assertEqual(self.mirror.watermark('agency'),
+                         '2018-06-01 12:00:00')
+
+    def test_records_in_id_order(self):
+        self.engine.sync('launch')
+        ids = [r['id'] for r in self.mirror.records('launch')]
+        self.assertEqual(ids, list(range(25)))
+
+
+class TestSyncFromMockServer(TestCase):
+
+    def test_first_sync_includes_past_launches(self):
+        past = [{'id': i, 'name': 'launch {}'.format(i),
+                 'netstamp': RECORDED_AT - 86400 * (300 - i),
+                 'changed': '2018-01-01 00:00:00'} for i in range(300)]
+        with MockLaunchLibrary() as server:
+            server.add_records('launch', past)
+            client = LaunchLibraryClient(base_url=server.url)
+            mirror = Mirror()
+            merged = SyncEngine(mirror, client, endpoints=('launch',),
+                                page_size=100).sync_all()
+            client.close()
+        self.assertEqual(merged, {'launch': 300})
+        self.assertEqual(mirror.count('launch'), 300)
+        self.assertEqual(mirror.watermark('launch'), '2018-01-01 00:00:00')
+        mirror.close()
+
+
+class TestMirrorFile(TestCase):
+
+    def test_persists_between_instances(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'mirror.sqlite')
+            mirror = Mirror(path)
+            mirror.merge('pad', [{'id': 1, 'name': 'LC-39A'}])
+            mirror.set_watermark('pad', '2019-01-01 00:00:00')
+            mirror.close()
+            mirror = Mirror(path)
+            self.assertEqual(mirror.get('pad', 1)['name'], 'LC-39A')
+            self.assertEqual(mirror.watermark('pad'), '2019-01-01 00:00:00')
+            mirror.close()
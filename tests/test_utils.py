@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+'''
+test_utils.py
+
+Tests for the ICS calendar parsers in launchlibrary.utils.
+'''
+
+
+import os
+import tracemalloc
+from unittest import TestCase
+
+from requests import Response
+
+from launchlibrary import utils
+
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'calendar.ics')
+
+
+def calendar_bytes():
+    with open(FIXTURE, 'rb') as f:
+        return f.read()
+
+
+def chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestIterIcsLines(TestCase):
+
+    def test_unfolds_continuation_lines(self):
+        lines = list(utils.iter_ics_lines(calendar_bytes().splitlines()))
+        self.assertIn(b'DESCRIPTION:Technology demonstration payloads for '
+                      b'the US Air Force Space Test Program.', lines)
+
+    def test_chunks_split_anywhere(self):
+        expected = list(utils.iter_ics_lines(calendar_bytes().splitlines()))
+        for size in (1, 7, 64):
+            lines = list(utils.iter_ics_lines(
+                chunks(calendar_bytes(), size), chunked=True))
+            self.assertEqual(lines, expected, size)
+
+    def test_str_lines(self):
+        lines = list(utils.iter_ics_lines(['BEGIN:VCALENDAR\r\n',
+                                           'X-NAME:a\r\n', ' b\r\n']))
+        self.assertEqual(lines, [b'BEGIN:VCALENDAR', b'X-NAME:ab'])
+
+
+class TestIterIcsEvents(TestCase):
+
+    def test_events(self):
+        header = {}
+        events = list(utils.iter_ics_events(calendar_bytes().splitlines(),
+                                            header))
+        self.assertEqual([e[b'UID'] for e in events],
+                         [b'1590', b'1712', b'1501'])
+        self.assertEqual(events[0][b'BEGIN'], b'VEVENT')
+        self.assertEqual(events[0][b'END'], b'VEVENT')
+        self.assertEqual(events[0][b'DESCRIPTION'],
+                         b'A batch of 60 test satellites for the Starlink '
+                         b'mega-constellation.')
+        # the alarm nested in the first event does not leak into it
+        self.assertNotIn(b'TRIGGER', events[0])
+        self.assertEqual(header[b'X-WR-TIMEZONE'], b'UTC')
+        self.assertEqual(len(header), 6)
+
+    def test_events_are_independent(self):
+        events = list(utils.iter_ics_events(calendar_bytes().splitlines()))
+        self.assertIsNot(events[0], events[1])
+        self.assertNotEqual(events[0], events[1])
+
+    def test_streamed_response(self):
+        resp = Response()
+        resp.status_code = 200
+        resp.raw = None
+        resp._content = calendar_bytes()
+        resp._content_consumed = True
+        events = list(utils.iter_ics_events(resp))
+        self.assertEqual(len(events), 3)
+
+    def test_memory_does_not_grow_with_calendar(self):
+        head, _, rest = calendar_bytes().partition(b'BEGIN:VEVENT')
+        event, _, _ = rest.partition(b'END:VCALENDAR')
+        event = b'BEGIN:VEVENT' + event
+
+        def calendar(n):
+            yield head
+            for _ in range(n):
+                yield event
+            yield b'END:VCALENDAR\r\n'
+
+        def peak(n):
+            tracemalloc.start()
+            for _ in utils.iter_ics_events(calendar(n), chunked=True):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak
+
+        small, large = peak(100), peak(3000)
+        self.assertLess(large, small * 2)
+
+
+class TestParseIcsCalendarFormat(TestCase):
+
+    def test_header_and_launches(self):
+        parsed = utils.parse_ics_calendar_format(calendar_bytes())
+        self.assertEqual(parsed[b'BEGIN'], b'VCALENDAR')
+        self.assertEqual(parsed[b'VERSION'], b'2.0')
+        self.assertEqual(parsed[b'X-WR-CALNAME'], b'Launch Library')
+        self.assertEqual([e[b'UID'] for e in parsed['launches']],
+                         [b'1590', b'1712', b'1501'])
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+'''
+test_watch.py
+
+Tests for launch change notifications, against the mock server.
+'''
+
+
+import asyncio
+import copy
+import itertools
+import json
+import os
+from unittest import TestCase
+
+from launchlibrary.aio import AsyncLaunchLibraryClient
+from launchlibrary.client import LaunchLibraryClient
+from launchlibrary.watch import (NET, NEW, REMOVED, STATUS, WINDOW,
+                                 Watcher, awatch, diff_launches, watch)
+
+from tests.mockserver import RECORDED_AT, MockLaunchLibrary
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_launches():
+    with open(os.path.join(FIXTURES, 'launch_verbose.json')) as f:
+        return json.load(f)['launches']
+
+
+class TestDiff(TestCase):
+
+    def test_diff_launches(self):
+        old = {1: {'id': 1, 'status': 1, 'net': 'a'},
+               2: {'id': 2, 'status': 1, 'net': 'a'}}
+        new = {1: {'id': 1, 'status': 2, 'net': 'b'},
+               3: {'id': 3, 'status': 1, 'net': 'a'}}
+        events = diff_launches(old, new)
+        self.assertEqual([(e.kind, e.id) for e in events],
+                         [(STATUS, 1), (NET, 1), (NEW, 3), (REMOVED, 2)])
+        self.assertIsNone(events[-1].launch)
+        self.assertEqual(diff_launches(old, old), [])
+
+
+class TestWatcher(TestCase):
+
+    def setUp(self):
+        self.server = MockLaunchLibrary().start()
+        self.seen = []
+        self.client = LaunchLibraryClient(base_url=self.server.url,
+                                          hooks=[self.seen.append])
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_changes(self):
+        watcher = Watcher(self.client)
+        self.assertEqual([(e.kind, e.id) for e in watcher.poll()],
+                         [(NEW, 1590), (NEW, 1712), (NEW, 1501),
+                          (NEW, 1534)])
+        self.assertEqual(watcher.params['mode'], 'list')
+        self.assertEqual(watcher.params['next'], 10)
+
+        launches = load_launches()
+        changed = copy.deepcopy(launches[:3])
+        changed[0]['status'] = 3
+        changed[1]['net'] = changed[1]['windowstart'] = \
+            'May 18, 2019 00:00:00 UTC'
+        self.server.add_records('launch', changed)
+        events = watcher.poll()
+        self.assertEqual([(e.kind, e.id) for e in events],
+                         [(STATUS, 1590), (NET, 1712), (WINDOW, 1712),
+                          (REMOVED, 1534)])
+        self.assertEqual(events[0].previous['status'], 1)
+
+    def test_unchanged_poll_is_not_modified(self):
+        watcher = Watcher(self.client, initial=False)
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(len(watcher.launches), 4)
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual([m.status for m in self.seen], [200, 304])
+        self.assertEqual(self.seen[1].bytes, 0)
+
+    def test_unchanged_body_without_etag(self):
+        watcher = Watcher(self.client)
+        watcher.poll()
+        # a server that does not answer If-None-Match
+        watcher.etag = None
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(self.seen[1].status, 200)
+
+    def test_interval(self):
+        watcher = Watcher(self.client, min_interval=5, max_interval=300,
+                          scale=60)
+        self.assertEqual(watcher.interval(), 300)
+        watcher.poll()
+        # first launch is 1590 at 1557973800
+        self.assertEqual(watcher.interval(now=1557973800 - 3600), 60)
+        self.assertEqual(watcher.interval(now=1557973800 - 60), 5)
+        self.assertEqual(watcher.interval(now=1557973800 + 60), 5)
+        self.assertEqual(watcher.interval(now=RECORDED_AT - 86400), 300)
+
+    def test_watch(self):
+        events = list(itertools.islice(watch(self.client, next=2), 2))
+        self.assertEqual([e.id for e in events], [1590, 1712])
+
+    def test_awatch(self):
+        async def main():
+            async with AsyncLaunchLibraryClient(self.client) as aio:
+                events = []
+                async for event in awatch(aio, next=2):
+                    events.append(event)
+                    if len(events) == 2:
+                        break
+                return events
+        events = asyncio.run(main())
+        self.assertEqual([e.kind for e in events], [NEW, NEW])